@@ -1,46 +1,109 @@
-import shutil
+import signal
 import subprocess
 import os
 from datetime import datetime
+from threading import Timer
+from typing import Iterable, Optional
 
+from .workspace import TEMP_DIR_NAME, LOGS_SUBDIR_NAME, create_temp_dir, tex_environment, enforce_quota, \
+    source_dir_of, input_dirs_of
+from .remote import remote_compiler_pool, RemoteUnavailable
+from .engines import TexEngine, engine_for
+from .retention import retain_log
+from .tex_log import TexOutputParser, TexMessage
 
-TEMP_DIR_NAME = ".bb-temp"
-LOGS_SUBDIR_NAME = "bb-logs"
+
+COMPILATION_TIMEOUT = 120  # seconds
+LOW_PRIORITY_NICENESS = 10
+# The engine runs in its own process group, so that the programs started by it (e.g. with shell escape) are killed
+# with it - they would keep its output open otherwise (see kill_engine)
+ENGINE_OUTPUT_OPTIONS = dict(stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors='replace',
+                             start_new_session=True)
 
 
 class CompilationError(OSError):
-    def __init__(self, *args):
+    def __init__(self, *args, errors: Iterable[TexMessage] = ()):
+        """
+        :param errors: structured information about the reasons of the failure.
+        """
         super().__init__(*args)
+        self.errors = list(errors)
         print()
 
 
-def compile_tex(src_doc_path: str) -> str:
+def compile_tex(src_doc_path: str, stop_on_error=False, timeout=COMPILATION_TIMEOUT,
+                engine: Optional[TexEngine] = None, shell_escape=False, low_priority=False, restricted=False) -> str:
     """
     Compiles TeX document.
     :param src_doc_path: path to the TeX document to be compiled
+    :param stop_on_error: whether the compilation should be aborted immediately after the first error
+    (by default the engine tries to continue and the document is considered broken only at the end)
+    :param timeout: maximal time of the compilation (in seconds), after which it is aborted
+    :param engine: TeX engine (by default the one selected for the output directory, see engines.engine_for)
+    :param shell_escape: whether the document may run external commands - such documents are always compiled locally
+    :param low_priority: whether the engine should run with lowered scheduling priority (where supported)
+    :param restricted: whether the engine may read only the files in the directory of the document and below it
+    (e.g. for documents received from other machines)
     :return: path to the compiled PDF file
     """
     src_folder = os.path.dirname(src_doc_path)
     output_dir_path = create_temp_dir(src_folder) if TEMP_DIR_NAME not in src_doc_path else src_folder
+    engine = engine or engine_for(output_dir_path)
 
+    if remote_compiler_pool() and not shell_escape:
+        try:
+            return _compile_remotely(src_doc_path, output_dir_path, stop_on_error, timeout, engine)
+        except RemoteUnavailable as error:
+            print(f"{error}; compiling locally.")
+
+    # The engine runs in the directory of the document, so the paths it's given are relative to it (absolute paths
+    # are refused in the restricted mode)
+    work_dir_path = os.path.dirname(src_doc_path)
+    command = engine.command(os.path.relpath(output_dir_path, work_dir_path), shell_escape=shell_escape) \
+        + [os.path.basename(src_doc_path)]
+    env = tex_environment(output_dir_path)
+    if restricted:
+        # Paranoid mode of kpathsea - no absolute paths (except in the output directory), no parent directories,
+        # no hidden files
+        env["openin_any"] = "p"
+        env["TEXMFOUTPUT"] = output_dir_path
+    process = subprocess.Popen(command, cwd=work_dir_path, env=env,
+                               stdin=subprocess.DEVNULL, **ENGINE_OUTPUT_OPTIONS)
+    if low_priority:
+        _lower_priority(process.pid)
+    return finish_compilation(process, src_doc_path, get_dest_pdf_path(src_doc_path, output_dir_path),
+                              stop_on_error, timeout)
+
+
+def finish_compilation(process: subprocess.Popen, src_doc_path: str, pdf_path: str,
+                       stop_on_error=False, timeout=COMPILATION_TIMEOUT, output_lines=None) -> str:
+    """
+    Follows a started TeX engine process until it finishes, writing its output into the logs.
+    :param process: TeX engine process, with its output redirected (see ENGINE_OUTPUT_OPTIONS).
+    :param src_doc_path: path to the compiled TeX document (used to name the log).
+    :param pdf_path: path where the engine is expected to create the output PDF file.
+    :param output_lines: lines of the engine output, if they are read by the caller (by default they are read from
+    the standard output of the process).
+    :return: path to the compiled PDF file
+    """
+    output_dir_path = os.path.dirname(pdf_path)
     timestamp = datetime.now().strftime("%y%m%d-%H%M%S")
     filename = os.path.basename(src_doc_path).split('.')[0]
-    with open(os.path.join(output_dir_path, LOGS_SUBDIR_NAME, f'{timestamp}-{filename}.txt'), 'w') as log_file:
-        try:
-            subprocess.check_call(
-                ['xelatex', f'-output-directory={output_dir_path}', '-interaction=nonstopmode', src_doc_path],
-                cwd=os.path.dirname(src_doc_path), stdout=log_file, stderr=log_file
-            )
-        except subprocess.CalledProcessError:
-            raise CompilationError(f"Failed to compile the LaTeX document: compilation process"
-                                   f" ended with an error (see logs for more info).") from None
-
-        file_path = get_dest_pdf_path(src_doc_path, output_dir_path)
-        if not os.path.exists(file_path):
+    log_path = os.path.join(output_dir_path, LOGS_SUBDIR_NAME, f'{timestamp}-{filename}.txt')
+    succeeded = False
+    try:
+        with open(log_path, 'w') as log_file:
+            _follow_engine(process, output_lines, log_file, stop_on_error, timeout)
+
+        if not os.path.exists(pdf_path):
             raise CompilationError("Failed to compile the LaTeX document:"
                                    " output PDF file not created for unknown reason")
+        succeeded = True
+    finally:
+        retain_log(log_path, succeeded)
 
-    return file_path
+    enforce_quota(output_dir_path)
+    return pdf_path
 
 
 def get_dest_pdf_path(src_doc_path: str, output_dir_path: str) -> str:
@@ -48,26 +111,76 @@ def get_dest_pdf_path(src_doc_path: str, output_dir_path: str) -> str:
     return os.path.join(output_dir_path, os.path.basename(src_doc_path).split('.')[0] + ".pdf")
 
 
-def create_temp_dir(working_dir_path: str) -> str:
+def kill_engine(process: subprocess.Popen):
+    """
+    Kills the TeX engine process started with ENGINE_OUTPUT_OPTIONS, along with all the processes started by it.
+    """
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+            return
+        except OSError:
+            pass  # e.g. the whole group has already finished
+    process.kill()
+
+
+def _lower_priority(pid: int):
+    """
+    Lowers the scheduling priority of the started process (where supported). It's done from the parent process -
+    preexec_fn is not safe in the presence of threads.
+    """
+    if not hasattr(os, "setpriority"):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, pid, os.getpriority(os.PRIO_PROCESS, 0) + LOW_PRIORITY_NICENESS)
+    except OSError:
+        pass  # e.g. the process has already finished
+
+
+def _compile_remotely(src_doc_path: str, output_dir_path: str, stop_on_error: bool, timeout: float,
+                      engine: TexEngine) -> str:
+    search_dirs = input_dirs_of(output_dir_path) + [os.path.dirname(src_doc_path), output_dir_path,
+                                                    source_dir_of(output_dir_path)]
+    result = remote_compiler_pool().compile(src_doc_path, [path for path in search_dirs if path],
+                                            stop_on_error, timeout, engine.name)
+    if result.pdf is None:
+        raise CompilationError(f"Failed to compile the LaTeX document remotely: {result.message}",
+                               errors=result.errors)
+
+    pdf_path = get_dest_pdf_path(src_doc_path, output_dir_path)
+    with open(pdf_path, "wb") as pdf_file:
+        pdf_file.write(result.pdf)
+    return pdf_path
+
+
+def _follow_engine(process: subprocess.Popen, output_lines, log_file, stop_on_error: bool, timeout: float):
     """
-    Creates a temporary working directory if it doesn't exist.
-    Internal structure is also created (logs folder inside the temp dir).
-    :return: path to the temporary directory
+    Streams the TeX engine output to the log file, parsing it on the fly.
+    :raises CompilationError: if the engine reports any error, exits with an error code or exceeds the timeout.
     """
-    temp_dir_path = os.path.join(working_dir_path, TEMP_DIR_NAME)
-    if os.path.exists(temp_dir_path):
-        return temp_dir_path
-
-    os.mkdir(temp_dir_path)
-    for file in os.listdir(working_dir_path):
-        abs_src_path = os.path.join(working_dir_path, file)
-        if os.path.isfile(abs_src_path) and "tex" not in file.split("."):
-            shutil.copyfile(abs_src_path, os.path.join(temp_dir_path, file))
-        elif os.path.isdir(abs_src_path) and TEMP_DIR_NAME not in abs_src_path:
-            shutil.copytree(abs_src_path, os.path.join(temp_dir_path, file))
-
-    logs_dir_path = os.path.join(temp_dir_path, LOGS_SUBDIR_NAME)
-    if not os.path.exists(logs_dir_path):
-        os.mkdir(logs_dir_path)
-
-    return temp_dir_path
+    timed_out = []
+    timer = Timer(timeout, lambda: (timed_out.append(True), kill_engine(process)))
+    timer.start()
+
+    parser = TexOutputParser()
+    try:
+        for line in output_lines if output_lines is not None else process.stdout:
+            log_file.write(line)
+            if parser.feed(line) and stop_on_error:
+                kill_engine(process)
+                break
+        parser.finish()
+        if output_lines is None:
+            process.stdout.close()
+        process.wait()
+    finally:
+        timer.cancel()
+
+    if timed_out:
+        raise CompilationError(f"Failed to compile the LaTeX document: compilation exceeded the time limit "
+                               f"of {timeout} seconds.",
+                               errors=parser.errors() + [TexMessage(TexMessage.TIMEOUT, f"exceeded {timeout} s")])
+
+    if parser.errors() or process.returncode != 0:
+        raise CompilationError(f"Failed to compile the LaTeX document: compilation process"
+                               f" ended with an error (see logs for more info).", errors=parser.errors())
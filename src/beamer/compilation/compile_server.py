@@ -0,0 +1,163 @@
+import hmac
+import ipaddress
+import os
+import shutil
+import socket
+import socketserver
+import tempfile
+
+from .compilation import compile_tex, CompilationError
+from .engines import ENGINES
+from .workspace import release_temp_dir
+from .remote import PROTOCOL_VERSION, parse_address, send_message, receive_message, content_digest, \
+    errors_to_json, ProtocolError
+
+
+OBJECTS_SUBDIR_NAME = "objects"
+JOBS_SUBDIR_NAME = "jobs"
+
+
+class ContentStore:
+    """Assets received by the compile server, stored under their content hashes (shared by all jobs)."""
+    def __init__(self, store_dir_path: str):
+        self._objects_dir_path = os.path.join(store_dir_path, OBJECTS_SUBDIR_NAME)
+        os.makedirs(self._objects_dir_path, exist_ok=True)
+
+    def has(self, digest: str) -> bool:
+        return os.path.isfile(self.path(digest))
+
+    def put(self, data: bytes) -> str:
+        """
+        :return: content hash of the stored data.
+        """
+        digest = content_digest(data)
+        if not self.has(digest):
+            tmp_path = self.path(digest) + ".tmp"
+            with open(tmp_path, "wb") as object_file:
+                object_file.write(data)
+            os.replace(tmp_path, self.path(digest))
+        return digest
+
+    def path(self, digest: str) -> str:
+        if not digest.isalnum():
+            raise ProtocolError(f"Invalid content hash: {digest}")
+        return os.path.join(self._objects_dir_path, digest)
+
+
+class _CompileRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            self.server.handle_job(self.request)
+        except (OSError, ValueError) as error:
+            print(f"Compile job from {self.client_address} failed: {error}")
+
+
+class _CompileServerMixin:
+    """Performs compilations requested by RemoteCompilerPool: the source code is written into a fresh job directory,
+        along with the referenced assets (taken from the content store, missing ones are requested from the client),
+        and compiled with the compile function. Only the requests carrying the shared token are served, and the TeX
+        engine may read only the files of the job."""
+
+    def init_compile_server(self, store_dir_path: str, token: str, compile_function):
+        if not token:
+            raise ValueError("Compile server requires a token shared with its clients")
+        self._store = ContentStore(store_dir_path)
+        self._jobs_dir_path = os.path.abspath(os.path.join(store_dir_path, JOBS_SUBDIR_NAME))
+        os.makedirs(self._jobs_dir_path, exist_ok=True)
+        self._token = token
+        self._compile_function = compile_function
+
+    def handle_job(self, sock):
+        request, _ = receive_message(sock)
+        if request.get("type") != "compile" or request.get("version") != PROTOCOL_VERSION:
+            send_message(sock, {"type": "rejected", "message": f"Expected compile request, protocol version "
+                                                               f"{PROTOCOL_VERSION}"})
+            return
+
+        if not hmac.compare_digest(str(request.get("token", "")).encode(), self._token.encode()):
+            send_message(sock, {"type": "rejected", "message": "Invalid token"})
+            return
+
+        assets = request["assets"]
+        missing = sorted({digest for digest in assets.values() if not self._store.has(digest)})
+        send_message(sock, {"type": "need", "hashes": missing})
+        _, blobs = receive_message(sock)
+        received = {self._store.put(blob) for blob in blobs}
+        if not received.issuperset(missing):
+            raise ProtocolError("Requested assets not received")
+
+        job_dir_path = tempfile.mkdtemp(dir=self._jobs_dir_path)
+        try:
+            doc_path = self._prepare_job(job_dir_path, request["name"], request["source"], assets)
+            try:
+                pdf_path = self._compile_function(doc_path, stop_on_error=request["stop_on_error"],
+                                                  timeout=request["timeout"],
+                                                  engine=ENGINES.get(request.get("engine")), restricted=True)
+                with open(pdf_path, "rb") as pdf_file:
+                    pdf = pdf_file.read()
+            except CompilationError as error:
+                send_message(sock, {"type": "result", "ok": False, "errors": errors_to_json(error.errors),
+                                    "message": str(error)})
+                return
+
+            send_message(sock, {"type": "result", "ok": True, "errors": []}, [pdf])
+        finally:
+            shutil.rmtree(release_temp_dir(job_dir_path), ignore_errors=True)
+            shutil.rmtree(job_dir_path, ignore_errors=True)
+
+    def _prepare_job(self, job_dir_path: str, name: str, source: str, assets: dict) -> str:
+        """
+        Writes the document and its assets into the job directory.
+        :return: path to the document
+        """
+        for rel_path, digest in assets.items():
+            dest_path = _job_path(job_dir_path, rel_path)
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            try:
+                os.link(self._store.path(digest), dest_path)
+            except OSError:
+                shutil.copyfile(self._store.path(digest), dest_path)
+
+        doc_path = _job_path(job_dir_path, os.path.basename(name))
+        with open(doc_path, "w") as doc_file:
+            doc_file.write(source)
+        return doc_path
+
+
+class TcpCompileServer(_CompileServerMixin, socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class UnixCompileServer(_CompileServerMixin, socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def create_compile_server(address: str, store_dir_path: str, token: str, compile_function=compile_tex,
+                          allow_remote_clients=False):
+    """
+    :param address: address to listen on (see remote.parse_address).
+    :param store_dir_path: directory for the received assets and the compilation jobs.
+    :param token: secret shared with the clients - requests without it are rejected.
+    :param compile_function: function compiling the document, with the signature of compilation.compile_tex.
+    :param allow_remote_clients: whether the server may listen on a TCP address reachable from other machines
+    (by default only loopback addresses and unix sockets are accepted).
+    :return: server, ready to serve_forever.
+    """
+    family, server_address = parse_address(address)
+    if family == TcpCompileServer.address_family and not allow_remote_clients and \
+            not ipaddress.ip_address(socket.gethostbyname(server_address[0])).is_loopback:
+        raise ValueError(f"Compile server address {address} is reachable from other machines - listen on a loopback "
+                         f"address or a unix socket, or allow remote clients explicitly")
+
+    server_class = UnixCompileServer if family != TcpCompileServer.address_family else TcpCompileServer
+    server = server_class(server_address, _CompileRequestHandler)
+    server.init_compile_server(store_dir_path, token, compile_function)
+    return server
+
+
+def _job_path(job_dir_path: str, rel_path: str) -> str:
+    path = os.path.normpath(os.path.join(job_dir_path, rel_path))
+    if os.path.commonpath((path, job_dir_path)) != job_dir_path:
+        raise ProtocolError(f"Asset path outside of the job directory: {rel_path}")
+    return path
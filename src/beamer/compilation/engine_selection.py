@@ -0,0 +1,82 @@
+import os
+import time
+
+import fitz
+
+from src.beamer.graphics import document_fingerprint, are_fingerprints_similar
+from .compilation import compile_tex, CompilationError
+from .engines import TexEngine, EngineRecord, ENGINES, DEFAULT_ENGINE, AUTO_ENGINE, configured_engine, set_engine, \
+    compatible_engines, header_digest, load_engine_record, save_engine_record
+
+
+BENCHMARK_TIMEOUT = 60  # seconds
+
+
+def select_engine(temp_dir_path: str, doc_name: str, header: str, sample_source: str) -> TexEngine:
+    """
+    Selects the engine used for the compilations of the document (see engines.configure_engine). In the automatic
+    mode, the choice recorded in the cache is reused as long as the document header doesn't change - otherwise
+    the engines are benchmarked.
+    :param temp_dir_path: path to the temporary directory of the document.
+    :param doc_name: name of the document, used to identify the record and name the benchmark files.
+    :param header: header of the document.
+    :param sample_source: full source of a sample document (e.g. the first frame), compiled in the benchmark.
+    :return: selected engine
+    """
+    if configured_engine() != AUTO_ENGINE:
+        engine = ENGINES[configured_engine()]
+        if not engine.supports(header):
+            print(f'Warning: document "{doc_name}" requires packages which are not supported by {engine.name}.')
+        set_engine(temp_dir_path, engine)
+        return engine
+
+    record = load_engine_record(temp_dir_path, doc_name)
+    if not record or record.header_digest != header_digest(header) or record.engine not in ENGINES \
+            or not ENGINES[record.engine].is_available():
+        record = benchmark_engines(temp_dir_path, doc_name, header, sample_source)
+        if any(timing is not None for timing in record.timings.values()):
+            save_engine_record(temp_dir_path, doc_name, record)
+
+    timings = ", ".join(f"{name}: {f'{timing:.2f} s' if timing is not None else 'unusable'}"
+                        for name, timing in record.timings.items())
+    print(f'Using {record.engine} for "{doc_name}"' + (f' ({timings}).' if timings else '.'))
+
+    engine = ENGINES[record.engine]
+    set_engine(temp_dir_path, engine)
+    return engine
+
+
+def benchmark_engines(temp_dir_path: str, doc_name: str, header: str, sample_source: str) -> EngineRecord:
+    """
+    Compiles the sample with each available engine compatible with the header. The output of the first successful
+    compilation (default engine first) is the reference - engines producing different output are not considered.
+    :return: record of the fastest engine, along with all measured timings.
+    """
+    timings = {}
+    reference_fingerprint = None
+    for engine in compatible_engines(header):
+        sample_path = os.path.join(temp_dir_path, f"{doc_name}_engine_{engine.name}.tex")
+        with open(sample_path, "w") as sample_file:
+            sample_file.write(sample_source)
+
+        start = time.perf_counter()
+        try:
+            pdf_path = compile_tex(sample_path, stop_on_error=True, timeout=BENCHMARK_TIMEOUT, engine=engine)
+        except CompilationError:
+            timings[engine.name] = None
+            continue
+        elapsed = time.perf_counter() - start
+
+        with fitz.open(pdf_path) as sample_doc:
+            fingerprint = document_fingerprint(sample_doc)
+        if reference_fingerprint is None:
+            reference_fingerprint = fingerprint
+        elif not are_fingerprints_similar(reference_fingerprint, fingerprint):
+            timings[engine.name] = None
+            continue
+
+        timings[engine.name] = elapsed
+
+    usable = {name: timing for name, timing in timings.items() if timing is not None}
+    engine_name = min(usable, key=usable.get) if usable else DEFAULT_ENGINE.name
+    return EngineRecord(engine_name, timings, header_digest(header))
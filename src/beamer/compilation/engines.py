@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from threading import Lock
+from typing import Optional, Dict, List
+
+from .failure_cache import CACHE_SUBDIR_NAME
+
+
+ENGINES_FILE_NAME = "engines.json"
+AUTO_ENGINE = "auto"
+
+# Packages (and commands) available only with engines supporting system (OpenType) fonts
+_UNICODE_ENGINE_REGEX = re.compile(r"\\usepackage(?:\[[^\]]*\])?\{[^}]*\b(fontspec|polyglossia|unicode-math|xunicode|"
+                                   r"xltxtra|mathspec)\b|\\set(?:main|sans|mono)font\b")
+_LUA_ENGINE_REGEX = re.compile(r"\\usepackage(?:\[[^\]]*\])?\{[^}]*\b(luacode|luatexbase|luaotfload)\b|\\directlua\b")
+_XE_ENGINE_REGEX = re.compile(r"\\usepackage(?:\[[^\]]*\])?\{[^}]*\b(xunicode|xltxtra|mathspec)\b")
+
+
+class TexEngine:
+    """TeX engine used for the compilation."""
+    def __init__(self, name: str, unicode_fonts: bool, lua: bool = False, xe: bool = False):
+        """
+        :param name: name of the engine executable.
+        :param unicode_fonts: whether the engine supports system fonts (fontspec and similar packages).
+        :param lua: whether the engine is LuaTeX-based.
+        :param xe: whether the engine is XeTeX-based.
+        """
+        self.name = name
+        self.unicode_fonts = unicode_fonts
+        self.lua = lua
+        self.xe = xe
+
+    def supports(self, header: str) -> bool:
+        """
+        :return: whether the document with the given header can be compiled with the engine.
+        """
+        if _UNICODE_ENGINE_REGEX.search(header) and not self.unicode_fonts:
+            return False
+        if _LUA_ENGINE_REGEX.search(header) and not self.lua:
+            return False
+        if _XE_ENGINE_REGEX.search(header) and not self.xe:
+            return False
+        return True
+
+    def is_available(self) -> bool:
+        return shutil.which(self.name) is not None
+
+    def command(self, output_dir_path: str, interaction: str = "nonstopmode", shell_escape=False) -> List[str]:
+        """
+        :param shell_escape: whether the document may run external commands (e.g. to compile externalized pictures).
+        :return: command running the engine (the document to be compiled and any other options should be appended).
+        """
+        command = [self.name, f'-output-directory={output_dir_path}', f'-interaction={interaction}']
+        if shell_escape:
+            command.append('-shell-escape')
+        return command
+
+    def __repr__(self):
+        return self.name
+
+
+XELATEX = TexEngine("xelatex", unicode_fonts=True, xe=True)
+PDFLATEX = TexEngine("pdflatex", unicode_fonts=False)
+LUALATEX = TexEngine("lualatex", unicode_fonts=True, lua=True)
+
+ENGINES = {engine.name: engine for engine in (XELATEX, PDFLATEX, LUALATEX)}
+DEFAULT_ENGINE = XELATEX
+
+
+class InvalidEngine(ValueError):
+    pass
+
+
+_configured_engine = DEFAULT_ENGINE.name  # engine name or AUTO_ENGINE
+_selected_engines = {}  # temporary directory path -> TexEngine
+_selected_engines_lock = Lock()
+
+
+def configure_engine(name: str):
+    """
+    :param name: name of the engine used for documents opened afterwards (one of ENGINES), or AUTO_ENGINE -
+    the fastest engine producing the same output is chosen for each document.
+    """
+    global _configured_engine
+    if name != AUTO_ENGINE and name not in ENGINES:
+        raise InvalidEngine(f"Unknown TeX engine: {name}")
+    _configured_engine = name
+
+
+def configured_engine() -> str:
+    return _configured_engine
+
+
+def set_engine(temp_dir_path: str, engine: TexEngine):
+    """
+    Sets the engine used for the compilations in the temporary directory.
+    """
+    with _selected_engines_lock:
+        _selected_engines[temp_dir_path] = engine
+
+
+def engine_for(temp_dir_path: str) -> TexEngine:
+    """
+    :return: engine used for the compilations in the temporary directory.
+    """
+    with _selected_engines_lock:
+        return _selected_engines.get(temp_dir_path, DEFAULT_ENGINE)
+
+
+def compatible_engines(header: str) -> List[TexEngine]:
+    """
+    :return: available engines that can compile the document with the given header (default engine first).
+    """
+    return [engine for engine in ENGINES.values() if engine.supports(header) and engine.is_available()]
+
+
+class EngineRecord:
+    """Engine chosen for a document, along with the measured compilation times."""
+    def __init__(self, engine: str, timings: Dict[str, Optional[float]], header_digest: str):
+        """
+        :param engine: name of the chosen engine.
+        :param timings: engine name -> compilation time of the sample (None - failed or producing different output).
+        :param header_digest: digest of the document header the choice was made for.
+        """
+        self.engine = engine
+        self.timings = timings
+        self.header_digest = header_digest
+
+
+def header_digest(header: str) -> str:
+    return hashlib.sha256(header.encode()).hexdigest()
+
+
+def load_engine_record(temp_dir_path: str, doc_name: str) -> Optional[EngineRecord]:
+    """
+    :return: recorded engine choice for the document (None if it has never been made).
+    """
+    try:
+        with open(_records_path(temp_dir_path), 'r') as records_file:
+            record = json.load(records_file).get(doc_name)
+    except (OSError, ValueError):
+        return None
+
+    if not record:
+        return None
+    return EngineRecord(record["engine"], record["timings"], record["header"])
+
+
+def save_engine_record(temp_dir_path: str, doc_name: str, record: EngineRecord):
+    records_path = _records_path(temp_dir_path)
+    try:
+        with open(records_path, 'r') as records_file:
+            records = json.load(records_file)
+    except (OSError, ValueError):
+        records = {}
+
+    records[doc_name] = {"engine": record.engine, "timings": record.timings, "header": record.header_digest}
+    os.makedirs(os.path.dirname(records_path), exist_ok=True)
+    tmp_path = records_path + ".tmp"
+    try:
+        with open(tmp_path, 'w') as records_file:
+            json.dump(records, records_file, indent=1)
+        os.replace(tmp_path, records_path)
+    except OSError:
+        pass  # the record is only an optimization
+
+
+def _records_path(temp_dir_path: str) -> str:
+    return os.path.join(temp_dir_path, CACHE_SUBDIR_NAME, ENGINES_FILE_NAME)
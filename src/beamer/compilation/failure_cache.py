@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import re
+import time
+from threading import Lock
+from typing import Optional, List
+
+from .tex_log import TexMessage
+from .workspace import TEMP_DIR_NAME, source_dir_of
+
+
+CACHE_SUBDIR_NAME = "bb-cache"
+FAILURES_FILE_NAME = "failures.json"
+MAX_ENTRY_AGE = 30 * 24 * 3600  # seconds
+STANDALONE_DOCUMENT_EXTENSION = ".tex"
+
+# Standalone documents (the compiled deck itself, its saved versions) can't be inputs of a frame
+_DOCUMENT_CLASS_REGEX = re.compile(r"^[ \t]*\\documentclass\b", re.MULTILINE)
+
+
+class FailureCache:
+    """Persistent record of frame versions that failed to compile, so that they are not compiled again in subsequent
+        sessions. Entries are keyed by a digest of the version source code, TeX engine and document inputs - whenever
+        any of them changes, previous failures no longer apply."""
+    _INSTANCES = {}
+    _INSTANCES_LOCK = Lock()
+
+    @classmethod
+    def for_workspace(cls, temp_dir_path: str):
+        """
+        :return: failure cache of the given temporary directory (shared by all callers).
+        """
+        with cls._INSTANCES_LOCK:
+            if temp_dir_path not in cls._INSTANCES:
+                cls._INSTANCES[temp_dir_path] = FailureCache(temp_dir_path)
+            return cls._INSTANCES[temp_dir_path]
+
+    def __init__(self, temp_dir_path: str):
+        self._file_path = os.path.join(temp_dir_path, CACHE_SUBDIR_NAME, FAILURES_FILE_NAME)
+        self._inputs_digest = _inputs_digest(source_dir_of(temp_dir_path))
+        self._lock = Lock()
+        self._entries = self._load()
+
+    def key(self, source_digest: str, engine: str, resource_path: str = "") -> str:
+        """
+        :param source_digest: digest of the full source code of the compiled document.
+        :param engine: name of the TeX engine.
+        :param resource_path: path to an additional generated resource used by the document (if any).
+        :return: key identifying the compilation in the cache.
+        """
+        key = hashlib.sha256()
+        for part in (source_digest, engine, self._inputs_digest, _file_digest(resource_path)):
+            key.update(part.encode())
+            key.update(b"\0")
+        return key.hexdigest()
+
+    def lookup(self, key: str) -> Optional[List[TexMessage]]:
+        """
+        :return: errors of the known failed compilation, or None if the compilation isn't known to fail.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+        return [TexMessage(error["kind"], error["text"], error["line"]) for error in entry["errors"]]
+
+    def add(self, key: str, errors: List[TexMessage]):
+        """
+        Records a failed compilation. Failures caused by exceeding the time limit are not recorded,
+        as they might not happen again.
+        """
+        if any(error.kind == TexMessage.TIMEOUT for error in errors):
+            return
+
+        with self._lock:
+            self._entries[key] = {
+                "time": time.time(),
+                "errors": [{"kind": error.kind, "text": error.text, "line": error.line} for error in errors]
+            }
+            self._save()
+
+    def _load(self) -> dict:
+        try:
+            with open(self._file_path, 'r') as cache_file:
+                entries = json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+
+        now = time.time()
+        return {key: entry for key, entry in entries.items() if now - entry.get("time", 0) < MAX_ENTRY_AGE}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self._file_path), exist_ok=True)
+        tmp_path = self._file_path + ".tmp"
+        try:
+            with open(tmp_path, 'w') as cache_file:
+                json.dump(self._entries, cache_file)
+            os.replace(tmp_path, self._file_path)
+        except OSError:
+            pass  # the cache is only an optimization
+
+
+def _inputs_digest(source_dir: Optional[str]) -> str:
+    """
+    :return: digest of names, sizes and modification times of all files in the source directory which might be inputs
+    of the frames. Standalone documents (e.g. the compiled deck, whose frame sources are already a part of the keys,
+    and its saved versions) are skipped, so that editing or saving the deck doesn't invalidate all failures.
+    """
+    digest = hashlib.sha256()
+    if not source_dir or not os.path.isdir(source_dir):
+        return digest.hexdigest()
+
+    for dir_path, dir_names, file_names in os.walk(source_dir):
+        dir_names[:] = sorted(name for name in dir_names if not name.startswith(TEMP_DIR_NAME))
+        for file_name in sorted(file_names):
+            if _is_standalone_document(os.path.join(dir_path, file_name)):
+                continue
+            stat = os.stat(os.path.join(dir_path, file_name))
+            digest.update(f"{os.path.relpath(dir_path, source_dir)}/{file_name}:{stat.st_size}:{stat.st_mtime_ns}\0"
+                          .encode())
+    return digest.hexdigest()
+
+
+def _is_standalone_document(path: str) -> bool:
+    if not path.endswith(STANDALONE_DOCUMENT_EXTENSION):
+        return False
+    try:
+        with open(path, "r", errors="replace") as document_file:
+            return _DOCUMENT_CLASS_REGEX.search(document_file.read()) is not None
+    except OSError:
+        return False
+
+
+def _file_digest(path: str) -> str:
+    if not path or not os.path.isfile(path):
+        return ""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
@@ -1,16 +1,41 @@
-from typing import List
+import atexit
+import time
+from contextlib import nullcontext
+from typing import List, Optional
 from threading import Thread, Lock
 
 from src.beamer.frame.frame import Frame
-from src.beamer.graphics import pixmap_from_document
-from .loading_handler_iface import PriorityLoadTask, BackgroundRegenerationTask, IPageLoadingHandler
+from src.beamer.graphics import are_fingerprints_similar
+from src.beamer.page_getter import PageGetter
+from src.beamer.previews import composite_background, palette_colors, color_set_palette, recolor_page
+from .loading_handler_iface import PriorityLoadTask, BackgroundRegenerationTask, CombinedPreviewTask, \
+    IPageLoadingHandler
+from .prefetch import PrefetchPolicy
+
+
+OVERFLOW_TOLERANCE = 5.0  # points of overfull boxes an improvement may add to the original version before it's dropped
+UNDERFULL_BADNESS_THRESHOLD = 10000  # badness of the underfull boxes considered broken (10000 - infinitely bad)
+UNDERFULL_TOLERANCE = 1  # broken underfull boxes an improvement may add to the original version before it's dropped
 
 
 class PageLoadingHandler(IPageLoadingHandler):
     """A multi-threaded handler for performing compilation & loading tasks in the background."""
+    _SINGLE_OVERLAY_PREVIEWS = True
+
+    @classmethod
+    def set_single_overlay_previews(cls, enabled: bool):
+        """
+        :param enabled: whether improvements of frames with many pages (overlays) should be previewed by compiling only
+        the viewed page - compilation of the whole frame is deferred until another page of the frame is viewed.
+        """
+        cls._SINGLE_OVERLAY_PREVIEWS = enabled
+
     def __init__(self):
         self._frames = []
         self._compiled_indexes = set()
+        self._previewed_pages = {}  # frame index -> indexes of the pages previewed with single-page compilations
+        self._swept_indexes = set()
+        self._prefetch = None
 
         self._priority_task = None
         self._priority_lock = Lock()
@@ -18,16 +43,31 @@ class PageLoadingHandler(IPageLoadingHandler):
         self._finished_lock = Lock()
         self._compiling_thread_finished = False
 
+        self._combined_task = None
+        self._combined_lock = Lock()
+        self._combined_thread_running = False
+
     def init_frames(self, frames: List[Frame]):
         if self._frames:
             raise RuntimeError("The list can be initialized only once!")
         self._frames = frames
+        self._prefetch = PrefetchPolicy(len(frames))
 
     def start(self):
+        atexit.register(self._report_prefetch)
         thread = Thread(target=self._run)
         thread.start()
 
+    def prefetch_policy(self) -> PrefetchPolicy:
+        return self._prefetch
+
     def set_priority_task(self, priority_task: PriorityLoadTask):
+        if not isinstance(priority_task, BackgroundRegenerationTask):
+            # Frames compiled page-by-page are compiled only once the user views them, so they can't be prefetched
+            is_ready = None if self._defers_full_compilation(self._frames[priority_task.frame_idx]) \
+                else priority_task.frame_idx in self._compiled_indexes
+            self._prefetch.on_navigation(priority_task.frame_idx, is_ready)
+
         if not isinstance(priority_task, BackgroundRegenerationTask) and priority_task.frame_idx in self._compiled_indexes:
             # Speed-up possible - the new thread will only read already compiled data
             thread = Thread(target=self._compile_frame_with_output, args=(priority_task,))
@@ -45,15 +85,62 @@ class PageLoadingHandler(IPageLoadingHandler):
         thread = Thread(target=self._compile_priority)
         thread.start()
 
+    def set_combined_preview_task(self, preview_task: CombinedPreviewTask):
+        """
+        Requests rendering of the page in the currently selected combination of improvements. The previews are handled
+        by a separate thread, which serves only the latest request - requests replaced before being started are dropped.
+        """
+        with self._combined_lock:
+            self._combined_task = preview_task
+            if self._combined_thread_running:
+                return
+            self._combined_thread_running = True
+
+        thread = Thread(target=self._run_combined_previews, daemon=True)
+        thread.start()
+
+    def _run_combined_previews(self):
+        while True:
+            with self._combined_lock:
+                task = self._combined_task
+                self._combined_task = None
+                if task is None:
+                    self._combined_thread_running = False
+                    return
+
+            # Waits until the loading thread (or a speculative compilation) finishes generating the improvements
+            # of the frame, see Frame.improvements_lock
+            version = self._frames[task.frame_idx].combined_version()
+            task.page_getter.add_combined_version(version.render_page(task.page_idx) if version.doc() else None)
+
     def _run(self):
-        for idx in range(len(self._frames)):
+        while True:
             while self._compile_priority():
                 pass
 
+            idx = self._next_frame_to_compile()
+            if idx is None:
+                break
+
+            was_compiled = idx in self._compiled_indexes
+            start = time.monotonic()
             self._compile_frame_silent(idx)
+            if not was_compiled and idx in self._compiled_indexes:
+                self._prefetch.on_frame_compiled(time.monotonic() - start)
 
         self._safe_finish_work()
 
+    def _next_frame_to_compile(self) -> Optional[int]:
+        """
+        :return: index of the next frame to be compiled in the background - frames ahead of the user go first
+        (see PrefetchPolicy), the remaining ones in order. None if all frames have been handled.
+        """
+        for idx in self._prefetch.window() + list(range(len(self._frames))):
+            if idx not in self._swept_indexes:
+                self._swept_indexes.add(idx)
+                return idx
+        return None
+
     def _compile_priority(self) -> bool:
         with self._priority_lock:
             resolved_priority = self._priority_task
@@ -72,18 +159,28 @@ class PageLoadingHandler(IPageLoadingHandler):
         return True
 
     def _compile_frame_silent(self, frame_idx: int):
-        if frame_idx in self._compiled_indexes:
+        frame = self._frames[frame_idx]
+        if frame_idx in self._compiled_indexes or self._defers_full_compilation(frame):
             return
 
-        for improvements in (self._frames[frame_idx].local_improvements(),
-                             self._frames[frame_idx].background_improvements(),
-                             self._frames[frame_idx].global_improvements()):
+        for improvements in (frame.local_improvements(),
+                             frame.background_improvements(),
+                             frame.global_improvements()):
+
+            with frame.improvements_lock():
+                if not improvements.all_improvements():
+                    improvements.generate_improvements()
+                versions = list(improvements.all_improvements())
 
-            if not improvements.all_improvements():
-                improvements.generate_improvements()
+            useful_versions = []
+            useless_versions = []
+            for version in versions:
+                if _is_useless(version, improvements, frame.original_version(), useful_versions):
+                    useless_versions.append(version)
+                else:
+                    useful_versions.append(version)
 
-            for version in improvements.all_improvements():
-                version.compile()
+            _remove_improvements(improvements, useless_versions, frame.improvements_lock())
 
         self._compiled_indexes.add(frame_idx)
 
@@ -93,23 +190,53 @@ class PageLoadingHandler(IPageLoadingHandler):
             return
 
         frame = self._frames[task_info.frame_idx]
-        for improvements, notify_slot in ((frame.local_improvements(), task_info.page_getter.add_local_version),
-                                          (frame.background_improvements(), task_info.page_getter.add_background_version),
-                                          (frame.global_improvements(), task_info.page_getter.add_global_version)):
-            regenerate = task_info.frame_idx not in self._compiled_indexes
-            _compile_improvements_category_with_output(improvements, notify_slot, task_info.page_idx, regenerate)
-
-        self._compiled_indexes.add(task_info.frame_idx)
+        previewed_pages = self._previewed_pages.get(task_info.frame_idx, set())
+        regenerate = task_info.frame_idx not in self._compiled_indexes and not previewed_pages
+        preview = task_info.frame_idx not in self._compiled_indexes and self._defers_full_compilation(frame) \
+            and previewed_pages <= {task_info.page_idx}
+
+        page_getter = task_info.page_getter
+        for improvements, notify_slot, instant in ((frame.local_improvements(), page_getter.add_local_version, None),
+                                                   (frame.background_improvements(),
+                                                    page_getter.add_background_version,
+                                                    _InstantBackgroundPreviews(frame, task_info.page_idx, page_getter)),
+                                                   (frame.global_improvements(), page_getter.add_global_version,
+                                                    _InstantColorPreviews(frame, task_info.page_idx, page_getter))):
+            _compile_improvements_category_with_output(improvements, notify_slot, task_info.page_idx,
+                                                       regenerate, frame.original_version(), preview, instant,
+                                                       frame.improvements_lock())
+
+        if preview:
+            self._previewed_pages.setdefault(task_info.frame_idx, set()).add(task_info.page_idx)
+        else:
+            self._compiled_indexes.add(task_info.frame_idx)
 
     def _regenerate_backgrounds_with_output(self, task_info: BackgroundRegenerationTask):
-        self._compiled_indexes.remove(task_info.frame_idx)
+        self._compiled_indexes.discard(task_info.frame_idx)
+        self._previewed_pages.pop(task_info.frame_idx, None)
 
-        improvements = self._frames[task_info.frame_idx].background_improvements()
+        frame = self._frames[task_info.frame_idx]
         notify_slot = task_info.page_getter.add_background_version
-        _compile_improvements_category_with_output(improvements, notify_slot, task_info.page_idx, True)
+        instant_previews = _InstantBackgroundPreviews(frame, task_info.page_idx, task_info.page_getter)
+        _compile_improvements_category_with_output(frame.background_improvements(), notify_slot,
+                                                   task_info.page_idx, True, frame.original_version(),
+                                                   instant_previews=instant_previews,
+                                                   improvements_lock=frame.improvements_lock())
 
         self._compiled_indexes.add(task_info.frame_idx)
 
+    def _defers_full_compilation(self, frame: Frame) -> bool:
+        """
+        :return: True if the improvements of the frame should be compiled page-by-page, until the user pages through it.
+        """
+        code = frame.original_code()
+        return self._SINGLE_OVERLAY_PREVIEWS and frame.page_count() > 1 and not code.has_overlay_spec() \
+            and not code.allows_frame_breaks()
+
+    def _report_prefetch(self):
+        if self._prefetch.hits or self._prefetch.misses:
+            print(f"Prefetch: {self._prefetch}.")
+
     def _safe_finish_work(self):
         """Try to set finished flag, but compile any priorities if they arise in the meantime."""
         any_remaining_priorities = True
@@ -126,20 +253,208 @@ class PageLoadingHandler(IPageLoadingHandler):
             self._priority_lock.release()
 
 
-def _compile_improvements_category_with_output(improvements, notify_slot, page_idx, regenerate):
-    if regenerate:
-        improvements_source = improvements.improvements_generator()
-    else:
-        improvements_source = improvements.all_improvements()
+class _InstantPreviews:
+    """Approximations of the improvements of a page, made from the render of the original page. They are sent
+        to the page getter before the improvements are compiled, and replaced by the compiled pages afterwards."""
+    def __init__(self, frame: Frame, page_idx: int, page_getter: PageGetter):
+        self._original_version = frame.original_version()
+        self._page_idx = page_idx
+        self._page_getter = page_getter
+        self._original_page = None
+
+    def show(self, versions) -> bool:
+        """
+        Sends the approximations of all the versions to the page getter, in order. Either all of them are sent
+        or none, so that the positions of the approximations match the positions of the versions.
+        :return: False if the approximations couldn't be made.
+        """
+        if not versions or not self._is_accepted():
+            return False
+
+        if self._original_page is None:
+            self._original_page = self._original_version.render_page(self._page_idx)
+        pixmaps = []
+        for version in versions:
+            pixmap = self._approximate(version, self._original_page)
+            if pixmap is None:
+                return False
+            pixmaps.append(pixmap)
+
+        for pixmap in pixmaps:
+            self._add(pixmap)
+        return True
+
+    def replace(self, position: int, pixmap):
+        raise NotImplementedError("Override in subclasses")
+
+    def remove(self, position: int):
+        raise NotImplementedError("Override in subclasses")
+
+    def _is_accepted(self) -> bool:
+        raise NotImplementedError("Override in subclasses")
+
+    def _approximate(self, version, original_page):
+        raise NotImplementedError("Override in subclasses")
+
+    def _add(self, pixmap):
+        raise NotImplementedError("Override in subclasses")
+
 
+class _InstantBackgroundPreviews(_InstantPreviews):
+    """Background versions composited with the original page (see previews.composite_background)."""
+    def __init__(self, frame: Frame, page_idx: int, page_getter: PageGetter):
+        super().__init__(frame, page_idx, page_getter)
+        self._improvements = frame.background_improvements()
+
+    def replace(self, position: int, pixmap):
+        self._page_getter.replace_background_version(position, pixmap)
+
+    def remove(self, position: int):
+        self._page_getter.remove_background_version(position)
+
+    def _is_accepted(self) -> bool:
+        return self._page_getter.accepts_background_previews()
+
+    def _approximate(self, version, original_page):
+        return composite_background(original_page, self._improvements.background_image_path(version))
+
+    def _add(self, pixmap):
+        self._page_getter.add_background_version(pixmap)
+
+
+class _InstantColorPreviews(_InstantPreviews):
+    """Color sets applied to the original page by remapping its palette (see previews.recolor_page)."""
+    def __init__(self, frame: Frame, page_idx: int, page_getter: PageGetter):
+        super().__init__(frame, page_idx, page_getter)
+        self._original_palette = None
+
+    def replace(self, position: int, pixmap):
+        self._page_getter.replace_global_version(position, pixmap)
+
+    def remove(self, position: int):
+        self._page_getter.remove_global_version(position)
+
+    def _is_accepted(self) -> bool:
+        return self._page_getter.accepts_global_previews()
+
+    def _approximate(self, version, original_page):
+        if self._original_palette is None:
+            self._original_palette = palette_colors(original_page)
+        target_palette = color_set_palette(version.code().global_color_defs)
+        if not self._original_palette or not target_palette:
+            return None  # nothing to remap - the approximation would be identical to the original
+        return recolor_page(original_page, self._original_palette, target_palette)
+
+    def _add(self, pixmap):
+        self._page_getter.add_global_version(pixmap)
+
+
+def _compile_improvements_category_with_output(improvements, notify_slot, page_idx, regenerate, original_version,
+                                               preview=False, instant_previews=None, improvements_lock=None):
+    """
+    Compiles the improvements (if necessary), removes the useless ones and sends the page of the remaining ones
+    to the slot.
+    :param preview: whether only the requested page of each improvement should be compiled (see
+    FrameCompiler.overlay_version). Improvements that are similar to others are not removed in this mode, as they might
+    differ on the other pages. If the page doesn't compile on its own, the whole improvement is compiled instead.
+    :param instant_previews: _InstantPreviews of the improvements. The approximations of all improvements are shown
+    before any of them is compiled, and replaced by the compiled pages one by one.
+    :param improvements_lock: lock guarding the list of the improvements (see Frame.improvements_lock). It's held only
+    while the list is generated or modified, not while the improvements are compiled.
+    """
+    with improvements_lock if improvements_lock is not None else nullcontext():
+        # The inputs of the instant previews (e.g. the background images) are generated with the improvements
+        if regenerate:
+            improvements_source = list(improvements.improvements_generator())
+        else:
+            improvements_source = list(improvements.all_improvements())
+
+    instant = False
+    if instant_previews is not None:
+        instant = any(not (version.overlay_version(page_idx) if preview else version).is_compiled()
+                      for version in improvements_source) and instant_previews.show(improvements_source)
+
+    useful_versions = []
     useless_versions = []
     for version in improvements_source:
-        doc = version.doc()
-        if not doc:
+        shown_version, shown_page_idx = (version.overlay_version(page_idx), 0) if preview else (version, page_idx)
+        position = len(useful_versions) + 1  # position among the displayed versions, after the original one
+
+        if preview and not _has_pages(shown_version):
+            # The overlay doesn't exist in the version (e.g. it has fewer overlays than the original one) - the whole
+            # version decides whether it's useful
+            shown_version, shown_page_idx = version, min(page_idx, max(version.page_count() - 1, 0))
+
+        if _is_useless(shown_version, improvements, original_version, useful_versions,
+                       compare=shown_version is version):
             useless_versions.append(version)
+            if instant:
+                instant_previews.remove(position)
             continue
-        pixmap = pixmap_from_document(doc, page_idx)
-        notify_slot(pixmap)
+        useful_versions.append(version)
+        pixmap = shown_version.render_page(shown_page_idx)
+        if instant:
+            instant_previews.replace(position, pixmap)
+        else:
+            notify_slot(pixmap)
+
+    _remove_improvements(improvements, useless_versions, improvements_lock)
+
+
+def _remove_improvements(improvements, versions, improvements_lock=None):
+    """
+    Removes the versions from the improvements, unless they have been regenerated in the meantime.
+    """
+    with improvements_lock if improvements_lock is not None else nullcontext():
+        for version in versions:
+            if version in improvements.all_improvements():
+                improvements.remove_improvement(version)
+
+
+def _has_pages(version) -> bool:
+    return version.doc() is not None and version.page_count() > 0
+
+
+def _is_useless(version, improvements, original_version, useful_versions, compare=True) -> bool:
+    """
+    Compiles the version and checks whether it is worth presenting to the user.
+    :param compare: whether the version should be compared with the original and the accepted versions.
+    :return: True if the version failed to compile, if its content overflows the page noticeably more than in the
+    original version (see OVERFLOW_TOLERANCE), if it contains more badly underfull boxes than the original version
+    (see UNDERFULL_BADNESS_THRESHOLD), or if it renders (nearly) identically to the original version or to any
+    of the already accepted versions.
+    """
+    if not version.doc():
+        return True
+
+    if not compare or not improvements.prunes_similar():
+        return False
+
+    if _adds_overflow(version, original_version):
+        print(f"Dropping improvement proposal overflowing the page: {version.layout_quality()}.")
+        return True
+
+    if _adds_underfull_boxes(version, original_version):
+        print(f"Dropping improvement proposal with badly underfull boxes: {version.layout_quality()}.")
+        return True
+
+    fingerprint = version.fingerprint()
+    return any(are_fingerprints_similar(fingerprint, reference.fingerprint())
+               for reference in [original_version] + useful_versions)
+
+
+def _adds_overflow(version, original_version) -> bool:
+    quality = version.layout_quality()
+    original_quality = original_version.layout_quality()
+    if quality is None or original_quality is None:
+        return False
+    return quality.overflow > original_quality.overflow + OVERFLOW_TOLERANCE
+
 
-    for version_to_remove in useless_versions:
-        improvements.remove_improvement(version_to_remove)
+def _adds_underfull_boxes(version, original_version) -> bool:
+    quality = version.layout_quality()
+    original_quality = original_version.layout_quality()
+    if quality is None or original_quality is None:
+        return False
+    return quality.underfull_count_from(UNDERFULL_BADNESS_THRESHOLD) > \
+        original_quality.underfull_count_from(UNDERFULL_BADNESS_THRESHOLD) + UNDERFULL_TOLERANCE
@@ -12,6 +12,14 @@ class BackgroundRegenerationTask(PriorityLoadTask):
     pass
 
 
+class CombinedPreviewTask(PriorityLoadTask):
+    """Rendering of the page in the currently selected combination of all improvements."""
+    pass
+
+
 class IPageLoadingHandler:
     def set_priority_task(self, priority_task: PriorityLoadTask):
         raise NotImplementedError("Override in subclass")
+
+    def set_combined_preview_task(self, preview_task: CombinedPreviewTask):
+        raise NotImplementedError("Override in subclass")
@@ -0,0 +1,103 @@
+import math
+import time
+from collections import deque
+from threading import Lock
+from typing import List, Optional
+
+
+class PrefetchPolicy:
+    """Decides which frames should be compiled ahead of the user, based on the direction and speed of navigation
+        between frames and on the measured compilation time of a frame. Also counts how often the user arrives
+        at a frame whose improvements are already compiled (prefetch hits)."""
+    MIN_FRAMES_AHEAD = 1
+    MAX_FRAMES_AHEAD = 8
+    NAVIGATION_HISTORY = 5  # number of recent frame changes used to estimate the navigation speed
+    LATENCY_SMOOTHING = 0.3  # weight of the newest measurement in the average compilation time
+
+    def __init__(self, frame_count: int, clock=time.monotonic):
+        """
+        :param frame_count: number of frames in the document.
+        :param clock: source of time, in seconds.
+        """
+        self._frame_count = frame_count
+        self._clock = clock
+        self._lock = Lock()
+        self._history = deque(maxlen=self.NAVIGATION_HISTORY)  # tuples (time, frame index)
+        self._current_frame = 0
+        self._direction = 1
+        self._latency = None  # average compilation time of a frame, in seconds
+        self.hits = 0
+        self.misses = 0
+
+    def on_navigation(self, frame_idx: int, is_ready: Optional[bool]):
+        """
+        Notifies that the user has requested a page of the frame.
+        :param is_ready: whether the improvements of the frame have been already compiled, or None if the frame
+        isn't compiled ahead of the user at all (it's not counted as a hit or a miss).
+        """
+        with self._lock:
+            if self._history and self._history[-1][1] == frame_idx:
+                return  # paging within the same frame
+
+            if self._history:
+                self._direction = 1 if frame_idx > self._history[-1][1] else -1
+                if is_ready:
+                    self.hits += 1
+                elif is_ready is not None:
+                    self.misses += 1
+
+            self._history.append((self._clock(), frame_idx))
+            self._current_frame = frame_idx
+
+    def on_frame_compiled(self, duration: float):
+        """
+        Notifies that compilation of the improvements of a frame has taken the given time (in seconds).
+        """
+        with self._lock:
+            if self._latency is None:
+                self._latency = duration
+            else:
+                self._latency += self.LATENCY_SMOOTHING * (duration - self._latency)
+
+    def navigation_speed(self) -> float:
+        """
+        :return: recent speed of navigation, in frames per second.
+        """
+        with self._lock:
+            return self._navigation_speed()
+
+    def frames_ahead(self) -> int:
+        """
+        :return: number of frames which should be compiled ahead of the user - enough to cover the frames the user
+        passes while a single frame is being compiled.
+        """
+        with self._lock:
+            if self._latency is None:
+                return self.MIN_FRAMES_AHEAD
+            ahead = math.ceil(self._navigation_speed() * self._latency)
+            return max(self.MIN_FRAMES_AHEAD, min(self.MAX_FRAMES_AHEAD, ahead))
+
+    def window(self) -> List[int]:
+        """
+        :return: indexes of the frames ahead of the user (in the direction of navigation), nearest first.
+        """
+        ahead = self.frames_ahead()
+        with self._lock:
+            frames = [self._current_frame + self._direction * distance for distance in range(ahead + 1)]
+        return [idx for idx in frames if 0 <= idx < self._frame_count]
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __repr__(self):
+        return f"{self.hits} of {self.hits + self.misses} frames ready on arrival ({100 * self.hit_rate():.0f}%)"
+
+    def _navigation_speed(self) -> float:
+        if len(self._history) < 2:
+            return 0.0
+        elapsed = self._clock() - self._history[0][0]  # slows down when the user stops
+        if elapsed <= 0:
+            return 0.0
+        # Frame changes are counted (not the distance), so that jumps to distant frames don't count as fast navigation
+        return (len(self._history) - 1) / elapsed
@@ -0,0 +1,106 @@
+import os
+from threading import Thread
+
+from PIL import Image
+
+from .failure_cache import CACHE_SUBDIR_NAME
+from .remote import referenced_assets
+from .workspace import source_dir_of, register_input_dir
+
+
+PROXIES_SUBDIR_NAME = "proxies"
+PROXY_MAX_SIZE = 1024  # pixels - larger images are downsampled to fit in a square of that size
+PROXY_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+PROXY_JPEG_QUALITY = 85
+DEFAULT_DPI = 72  # resolution assumed by TeX engines for images without resolution information
+
+_enabled = True
+
+
+def configure_proxy_images(enabled: bool):
+    """
+    :param enabled: whether previews of documents opened afterwards are compiled with downsampled proxies
+    of large images (saved documents always refer to the original images).
+    """
+    global _enabled
+    _enabled = enabled
+
+
+def prepare_proxy_images(temp_dir_path: str, source: str) -> int:
+    """
+    Creates (or updates) downsampled proxies of the large images referenced by the document, and makes
+    the compilations in the temporary directory use them instead of the originals. Proxies keep the physical dimensions
+    of the originals (their resolution is decreased accordingly), so the layout of the compiled documents doesn't
+    change.
+    :param source: source code of the document (see remote.referenced_assets).
+    :return: number of created proxies.
+    """
+    source_dir = source_dir_of(temp_dir_path)
+    if not _enabled or not source_dir or not os.path.isdir(source_dir):
+        return 0
+
+    proxies_dir_path = os.path.join(temp_dir_path, CACHE_SUBDIR_NAME, PROXIES_SUBDIR_NAME)
+    created = 0
+    for rel_path, image_path in referenced_assets(source, [source_dir]).items():
+        if not rel_path.lower().endswith(PROXY_IMAGE_EXTENSIONS):
+            continue
+
+        proxy_path = os.path.join(proxies_dir_path, rel_path)
+        if os.path.exists(proxy_path) and os.path.getmtime(proxy_path) >= os.path.getmtime(image_path):
+            continue
+
+        try:
+            if _create_proxy(image_path, proxy_path):
+                created += 1
+            elif os.path.exists(proxy_path):
+                os.remove(proxy_path)  # the image is no longer large
+        except (OSError, ValueError) as error:
+            print(f'Failed to create a preview proxy of "{image_path}": {error}')
+
+    register_input_dir(temp_dir_path, proxies_dir_path)
+    return created
+
+
+def prepare_proxy_images_in_background(temp_dir_path: str, source: str):
+    """
+    Starts prepare_proxy_images in a background thread, so that opening the document isn't delayed. Compilations
+    use the original images until the proxies are ready.
+    """
+    thread = Thread(target=_prepare_and_report, args=(temp_dir_path, source), daemon=True)
+    thread.start()
+
+
+def _prepare_and_report(temp_dir_path: str, source: str):
+    created = prepare_proxy_images(temp_dir_path, source)
+    if created:
+        print(f'Created {created} downsampled image proxies for previews in "{temp_dir_path}".')
+
+
+def _create_proxy(image_path: str, proxy_path: str) -> bool:
+    """
+    :return: whether the proxy has been created (it isn't for images which are small enough).
+    """
+    with Image.open(image_path) as image:
+        scale = PROXY_MAX_SIZE / max(image.size)
+        if scale >= 1:
+            return False
+
+        # Resolution is stored as an integer, so the scale is adjusted to keep the physical dimensions exact
+        width, height = image.size
+        dpi_x, dpi_y = (value or DEFAULT_DPI for value in image.info.get("dpi", (DEFAULT_DPI, DEFAULT_DPI)))
+        proxy_dpi = (max(1, int(dpi_x * scale)), max(1, int(dpi_y * scale)))
+        proxy_size = (max(1, round(width * proxy_dpi[0] / dpi_x)), max(1, round(height * proxy_dpi[1] / dpi_y)))
+
+        proxy = image.resize(proxy_size, Image.LANCZOS)
+        options = {"dpi": proxy_dpi}
+        if image.format == "JPEG":
+            options["quality"] = PROXY_JPEG_QUALITY
+        if "icc_profile" in image.info:
+            options["icc_profile"] = image.info["icc_profile"]
+
+        os.makedirs(os.path.dirname(proxy_path), exist_ok=True)
+        tmp_path = proxy_path + ".tmp"
+        proxy.save(tmp_path, format=image.format, **options)
+        os.replace(tmp_path, proxy_path)
+
+    return True
@@ -0,0 +1,307 @@
+import hashlib
+import itertools
+import json
+import os
+import re
+import socket
+import struct
+import time
+from threading import Lock
+from typing import Optional, List, Dict, Iterable, Tuple
+
+from .tex_log import TexMessage
+
+
+PROTOCOL_VERSION = 2
+ENDPOINT_RETRY_DELAY = 30  # seconds - an unreachable endpoint isn't used for that long
+CONNECTION_TIMEOUT = 5  # seconds
+RESPONSE_TIMEOUT_MARGIN = 30  # seconds - added to the compilation timeout when waiting for the result
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+ASSET_EXTENSIONS = ("", ".tex", ".sty", ".cls", ".png", ".jpg", ".jpeg", ".pdf", ".eps", ".bib")
+TEXT_ASSET_EXTENSIONS = (".tex", ".sty", ".cls")  # searched for further references
+_THEME_FILE_PREFIXES = {"usetheme": "beamertheme", "usecolortheme": "beamercolortheme",
+                        "usefonttheme": "beamerfonttheme", "useinnertheme": "beamerinnertheme",
+                        "useoutertheme": "beameroutertheme"}
+_ARGUMENT_REGEX = re.compile(r"\\(\w+)\*?(?:\[[^\]]*\])?\{([^{}\\]+)\}")
+
+UNIX_ADDRESS_PREFIX = "unix:"
+TOKEN_ENVIRONMENT_VARIABLE = "BB_COMPILE_TOKEN"  # shared token of the compile servers and their clients
+
+
+_file_digests = {}  # path -> tuple ((size, modification time), content hash)
+_file_digests_lock = Lock()
+
+
+class LoadBalancing:
+    """Defines how compilations are distributed among the endpoints."""
+    ROUND_ROBIN = "round-robin"
+    LEAST_LOADED = "least-loaded"  # endpoint with the fewest compilations in progress
+
+
+class ProtocolError(ConnectionError):
+    pass
+
+
+class RemoteUnavailable(ConnectionError):
+    """None of the endpoints could perform the compilation - it should be performed locally."""
+    pass
+
+
+class RemoteResult:
+    """Outcome of a remote compilation."""
+    def __init__(self, pdf: Optional[bytes], errors: List[TexMessage], message=""):
+        """
+        :param pdf: contents of the compiled PDF file (None if the compilation failed).
+        :param errors: errors reported by the TeX engine.
+        :param message: description of the failure.
+        """
+        self.pdf = pdf
+        self.errors = errors
+        self.message = message
+
+
+def parse_address(address: str):
+    """
+    :param address: "unix:<socket path>" or "<host>:<port>".
+    :return: tuple (socket family, socket address).
+    """
+    if address.startswith(UNIX_ADDRESS_PREFIX):
+        return socket.AF_UNIX, address[len(UNIX_ADDRESS_PREFIX):]
+
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Invalid compile server address: {address}")
+    return socket.AF_INET, (host, int(port))
+
+
+def send_message(sock: socket.socket, header: dict, blobs: Iterable[bytes] = ()):
+    """
+    Sends a message: a length-prefixed JSON header, followed by the binary blobs (their sizes are listed in the header).
+    """
+    blobs = list(blobs)
+    data = json.dumps(dict(header, blobs=[len(blob) for blob in blobs])).encode()
+    sock.sendall(struct.pack("!I", len(data)) + data)
+    for blob in blobs:
+        sock.sendall(blob)
+
+
+def receive_message(sock: socket.socket) -> Tuple[dict, List[bytes]]:
+    """
+    :return: tuple (header, blobs) of a message sent with send_message.
+    """
+    size, = struct.unpack("!I", _receive_exactly(sock, 4))
+    if size > MAX_MESSAGE_SIZE:
+        raise ProtocolError(f"Message header too large: {size} bytes")
+    header = json.loads(_receive_exactly(sock, size))
+
+    blobs = []
+    for blob_size in header.get("blobs", []):
+        if blob_size > MAX_MESSAGE_SIZE:
+            raise ProtocolError(f"Message blob too large: {blob_size} bytes")
+        blobs.append(_receive_exactly(sock, blob_size))
+    return header, blobs
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """
+    :return: content hash of the file. Hashes are cached by the size and modification time of the file, so unchanged
+    assets are not read again for every compilation.
+    """
+    stat = os.stat(path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    with _file_digests_lock:
+        cached_version, digest = _file_digests.get(path, (None, None))
+    if cached_version != version:
+        with open(path, "rb") as file:
+            digest = content_digest(file.read())
+        with _file_digests_lock:
+            _file_digests[path] = (version, digest)
+    return digest
+
+
+def errors_to_json(errors: Iterable[TexMessage]) -> list:
+    return [{"kind": error.kind, "text": error.text, "line": error.line} for error in errors]
+
+
+def errors_from_json(errors: list) -> List[TexMessage]:
+    return [TexMessage(error["kind"], error["text"], error.get("line")) for error in errors]
+
+
+def referenced_assets(source: str, search_dirs: List[str]) -> Dict[str, str]:
+    """
+    Finds the files referenced by the TeX source (graphics, inputs, local packages and themes) - any braced argument
+    which resolves to an existing file in one of the search directories is considered a reference. Referenced TeX
+    files are searched recursively.
+    :return: dict: path relative to the document (as referenced) -> absolute path of the file.
+    """
+    assets = {}
+    pending = [source]
+    while pending:
+        for command, argument in _ARGUMENT_REGEX.findall(pending.pop()):
+            for name in (part.strip() for part in argument.split(",")):
+                if not name or os.path.isabs(name) or ".." in name.split("/"):
+                    continue
+                if command in _THEME_FILE_PREFIXES:
+                    name = _THEME_FILE_PREFIXES[command] + name + ".sty"
+
+                found = _find_asset(name, search_dirs)
+                if found and found[0] not in assets:
+                    assets[found[0]] = found[1]
+                    if found[0].endswith(TEXT_ASSET_EXTENSIONS):
+                        with open(found[1], "r", errors="replace") as asset_file:
+                            pending.append(asset_file.read())
+    return assets
+
+
+class _Endpoint:
+    def __init__(self, address: str):
+        self.address = address
+        self.in_flight = 0
+        self.down_until = 0.0
+
+    def is_up(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+
+class RemoteCompilerPool:
+    """Distributes compilations among compile servers (see compile_server.py). Source code is sent along with
+        the referenced assets, identified by their content hashes - servers only request the assets they don't have
+        yet. Unreachable endpoints are skipped for a while."""
+
+    def __init__(self, addresses: List[str], token: str, load_balancing=LoadBalancing.LEAST_LOADED):
+        """
+        :param addresses: addresses of the compile servers (see parse_address).
+        :param token: secret shared with the compile servers, authenticating the requests.
+        :param load_balancing: one of the LoadBalancing values.
+        """
+        if not token:
+            raise ValueError("Remote compilation requires a token shared with the compile servers")
+        for address in addresses:
+            parse_address(address)
+        self._endpoints = [_Endpoint(address) for address in addresses]
+        self._token = token
+        self._load_balancing = load_balancing
+        self._rotation = itertools.count()
+        self._lock = Lock()
+
+    def compile(self, src_doc_path: str, search_dirs: List[str], stop_on_error=False,
+                timeout: float = 120, engine: Optional[str] = None) -> RemoteResult:
+        """
+        Compiles the document on one of the endpoints (others are tried if it turns out to be unreachable).
+        :param src_doc_path: path to the TeX document.
+        :param search_dirs: directories in which the files referenced by the document are looked up.
+        :param engine: name of the TeX engine (None - default engine of the server).
+        :raises RemoteUnavailable: if none of the endpoints could perform the compilation.
+        """
+        with open(src_doc_path, "r") as src_file:
+            source = src_file.read()
+        assets = referenced_assets(source, search_dirs)
+
+        tried = set()
+        while True:
+            endpoint = self._acquire_endpoint(tried)
+            if not endpoint:
+                raise RemoteUnavailable(f"No compile server available for: {src_doc_path}")
+            tried.add(endpoint)
+
+            try:
+                return self._compile_on(endpoint, self._token, os.path.basename(src_doc_path), source, assets,
+                                        stop_on_error, timeout, engine)
+            except (OSError, ValueError) as error:
+                print(f"Compile server {endpoint.address} unavailable ({error}).")
+                endpoint.down_until = time.monotonic() + ENDPOINT_RETRY_DELAY
+            finally:
+                with self._lock:
+                    endpoint.in_flight -= 1
+
+    def _acquire_endpoint(self, excluded) -> Optional[_Endpoint]:
+        with self._lock:
+            candidates = [endpoint for endpoint in self._endpoints if endpoint.is_up() and endpoint not in excluded]
+            if not candidates:
+                return None
+
+            rotation = next(self._rotation)
+            candidates = candidates[rotation % len(candidates):] + candidates[:rotation % len(candidates)]
+            if self._load_balancing == LoadBalancing.LEAST_LOADED:
+                endpoint = min(candidates, key=lambda candidate: candidate.in_flight)
+            else:
+                endpoint = candidates[0]
+
+            endpoint.in_flight += 1
+            return endpoint
+
+    @staticmethod
+    def _compile_on(endpoint: _Endpoint, token: str, name: str, source: str, assets: Dict[str, str],
+                    stop_on_error: bool, timeout: float, engine: Optional[str]) -> RemoteResult:
+        asset_digests = {rel_path: file_digest(abs_path) for rel_path, abs_path in assets.items()}
+
+        family, address = parse_address(endpoint.address)
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CONNECTION_TIMEOUT)
+            sock.connect(address)
+            sock.settimeout(timeout + RESPONSE_TIMEOUT_MARGIN)
+
+            send_message(sock, {"type": "compile", "version": PROTOCOL_VERSION, "token": token, "name": name,
+                                "source": source, "assets": asset_digests, "stop_on_error": stop_on_error,
+                                "timeout": timeout, "engine": engine})
+            response, _ = receive_message(sock)
+            if response.get("type") != "need":
+                raise ProtocolError(f"Unexpected response: {response.get('type')}: {response.get('message', '')}")
+
+            needed = set(response["hashes"])
+            blobs = []
+            for rel_path, digest in asset_digests.items():
+                if digest in needed:
+                    needed.discard(digest)
+                    with open(assets[rel_path], "rb") as asset_file:
+                        blobs.append(asset_file.read())
+            send_message(sock, {"type": "assets"}, blobs)
+
+            result, result_blobs = receive_message(sock)
+            if result.get("type") != "result":
+                raise ProtocolError(f"Unexpected response: {result.get('type')}: {result.get('message', '')}")
+
+        return RemoteResult(result_blobs[0] if result["ok"] else None, errors_from_json(result["errors"]),
+                            result.get("message", ""))
+
+
+_pool = None
+
+
+def configure_remote_compilation(addresses: List[str], token: str, load_balancing=LoadBalancing.LEAST_LOADED):
+    """
+    :param addresses: addresses of the compile servers (empty - compile locally).
+    :param token: secret shared with the compile servers.
+    :param load_balancing: one of the LoadBalancing values.
+    """
+    global _pool
+    _pool = RemoteCompilerPool(addresses, token, load_balancing) if addresses else None
+
+
+def remote_compiler_pool() -> Optional[RemoteCompilerPool]:
+    return _pool
+
+
+def _find_asset(name: str, search_dirs: List[str]) -> Optional[Tuple[str, str]]:
+    for search_dir in search_dirs:
+        for extension in ASSET_EXTENSIONS:
+            path = os.path.join(search_dir, name + extension)
+            if os.path.isfile(path):
+                return name + extension, path
+    return None
+
+
+def _receive_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            raise ProtocolError("Connection closed unexpectedly")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
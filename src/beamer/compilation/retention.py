@@ -0,0 +1,117 @@
+import gzip
+import os
+import re
+import shutil
+from typing import Optional, Set
+
+from .workspace import source_dir_of
+
+
+RESOURCES_SUBDIR_NAME = "res"
+# Names of the files generated for the frames of a document ("<document>_frame0001_l0.tex") and for the benchmarks
+# of its engines ("<document>_engine_xelatex.tex")
+_ARTIFACT_NAME_PATTERN = r"{}_(frame\d+|engine)_"
+
+
+class LogRetentionPolicy:
+    """Defines which compilation logs are kept in the temporary directory."""
+    def __init__(self, keep_last: Optional[int] = 500, failures_only=False, compress=False):
+        """
+        :param keep_last: maximal number of kept logs - the oldest ones are removed (None - unlimited).
+        :param failures_only: whether logs of successful compilations should be removed right away.
+        :param compress: whether the kept logs should be compressed with gzip.
+        """
+        self.keep_last = keep_last
+        self.failures_only = failures_only
+        self.compress = compress
+
+
+_policy = LogRetentionPolicy()
+
+
+def set_log_retention_policy(policy: LogRetentionPolicy):
+    global _policy
+    _policy = policy
+
+
+def retain_log(log_path: str, succeeded: bool):
+    """
+    Applies the log retention policy to a log of a finished compilation.
+    :param log_path: path to the log file.
+    :param succeeded: whether the compilation was successful.
+    """
+    policy = _policy
+    if succeeded and policy.failures_only:
+        _remove_silently(log_path)
+        return
+
+    if policy.compress:
+        with open(log_path, 'rb') as log_file, gzip.open(log_path + ".gz", 'wb') as compressed_file:
+            shutil.copyfileobj(log_file, compressed_file)
+        _remove_silently(log_path)
+
+    if policy.keep_last is not None:
+        prune_logs(os.path.dirname(log_path), policy.keep_last)
+
+
+def prune_logs(logs_dir_path: str, keep_last: int) -> int:
+    """
+    Removes all logs except for the newest ones.
+    :return: number of freed bytes.
+    """
+    logs = [entry for entry in os.scandir(logs_dir_path) if entry.is_file()]
+    if len(logs) <= keep_last:
+        return 0
+
+    logs.sort(key=lambda entry: entry.stat().st_mtime)
+    freed = 0
+    for entry in logs[: len(logs) - keep_last]:
+        freed += _remove_silently(entry.path)
+    return freed
+
+
+def sweep_stale_artifacts(temp_dir_path: str, live_artifacts: Set[str], doc_name: Optional[str] = None) -> int:
+    """
+    Removes generated files that don't belong to any live frame version (e.g. left behind by previous sessions
+    or by regenerated improvements). Source files, logs and caches are left untouched.
+    :param temp_dir_path: path to the temporary directory.
+    :param live_artifacts: paths of the documents of live frame versions (without extension) and of the resources
+    they use (see FrameCompiler.live_artifacts).
+    :param doc_name: only the artifacts of the document with the given name are removed (temporary directory may be
+    shared by multiple documents, e.g. "talk" and "talk_v2"). None - artifacts of all documents.
+    :return: number of freed bytes.
+    """
+    source_dir = source_dir_of(temp_dir_path)
+    source_files = set(os.listdir(source_dir)) if source_dir and os.path.isdir(source_dir) else set()
+    name_regex = re.compile(_ARTIFACT_NAME_PATTERN.format(re.escape(doc_name) if doc_name is not None else ".+"))
+
+    freed = 0
+    for entry in os.scandir(temp_dir_path):
+        if not entry.is_file(follow_symlinks=False) or entry.name in source_files \
+                or not name_regex.match(entry.name):
+            continue
+        stem_path = os.path.join(temp_dir_path, entry.name.split('.')[0])
+        if stem_path not in live_artifacts:
+            freed += _remove_silently(entry.path)
+
+    resources_dir_path = os.path.join(temp_dir_path, RESOURCES_SUBDIR_NAME)
+    if RESOURCES_SUBDIR_NAME not in source_files and os.path.isdir(resources_dir_path):
+        for entry in os.scandir(resources_dir_path):
+            if entry.is_file(follow_symlinks=False) and name_regex.match(entry.name) \
+                    and entry.path not in live_artifacts:
+                freed += _remove_silently(entry.path)
+
+    return freed
+
+
+def _remove_silently(path: str) -> int:
+    """
+    Removes the file, ignoring errors.
+    :return: number of freed bytes.
+    """
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except OSError:
+        return 0
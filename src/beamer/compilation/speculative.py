@@ -0,0 +1,53 @@
+from threading import Thread, Lock
+from typing import List
+
+from src.beamer.frame.frame import Frame
+
+
+class SpeculativeCompiler:
+    """Compiles the frames in their currently selected combination of improvements in the background (at low
+        priority), so that the combinations are ready when the user views or saves them. Each call to schedule starts
+        a new pass over the frames and cancels the previous one - only the latest selection is worth compiling."""
+
+    def __init__(self, frames: List[Frame]):
+        self._frames = frames
+        self._lock = Lock()
+        self._generation = 0
+        self._start_frame_idx = 0
+        self._running = False
+
+    def schedule(self, start_frame_idx: int = 0):
+        """
+        Starts compiling all frames, beginning with the given one, cancelling any pass started earlier.
+        :param start_frame_idx: index of the frame compiled first (usually the one viewed by the user).
+        """
+        with self._lock:
+            self._generation += 1
+            self._start_frame_idx = max(0, min(start_frame_idx, len(self._frames) - 1))
+            if self._running:
+                return  # the running thread picks up the new generation
+            self._running = True
+
+        thread = Thread(target=self._run, daemon=True)
+        thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                generation = self._generation
+                start = self._start_frame_idx
+
+            for idx in range(len(self._frames)):
+                if self._is_outdated(generation):
+                    break
+                frame = self._frames[(start + idx) % len(self._frames)]
+                frame.combined_version().compile(low_priority=True)
+
+            with self._lock:
+                if self._generation == generation:
+                    self._running = False
+                    return
+
+    def _is_outdated(self, generation: int) -> bool:
+        with self._lock:
+            return self._generation != generation
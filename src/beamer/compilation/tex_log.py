@@ -0,0 +1,126 @@
+import re
+from typing import Optional, List
+
+
+_LINE_NUMBER_REGEX = re.compile(r"^l\.(\d+)")
+_BOX_WARNING_REGEX = re.compile(r"^(Overfull|Underfull) \\([hv])box \((?:([\d.]+)pt too \w+|badness (\d+))\)"
+                                r"(?:.*?lines? (\d+))?", re.MULTILINE)
+
+
+class TexMessage:
+    """A single diagnostic message reported by the TeX engine."""
+    ERROR = "error"
+    TIMEOUT = "timeout"
+    OVERFULL = "overfull"
+    UNDERFULL = "underfull"
+
+    def __init__(self, kind: str, text: str, line: Optional[int] = None):
+        """
+        :param kind: type of the message (one of the class constants).
+        :param text: message text (without the leading exclamation mark in case of errors).
+        :param line: number of the source line the message refers to (if known).
+        """
+        self.kind = kind
+        self.text = text
+        self.line = line
+
+    def __repr__(self):
+        location = f" (line {self.line})" if self.line is not None else ""
+        return f"{self.kind}: {self.text}{location}"
+
+
+class TexOutputParser:
+    """Incrementally parses the terminal output of a TeX engine, line by line."""
+    MAX_ERROR_CONTEXT_LINES = 5  # lines searched for the error location, after the error line itself
+
+    def __init__(self):
+        self._errors = []
+        self._pending_error = None
+        self._pending_lines = 0
+
+    def feed(self, line: str) -> Optional[TexMessage]:
+        """
+        Parses the next line of the output.
+        :return: an error message, if it has just been completely read (with its location, if available).
+        """
+        if self._pending_error:
+            match = _LINE_NUMBER_REGEX.match(line)
+            self._pending_lines += 1
+            if match:
+                self._pending_error.line = int(match.group(1))
+                return self._complete_error()
+            if line.startswith("!") or self._pending_lines >= self.MAX_ERROR_CONTEXT_LINES:
+                completed = self._complete_error()
+                self._start_error_if_present(line)
+                return completed
+            return None
+
+        self._start_error_if_present(line)
+        return None
+
+    def finish(self) -> Optional[TexMessage]:
+        """
+        Notifies that the whole output has been read.
+        :return: an error message that was still incomplete, if any.
+        """
+        return self._complete_error() if self._pending_error else None
+
+    def errors(self) -> List[TexMessage]:
+        """
+        :return: all completely read errors.
+        """
+        return self._errors
+
+    def _start_error_if_present(self, line: str):
+        if line.startswith("!"):
+            self._pending_error = TexMessage(TexMessage.ERROR, line[1:].strip())
+            self._pending_lines = 0
+
+    def _complete_error(self) -> TexMessage:
+        error = self._pending_error
+        self._errors.append(error)
+        self._pending_error = None
+        return error
+
+
+class BoxWarning(TexMessage):
+    """Warning about a box which doesn't fit its content well (overfull or underfull)."""
+    def __init__(self, kind: str, text: str, amount: float, line: Optional[int] = None):
+        """
+        :param amount: excess of the overfull box (in points), or badness of the underfull box.
+        """
+        super().__init__(kind, text, line)
+        self.amount = amount
+
+
+class LayoutQuality:
+    """Summary of the box warnings reported by the TeX engine for a document."""
+    def __init__(self, warnings: List[BoxWarning]):
+        self.warnings = warnings
+        self.overflow = sum(warning.amount for warning in warnings if warning.kind == TexMessage.OVERFULL)
+        self.overfull_count = sum(1 for warning in warnings if warning.kind == TexMessage.OVERFULL)
+        self.underfull_count = sum(1 for warning in warnings if warning.kind == TexMessage.UNDERFULL)
+
+    def underfull_count_from(self, badness: float) -> int:
+        """
+        :return: number of the underfull boxes with at least the given badness.
+        """
+        return sum(1 for warning in self.warnings if warning.kind == TexMessage.UNDERFULL and warning.amount >= badness)
+
+    def __repr__(self):
+        return f"{self.overflow:.1f}pt overflow in {self.overfull_count} boxes, {self.underfull_count} underfull boxes"
+
+
+def parse_box_warnings(log: str) -> List[BoxWarning]:
+    """
+    :param log: contents of the log file written by the TeX engine.
+    :return: all overfull and underfull box warnings from the log.
+    """
+    warnings = []
+    for match in _BOX_WARNING_REGEX.finditer(log):
+        overfull = match.group(1) == "Overfull"
+        amount = float(match.group(3)) if match.group(3) else float(match.group(4))
+        line = int(match.group(5)) if match.group(5) else None
+        warnings.append(BoxWarning(TexMessage.OVERFULL if overfull else TexMessage.UNDERFULL,
+                                   match.group(0), amount, line))
+    return warnings
@@ -0,0 +1,157 @@
+import atexit
+import hashlib
+import os
+import re
+from threading import Lock
+from typing import Optional, List
+
+from src.beamer.frame.code import FrameCode
+from .engines import TexEngine
+from .failure_cache import CACHE_SUBDIR_NAME
+
+
+TIKZ_SUBDIR_NAME = "tikz"
+FIGURE_NAME_PREFIX = "fig-"
+PICTURE_BEGIN = "\\begin{tikzpicture}"
+PICTURE_END = "\\end{tikzpicture}"
+
+_TIKZ_USAGE_REGEX = re.compile(r"\\usepackage(?:\[[^\]]*\])?\{[^}]*\b(tikz|pgfplots)\b")
+# Pictures depending on the overlay can't be externalized - a single image would be used on all slides
+_OVERLAY_REGEX = re.compile(r"<\s*[\d+.][\d+\-,.\s|]*>|\\(pause|only|onslide|uncover|visible|invisible|alt|temporal)\b")
+# Lines of the frame code which might change the appearance of the pictures
+_DEFINITIONS_REGEX = re.compile(r"^.*\\(newcommand|renewcommand|def|definecolor|colorlet|tikzset|tikzstyle|"
+                                r"pgfplotsset)\b.*$", re.MULTILINE)
+
+_enabled = False  # opt-in - externalization runs the TeX engine with shell escape, see configure_tikz_cache
+
+
+def configure_tikz_cache(enabled: bool):
+    """
+    :param enabled: whether TikZ pictures should be externalized into the shared figure cache. This requires running
+    the TeX engine with shell escape enabled, in order to compile the figures - any opened document could then run
+    arbitrary commands (via \\write18), so it should be enabled only for trusted documents.
+    """
+    global _enabled
+    _enabled = enabled
+
+
+class TikzCacheStats:
+    """Counts the externalized pictures found in the figure cache (hits) and compiled anew (misses)."""
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    def record(self, hits: int, misses: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def __repr__(self):
+        total = self.hits + self.misses
+        ratio = f", {100 * self.hits / total:.0f}% hit rate" if total else ""
+        return f"{self.hits} hits, {self.misses} misses{ratio}"
+
+
+_stats = TikzCacheStats()
+
+
+def tikz_cache_stats() -> TikzCacheStats:
+    return _stats
+
+
+class ExternalizedCode:
+    """Frame code with externalization of TikZ pictures enabled."""
+    def __init__(self, code: FrameCode, figure_names: List[str], cached: List[bool]):
+        """
+        :param code: code to be compiled instead of the original one.
+        :param figure_names: names of the externalized pictures.
+        :param cached: whether each of the pictures was already in the cache when the code was prepared.
+        """
+        self.code = code
+        self.figure_names = figure_names
+        self.cached = cached
+
+    def report_compiled(self):
+        """Records the cache statistics after a successful compilation."""
+        hits = sum(self.cached)
+        _stats.record(hits, len(self.cached) - hits)
+
+
+def externalize_pictures(code: FrameCode, engine: TexEngine,
+                         temp_dir_path: str) -> Optional[ExternalizedCode]:
+    """
+    Prepares the code for compilation with TikZ pictures externalized into the figure cache of the temporary directory.
+    Each picture is named after a digest of its code and everything else which might affect it (header, colors,
+    definitions in the frame and the engine), so the pictures which are not changed by a frame version are compiled
+    only once and reused by all versions, also in subsequent sessions.
+    :return: code to be compiled (with shell escape enabled), or None if there's nothing to externalize.
+    """
+    if not _enabled or not _TIKZ_USAGE_REGEX.search(code.header) or PICTURE_BEGIN not in code.base_code:
+        return None
+
+    context = hashlib.sha1()
+    for part in [engine.name, code.header, code.global_color_defs] + \
+            [match.group(0) for match in _DEFINITIONS_REGEX.finditer(code.base_code)]:
+        context.update(part.encode())
+        context.update(b"\0")
+
+    figures_dir_path = os.path.join(temp_dir_path, CACHE_SUBDIR_NAME, TIKZ_SUBDIR_NAME)
+    os.makedirs(figures_dir_path, exist_ok=True)
+
+    base_code = []
+    figure_names = []
+    position = 0
+    for begin, end in _top_level_pictures(code.base_code):
+        picture = code.base_code[begin:end]
+        if _OVERLAY_REGEX.search(picture):
+            continue
+
+        digest = context.copy()
+        digest.update(picture.encode())
+        figure_name = FIGURE_NAME_PREFIX + digest.hexdigest()[:20]
+
+        base_code.append(code.base_code[position:begin])
+        base_code.append(f"\\tikzsetnextfilename{{{figure_name}}}")
+        figure_names.append(figure_name)
+        position = begin
+
+    if not figure_names:
+        return None
+    base_code.append(code.base_code[position:])
+
+    prefix = f"{CACHE_SUBDIR_NAME}/{TIKZ_SUBDIR_NAME}/"
+    header = code.header + "\n" + "\n".join((
+        "\\usetikzlibrary{external}",
+        f"\\tikzexternalize[prefix={prefix}, only named=true]",
+        f"\\tikzset{{external/system call={{{engine.name} \\tikzexternalcheckshellescape -halt-on-error "
+        f"-interaction=batchmode -jobname \"\\image\" \"\\texsource\"}}}}"))
+
+    cached = [os.path.exists(os.path.join(figures_dir_path, name + ".pdf")) for name in figure_names]
+    return ExternalizedCode(FrameCode(header, "".join(base_code), code.global_color_defs, code.bg_img_path,
+                                      code.overlay), figure_names, cached)
+
+
+def _top_level_pictures(code: str):
+    """
+    :return: list of tuples (begin, end) - positions of the outermost TikZ pictures in the code.
+    """
+    pictures = []
+    depth = 0
+    begin = 0
+    for match in re.finditer(re.escape(PICTURE_BEGIN) + "|" + re.escape(PICTURE_END), code):
+        if match.group(0) == PICTURE_BEGIN:
+            if depth == 0:
+                begin = match.start()
+            depth += 1
+        elif depth > 0:
+            depth -= 1
+            if depth == 0:
+                pictures.append((begin, match.end()))
+    return pictures
+
+
+@atexit.register
+def _report_stats():
+    if _stats.hits or _stats.misses:
+        print(f"TikZ figure cache: {_stats}.")
@@ -0,0 +1,196 @@
+import atexit
+import glob
+import hashlib
+import itertools
+import os
+import subprocess
+from collections import deque
+from queue import Queue
+from threading import Lock, Thread
+from typing import Optional
+
+from .compilation import ENGINE_OUTPUT_OPTIONS, COMPILATION_TIMEOUT, finish_compilation, kill_engine
+from .engines import TexEngine, engine_for
+from .workspace import tex_environment
+
+
+WORKER_NAME_PREFIX = "bbworker"
+
+_workers_count = 0
+_pools = {}
+_pools_lock = Lock()
+
+
+def configure_warm_workers(count: int):
+    """
+    :param count: number of TeX engine processes kept warm for each document header (0 - disabled). Each process
+    serves a single job (see WarmWorkerPool), so there's no separate limit of jobs before a worker is recycled.
+    """
+    global _workers_count
+    _workers_count = count
+
+
+def shutdown_warm_workers(temp_dir_path: str):
+    """
+    Stops the workers of all pools in the temporary directory (e.g. when the document compiled there is closed).
+    """
+    with _pools_lock:
+        pools = [_pools.pop(key) for key in list(_pools) if key[0] == temp_dir_path]
+
+    for pool in pools:
+        pool.shutdown()
+
+
+class _Worker:
+    def __init__(self, process: subprocess.Popen, output_dir_path: str, job_name: str):
+        self.process = process
+        self.pdf_path = os.path.join(output_dir_path, job_name + ".pdf")
+        self._artifacts_pattern = os.path.join(output_dir_path, job_name + ".*")
+        # Output is read in the background from the start, so that an idle worker doesn't get stuck on a full pipe
+        # while loading the header
+        self._output = Queue()
+        Thread(target=self._read_output, daemon=True).start()
+
+    def output_lines(self):
+        """
+        :return: generator of the lines written by the engine, until it exits.
+        """
+        while True:
+            line = self._output.get()
+            if line is None:
+                return
+            yield line
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def dispose(self):
+        if self.is_alive():
+            kill_engine(self.process)
+            self.process.wait()
+        for artifact_path in glob.glob(self._artifacts_pattern):
+            try:
+                os.remove(artifact_path)
+            except OSError:
+                pass
+
+    def _read_output(self):
+        for line in self.process.stdout:
+            self._output.put(line)
+        self.process.stdout.close()
+        self._output.put(None)
+
+
+class WarmWorkerPool:
+    """Keeps TeX engine processes started in advance - each of them has already loaded the document header (preamble)
+        and waits for the name of the document body, sent through its standard input. A TeX run produces exactly one
+        PDF file, so a worker serves a single job (which also bounds its memory growth) and is replaced by a new one
+        as soon as the job is dispatched: engine startup and preamble loading happen in the background, while other
+        frames are being compiled."""
+
+    @classmethod
+    def for_header(cls, temp_dir_path: str, header: str) -> Optional["WarmWorkerPool"]:
+        """
+        :return: pool of workers for documents with the given header, or None if warm workers are disabled.
+        """
+        if _workers_count <= 0:
+            return None
+
+        engine = engine_for(temp_dir_path)
+        header_digest = hashlib.sha1(header.encode()).hexdigest()[:12]
+        with _pools_lock:
+            key = (temp_dir_path, header_digest, engine.name)
+            if key not in _pools:
+                _pools[key] = WarmWorkerPool(temp_dir_path, header, header_digest, engine, _workers_count)
+            return _pools[key]
+
+    def __init__(self, temp_dir_path: str, header: str, header_digest: str, engine: TexEngine, size: int):
+        self._temp_dir_path = temp_dir_path
+        self._name = f"{WORKER_NAME_PREFIX}_{engine.name}_{header_digest}"
+        self._engine = engine
+        self._size = size
+        self._idle_workers = deque()
+        self._lock = Lock()
+        self._job_counter = itertools.count()
+        self._is_shut_down = False
+
+        self._stub_path = os.path.join(temp_dir_path, self._name + ".tex")
+        with open(self._stub_path, "w") as stub_file:
+            stub_file.write(header)
+            stub_file.write("\n{\\endlinechar=-1 \\global\\read16 to \\bbjobfile}\n")
+            stub_file.write("\\nonstopmode\n")
+            stub_file.write("\\input{\\bbjobfile}\n")
+
+        self._fill()
+
+    def compile(self, body_path: str, pdf_path: str, stop_on_error=False, timeout=COMPILATION_TIMEOUT) -> str:
+        """
+        Compiles the document body (everything following the header) using one of the warm workers.
+        :param body_path: path to the document body, located in the temporary directory.
+        :param pdf_path: destination path of the compiled PDF file.
+        :return: path to the compiled PDF file
+        """
+        worker = self._take_worker()
+        try:
+            try:
+                worker.process.stdin.write(os.path.basename(body_path) + "\n")
+                worker.process.stdin.close()
+            except OSError:
+                pass  # the worker has failed in the meantime - the error will be reported from its output
+
+            self._fill()
+            finish_compilation(worker.process, body_path, worker.pdf_path, stop_on_error, timeout,
+                               worker.output_lines())
+            os.replace(worker.pdf_path, pdf_path)
+            worker_log_path = os.path.splitext(worker.pdf_path)[0] + ".log"
+            if os.path.exists(worker_log_path):
+                os.replace(worker_log_path, os.path.splitext(pdf_path)[0] + ".log")
+        finally:
+            worker.dispose()
+
+        return pdf_path
+
+    def shutdown(self):
+        """Stops the idle workers - no new ones are started afterwards (the jobs in progress are finished)."""
+        with self._lock:
+            self._is_shut_down = True
+            workers = list(self._idle_workers)
+            self._idle_workers.clear()
+
+        for worker in workers:
+            worker.dispose()
+
+    def _take_worker(self) -> _Worker:
+        with self._lock:
+            while self._idle_workers:
+                worker = self._idle_workers.popleft()
+                if worker.is_alive():
+                    return worker
+                worker.dispose()
+
+        return self._spawn()
+
+    def _fill(self):
+        # Starting a process doesn't wait for the engine, so the workers are started under the lock - otherwise
+        # concurrent jobs could start more workers than the size of the pool
+        with self._lock:
+            while not self._is_shut_down and len(self._idle_workers) < self._size:
+                self._idle_workers.append(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        job_name = f"{self._name}_{next(self._job_counter)}"
+        process = subprocess.Popen(
+            self._engine.command(self._temp_dir_path, interaction="scrollmode")
+            + [f'-jobname={job_name}', os.path.basename(self._stub_path)],
+            cwd=self._temp_dir_path, env=tex_environment(self._temp_dir_path),
+            stdin=subprocess.PIPE, **ENGINE_OUTPUT_OPTIONS)
+        return _Worker(process, self._temp_dir_path, job_name)
+
+
+@atexit.register
+def _shutdown_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+
+    for pool in pools:
+        pool.shutdown()
@@ -0,0 +1,259 @@
+import atexit
+import hashlib
+import os
+import shutil
+import time
+from threading import Lock
+from typing import Optional
+
+
+TEMP_DIR_NAME = ".bb-temp"
+LOGS_SUBDIR_NAME = "bb-logs"
+
+
+class WorkspaceMode:
+    """Defines how the source files of the document are made available in the temporary working directory."""
+    COPY = "copy"  # all files are copied (disk usage and creation time grow with the size of the assets)
+    LINK = "link"  # directory structure is recreated, files are hard-linked (copied only if linking is impossible)
+    TEXINPUTS = "texinputs"  # nothing is copied - TeX looks up the missing files in the source directory
+
+    ALL = (COPY, LINK, TEXINPUTS)
+
+
+class InvalidWorkspaceMode(ValueError):
+    pass
+
+
+EVICTION_MIN_AGE = 30  # seconds - younger artifacts are never evicted, they might belong to a running compilation
+
+_mode = WorkspaceMode.COPY
+_root = None  # directory containing the temporary directories (None - next to the source document)
+_quota = None  # maximal size of a single temporary directory, in bytes (None - unlimited)
+_persistent = True  # whether temporary directories are kept after exit (to be reused as a cache)
+_source_dirs = {}  # temporary directory path -> source directory path
+_input_dirs = {}  # temporary directory path -> list of directories searched before the workspace itself
+_source_dirs_lock = Lock()
+
+
+def set_workspace_mode(mode: str):
+    """
+    :param mode: one of the WorkspaceMode values; applies to temporary directories created afterwards.
+    """
+    global _mode
+    if mode not in WorkspaceMode.ALL:
+        raise InvalidWorkspaceMode(f"Unknown workspace mode: {mode}")
+    _mode = mode
+
+
+def configure_workspace(root: Optional[str] = None, quota_bytes: Optional[int] = None,
+                        persistent: Optional[bool] = None):
+    """
+    Configures the location and limits of temporary directories created afterwards.
+    :param root: directory in which the temporary directories are created, e.g. a RAM-backed "/dev/shm"
+    (None - next to the source document).
+    :param quota_bytes: maximal size of a single temporary directory - when exceeded, the oldest compilation artifacts
+    are evicted (None - unlimited).
+    :param persistent: whether the temporary directories are kept after exit, to be reused as a cache (None - only if
+    they are located next to the source document).
+    """
+    global _root, _quota, _persistent
+    _root = root
+    _quota = quota_bytes
+    _persistent = persistent if persistent is not None else root is None
+
+
+def create_temp_dir(working_dir_path: str) -> str:
+    """
+    Creates a temporary working directory if it doesn't exist.
+    Internal structure is also created (logs folder inside the temp dir).
+    :return: path to the temporary directory
+    """
+    temp_dir_path = _temp_dir_path(working_dir_path)
+    with _source_dirs_lock:
+        _source_dirs[temp_dir_path] = working_dir_path
+
+    if os.path.exists(temp_dir_path):
+        return temp_dir_path
+
+    os.makedirs(temp_dir_path)
+    if _mode == WorkspaceMode.COPY:
+        _copy_sources(working_dir_path, temp_dir_path)
+    elif _mode == WorkspaceMode.LINK:
+        _link_sources(working_dir_path, temp_dir_path)
+
+    logs_dir_path = os.path.join(temp_dir_path, LOGS_SUBDIR_NAME)
+    if not os.path.exists(logs_dir_path):
+        os.mkdir(logs_dir_path)
+
+    return temp_dir_path
+
+
+def release_temp_dir(working_dir_path: str) -> str:
+    """
+    Forgets the temporary directory of the working directory (created with create_temp_dir), e.g. once the working
+    directory is removed. The temporary directory itself is kept.
+    :return: path to the temporary directory
+    """
+    temp_dir_path = _temp_dir_path(working_dir_path)
+    with _source_dirs_lock:
+        _source_dirs.pop(temp_dir_path, None)
+        _input_dirs.pop(temp_dir_path, None)
+    return temp_dir_path
+
+
+def source_dir_of(temp_dir_path: str) -> Optional[str]:
+    """
+    :return: path to the source directory of the document using the temporary directory (None if unknown).
+    """
+    with _source_dirs_lock:
+        return _source_dirs.get(temp_dir_path)
+
+
+def register_input_dir(temp_dir_path: str, input_dir_path: str):
+    """
+    Makes TeX processes working in the temporary directory look up input files in the given directory first
+    (before the temporary and source directories), e.g. to substitute some of the source files.
+    """
+    with _source_dirs_lock:
+        input_dirs = _input_dirs.setdefault(temp_dir_path, [])
+        if input_dir_path not in input_dirs:
+            input_dirs.append(input_dir_path)
+
+
+def input_dirs_of(temp_dir_path: str) -> list:
+    """
+    :return: directories registered with register_input_dir.
+    """
+    with _source_dirs_lock:
+        return list(_input_dirs.get(temp_dir_path, []))
+
+
+def tex_environment(temp_dir_path: str) -> dict:
+    """
+    :return: environment variables for a TeX process working in the temporary directory - the source directory
+    of the document is added to the TeX input paths, after the temporary directory itself (and after the registered
+    input directories, which come first).
+    """
+    env = dict(os.environ)
+    source_dir = source_dir_of(temp_dir_path)
+    input_dirs = input_dirs_of(temp_dir_path)
+    if source_dir or input_dirs:
+        # Empty trailing entry stands for the default TeX search paths
+        search_dirs = input_dirs + ["."] + ([source_dir] if source_dir else [])
+        env["TEXINPUTS"] = os.pathsep.join(search_dirs + [env.get("TEXINPUTS", "")])
+
+    return env
+
+
+def enforce_quota(temp_dir_path: str) -> int:
+    """
+    Evicts the oldest compilation artifacts (generated files of the frames and compilation logs) from the temporary
+    directory, until its size fits in the configured quota. Source files and generated resources are never evicted.
+    :return: number of freed bytes.
+    """
+    if _quota is None:
+        return 0
+
+    total_size = _directory_size(temp_dir_path)
+    if total_size <= _quota:
+        return 0
+
+    freed = 0
+    now = time.time()
+    for path, stat in sorted(_evictable_artifacts(temp_dir_path), key=lambda artifact: artifact[1].st_mtime):
+        if total_size - freed <= _quota:
+            break
+        if now - stat.st_mtime < EVICTION_MIN_AGE:
+            break
+
+        try:
+            os.remove(path)
+            freed += stat.st_size
+        except OSError:
+            pass  # e.g. still opened on systems which don't allow removing such files
+
+    return freed
+
+
+def _temp_dir_path(working_dir_path: str) -> str:
+    if _root is None:
+        return os.path.join(working_dir_path, TEMP_DIR_NAME)
+
+    source_digest = hashlib.sha1(os.path.abspath(working_dir_path).encode()).hexdigest()[:12]
+    return os.path.join(_root, f"{TEMP_DIR_NAME}-{source_digest}")
+
+
+def _evictable_artifacts(temp_dir_path: str):
+    """
+    :return: list of tuples (path, stat result) of the files that can be safely removed from the temporary directory.
+    """
+    source_dir = source_dir_of(temp_dir_path)
+    source_files = set(os.listdir(source_dir)) if source_dir and os.path.isdir(source_dir) else set()
+
+    artifacts = []
+    for dir_path, skipped_names in ((temp_dir_path, source_files),
+                                    (os.path.join(temp_dir_path, LOGS_SUBDIR_NAME), set())):
+        if not os.path.isdir(dir_path):
+            continue
+        for entry in os.scandir(dir_path):
+            if entry.is_file(follow_symlinks=False) and entry.name not in skipped_names:
+                artifacts.append((entry.path, entry.stat(follow_symlinks=False)))
+
+    return artifacts
+
+
+def _directory_size(dir_path: str) -> int:
+    size = 0
+    for entry in os.scandir(dir_path):
+        if entry.is_dir(follow_symlinks=False):
+            size += _directory_size(entry.path)
+        elif entry.is_file(follow_symlinks=False):
+            size += entry.stat(follow_symlinks=False).st_size
+    return size
+
+
+@atexit.register
+def _cleanup_temp_dirs():
+    if _persistent:
+        return
+
+    with _source_dirs_lock:
+        temp_dirs = list(_source_dirs)
+
+    for temp_dir_path in temp_dirs:
+        shutil.rmtree(temp_dir_path, ignore_errors=True)
+
+
+def _copy_sources(working_dir_path: str, temp_dir_path: str):
+    for file in os.listdir(working_dir_path):
+        abs_src_path = os.path.join(working_dir_path, file)
+        if os.path.isfile(abs_src_path) and "tex" not in file.split("."):
+            shutil.copyfile(abs_src_path, os.path.join(temp_dir_path, file))
+        elif os.path.isdir(abs_src_path) and not _contains_workspace(abs_src_path, temp_dir_path):
+            shutil.copytree(abs_src_path, os.path.join(temp_dir_path, file))
+
+
+def _link_sources(working_dir_path: str, temp_dir_path: str):
+    for file in os.listdir(working_dir_path):
+        abs_src_path = os.path.join(working_dir_path, file)
+        if os.path.isfile(abs_src_path) and "tex" not in file.split("."):
+            _link_file(abs_src_path, os.path.join(temp_dir_path, file))
+        elif os.path.isdir(abs_src_path) and not _contains_workspace(abs_src_path, temp_dir_path):
+            # Directories are recreated (not linked), so that any files created inside the workspace
+            # don't end up in the source directory
+            shutil.copytree(abs_src_path, os.path.join(temp_dir_path, file), copy_function=_link_file)
+
+
+def _contains_workspace(dir_path: str, temp_dir_path: str) -> bool:
+    """
+    :return: True if the source directory contains temporary directories (e.g. it's the workspace root), so copying it
+    would copy the workspace into itself.
+    """
+    return TEMP_DIR_NAME in dir_path or os.path.commonpath((dir_path, temp_dir_path)) == dir_path
+
+
+def _link_file(src_path: str, dest_path: str):
+    try:
+        os.link(src_path, dest_path)
+    except OSError:
+        shutil.copy2(src_path, dest_path)
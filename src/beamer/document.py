@@ -1,28 +1,33 @@
+import bisect
+import itertools
 import os
-from typing import Optional, Any
+from typing import Optional, Any, Tuple
 
-from src.beamer import tokens
+from src.beamer.compilation.engine_selection import select_engine
 from src.beamer.compilation.loading_handler import PageLoadingHandler
+from src.beamer.compilation.proxies import prepare_proxy_images_in_background
+from src.beamer.compilation.retention import sweep_stale_artifacts
+from src.beamer.compilation.speculative import SpeculativeCompiler
+from src.beamer.compilation.workers import shutdown_warm_workers
+from src.beamer.compilation.workspace import create_temp_dir
+from src.beamer.frame.code import FrameCode
+from src.beamer.frame.compiler import FrameCompiler
 from src.beamer.frame.frame import Frame
 from src.beamer.frame.improvements import LocalImprovementsManager, BackgroundImprovementsManager, \
-    ColorSetsImprovementsManager
+    ColorSetsImprovementsManager, GlobalImprovementsManager
 from src.beamer.page_getter import PageGetter
+from src.beamer.splitter import FrameSplitter, NotBeamerPresentation, FrameCountError
 from src.beautifier.background_generator import FrameProgressInfo
 from src.beautifier.color_generator import get_random_color_set
 
 
-class NotBeamerPresentation(ValueError):
-    pass
+FRAME_NUMBER_WIDTH = 4  # minimal number of digits in frame numbers used in temporary file names
 
 
 class InvalidPathError(AttributeError):
     pass
 
 
-class FrameCountError(RuntimeError):
-    pass
-
-
 class BeamerDocument:
     """Handles operations on Beamer code."""
 
@@ -31,12 +36,18 @@ class BeamerDocument:
         self._check_path()
         self._split_frames()
         self._page_count = sum([frame.page_count() for frame in self._frames])
+        # Index of the first page of each frame in the whole document
+        self._frame_first_pages = [0] + list(itertools.accumulate(frame.page_count() for frame in self._frames))[:-1]
         self._current_frame = -1
         self._current_page = -1
 
         color_versions = [get_random_color_set() for _ in range(4)]
         ColorSetsImprovementsManager.define_color_sets(color_versions)
 
+        # A global choice changes every frame - compile them ahead of the user, starting with the current one
+        self._speculative_compiler = SpeculativeCompiler(self._frames)
+        GlobalImprovementsManager.add_selection_listener(self._on_global_selection)
+
     def next_page(self, page_getter: Optional[PageGetter]) -> Optional[Any]:
         """
         Notifies the compiling thread to prioritize loading next page and load it version-by-version
@@ -80,23 +91,26 @@ class BeamerDocument:
         return self.prev_page(page_getter)
 
     def goto_page(self, page_idx: int, page_getter: PageGetter):
-        if page_idx >= self._page_count:
-            raise RuntimeError("Invalid page index")
-
+        """
+        Jumps directly to the page (only the target page is rendered), notifies the compiling thread to prioritize
+        loading it and loads it version-by-version into the provided page_getter.
+        :return: original version of the page, or None if it is already the current page.
+        """
+        frame_idx, frame_page_idx = self.page_location(page_idx)
         if page_idx == self._current_page:
             return
 
-        if page_idx < self._current_page:
-            fun_to_call = self.prev_page
-            stop_cond_modifier = -1
-        else:
-            fun_to_call = self.next_page
-            stop_cond_modifier = 1
-
-        while self._current_page + stop_cond_modifier != page_idx:
-            fun_to_call(None)
+        # Frames before the current one are left past their end, those after it before their beginning, so that
+        # the sequential navigation (next_page, prev_page) continues from the target page
+        forward = frame_idx > self._current_frame
+        first_passed, last_passed = sorted((self._current_frame, frame_idx))
+        for passed_idx in range(max(first_passed, 0), min(last_passed + 1, len(self._frames))):
+            if passed_idx != frame_idx:
+                self._frames[passed_idx].leave(forward)
 
-        page = fun_to_call(page_getter)
+        self._current_frame = frame_idx
+        self._current_page = page_idx
+        page = self._frames[frame_idx].goto_page(frame_page_idx, page_getter)
 
         assert page
         return page
@@ -130,6 +144,32 @@ class BeamerDocument:
         """
         self._frames[self._current_frame].regenerate_background_improvements(page_getter)
 
+    def preview_combined(self, page_getter: PageGetter) -> None:
+        """
+        Notifies the loading handler to render the current page with all currently selected improvements combined,
+        and load it into the provided page_getter. Only the latest requested preview is guaranteed to be delivered.
+        """
+        self._frames[self._current_frame].preview_combined(page_getter)
+
+    def page_thumbnail(self, page_idx: int, width: int):
+        """
+        Renders the page in its original version, without affecting the current page or the loading of improvements
+        (see FrameCompiler.render_page).
+        :param width: width of the render, in pixels.
+        :return: RGBA render of the page.
+        """
+        frame_idx, frame_page_idx = self.page_location(page_idx)
+        return self._frames[frame_idx].original_version().render_page(frame_page_idx, width)
+
+    def page_location(self, page_idx: int) -> Tuple[int, int]:
+        """
+        :return: tuple (frame index, index of the page within the frame) of the page with the given index.
+        """
+        if not 0 <= page_idx < self._page_count:
+            raise RuntimeError("Invalid page index")
+        frame_idx = bisect.bisect_right(self._frame_first_pages, page_idx) - 1
+        return frame_idx, page_idx - self._frame_first_pages[frame_idx]
+
     def current_local_improvements(self) -> LocalImprovementsManager:
         """
         :return: local improvements manager for the current frame.
@@ -175,27 +215,48 @@ class BeamerDocument:
     def save(self, output_path: str):
         """
         Saves the modified document in the output path, overwriting the file if it already exists.
+        The document is assembled in a single pass - unchanged parts are copied from the original code, frames are
+        replaced by their improved versions. The output file is replaced atomically.
         """
         if not output_path.endswith('.tex'):
             output_path = output_path + ".tex"
 
-        if os.path.exists(output_path):
-            os.remove(output_path)
-
-        improved_code = self._org_raw_code
-        global_colors_definitions = self._frames[0].improved_code().global_color_defs
-        if global_colors_definitions:
-            improved_code = improved_code.replace(self._header.rstrip(),
-                                                  self._header.rstrip() + "\n" + global_colors_definitions)
+        tmp_path = output_path + ".bb-tmp"
+        try:
+            with open(tmp_path, 'w') as fh:
+                self._write_improved_code(fh)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
 
         output_dir = os.path.dirname(output_path)
         for frame in self._frames:
-            improved_code = improved_code.replace(frame.original_code().frame_str().strip(),
-                                                  frame.improved_code().frame_str().strip())
             frame.save_resources(output_dir)
 
-        with open(output_path, 'w') as fh:
-            fh.write(improved_code)
+    def close(self):
+        """Stops the processes kept for the compilations of the document (see workers.WarmWorkerPool)."""
+        shutdown_warm_workers(self._tmp_dir_path)
+
+    def _on_global_selection(self, improvements: GlobalImprovementsManager) -> None:
+        self._speculative_compiler.schedule(max(self._current_frame, 0))
+
+    def _write_improved_code(self, fh) -> None:
+        code = self._org_raw_code
+        fh.write(code[: self._header_end])
+
+        global_colors_definitions = self._frames[0].improved_code().global_color_defs
+        if global_colors_definitions:
+            fh.write("\n" + global_colors_definitions)
+
+        position = self._header_end
+        for frame, (frame_begin, frame_end) in zip(self._frames, self._frame_spans):
+            fh.write(code[position: frame_begin])
+            fh.write(frame.improved_code().frame_str().strip())
+            position = frame_end
+
+        fh.write(code[position:])
 
     def _check_path(self) -> None:
         if not os.path.exists(self._path) or not os.path.isfile(self._path):
@@ -203,42 +264,46 @@ class BeamerDocument:
 
     def _split_frames(self) -> None:
         """
-        Splits the document and saves separate frame objects.
+        Splits the document and saves separate frame objects. Frames are created (and their original versions
+        compiled) while the document is still being read.
         """
-        self._header = ""
-        raw_frames = []
-        with open(self._path, "r") as doc:
-            self._org_raw_code = doc.read()
-
-            if not tokens.BEAMER_DECL in self._org_raw_code:
-                raise NotBeamerPresentation("Provided document is not a Beamer presentation.")
-
-            if self._org_raw_code.count(tokens.FRAME_BEGIN) != self._org_raw_code.count(tokens.FRAME_END):
-                raise FrameCountError("Detected different numbers of frame begins and ends, this won't compile")
-
-            self._header = self._org_raw_code[: self._org_raw_code.find(tokens.DOC_BEGIN)]
-            self._post_frames_code = self._org_raw_code[self._org_raw_code.rfind(tokens.FRAME_END) + len(
-                tokens.FRAME_END): self._org_raw_code.rfind(tokens.DOC_END)]
-            raw_frames = self._org_raw_code.split(tokens.FRAME_BEGIN)[1:]
-
         doc_name = os.path.basename(self._path).rsplit('.', 1)[0].replace(' ', '_')
-        idx_len = len(str(len(raw_frames)))
+        tmp_dir_path = create_temp_dir(os.path.dirname(self._path))
+        self._tmp_dir_path = tmp_dir_path
 
         loading_handler = PageLoadingHandler()
         self._frames = []
-        for idx, frame_code in enumerate(raw_frames):
-            frame_code = frame_code[: frame_code.rfind(tokens.FRAME_END)]
-            if tokens.FRAME_END in frame_code:
-                raise FrameCountError("Detected multiple consecutive frame ends, this won't compile")
-
-            if not frame_code.endswith("\n"):
-                frame_code += "\n"
-            frame_code = f"{tokens.FRAME_BEGIN}{frame_code}{tokens.FRAME_END}\n"
-            frame_filename = f"{doc_name}_frame{idx + 1:0{idx_len}}"
-            progress_info = FrameProgressInfo(idx, len(raw_frames))
-
-            frame = Frame(frame_filename, os.path.dirname(self._path),
-                          frame_code, self._header, loading_handler, progress_info)
-            self._frames.append(frame)
+        self._frame_spans = []
+        progress_infos = []
+        with open(self._path, "r") as doc:
+            splitter = FrameSplitter(doc)
+            for record in splitter.frames():
+                if record.idx == 0:
+                    # Engine must be known before the first compilation
+                    select_engine(tmp_dir_path, doc_name, splitter.header(),
+                                  FrameCode(splitter.header(), record.code).full_str())
+
+                frame_filename = f"{doc_name}_frame{record.idx + 1:0{FRAME_NUMBER_WIDTH}}"
+                progress_info = FrameProgressInfo(record.idx, None)  # frame count is known after reading all frames
+
+                frame = Frame(frame_filename, os.path.dirname(self._path),
+                              record.code, splitter.header(), loading_handler, progress_info)
+                self._frames.append(frame)
+                self._frame_spans.append((record.begin, record.end))
+                progress_infos.append(progress_info)
+
+        for progress_info in progress_infos:
+            progress_info.frame_cnt = len(self._frames)
+
+        self._org_raw_code = splitter.source()
+        self._header = splitter.header()
+        self._header_end = splitter.header_end()
+        self._post_frames_code = splitter.post_frames_code()
+        prepare_proxy_images_in_background(tmp_dir_path, self._org_raw_code)
+
+        freed = sweep_stale_artifacts(tmp_dir_path, FrameCompiler.live_artifacts(), doc_name)
+        if freed:
+            print(f'Removed stale compilation artifacts from "{tmp_dir_path}" ({freed} bytes).')
+
         loading_handler.init_frames(self._frames)
         loading_handler.start()
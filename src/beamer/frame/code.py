@@ -1,53 +1,106 @@
+import io
+import re
+from typing import TextIO
+
 import src.beamer.tokens as tokens
 
 
+# Optional overlay specification and option lists following the beginning of the frame
+_FRAME_OPTIONS_REGEX = re.compile(r"\s*" + re.escape(tokens.FRAME_BEGIN) + r"\s*(?:<[^>]*>\s*)?((?:\[[^\]]*\]\s*)*)")
+
+
 class FrameCode:
-    """A representation of LaTeX code of a single frame, divided into sections."""
+    """A representation of LaTeX code of a single frame, divided into sections. Instances are compact - all frames
+        of a document (and all of their versions) refer to one shared header string."""
+    __slots__ = ("header", "base_code", "global_color_defs", "bg_img_path", "overlay")
 
-    def __init__(self, header="", base_code="", global_color_defs="", bg_img_path=""):
+    def __init__(self, header="", base_code="", global_color_defs="", bg_img_path="", overlay=None):
         """
         :param header: Header of the document which originally contained the frame - code containing package includes,
         command definitions and all things that go before "\begin{document}" statement.
         :param base_code: Code that goes between \begin{frame} and \end{frame}.
         :param global_color_defs: Global definitions of the color palette (they will be placed right after the header).
         :param bg_img_path: Path to the frame-local background image (will be inserted before the frame definition).
+        :param overlay: Number of the only overlay (slide) of the frame to be typeset, starting at 1 (None - all
+        of them). Used only for previews, see has_overlay_spec.
         """
         self.header = header
         self.base_code = base_code
         self.global_color_defs = global_color_defs
         self.bg_img_path = bg_img_path
+        self.overlay = overlay
 
     def full_str(self) -> str:
         """
         :return: A full, compilable document, containing only this one frame.
         """
-        code = self.header + "\n"
+        buffer = io.StringIO()
+        self.write_full(buffer)
+        return buffer.getvalue()
 
-        if self.global_color_defs:
-            code += self.global_color_defs + "\n"
+    def write_full(self, fh: TextIO):
+        """
+        Writes a full, compilable document, containing only this one frame, directly into the output stream.
+        """
+        fh.write(self.header)
+        fh.write("\n")
+        self.write_body(fh)
 
-        code += tokens.DOC_BEGIN + "\n"
-        code += self.frame_str()
-        code += tokens.DOC_END + "\n"
+    def write_body(self, fh: TextIO):
+        """
+        Writes everything that follows the header in the full document (see write_full) into the output stream.
+        """
+        if self.global_color_defs:
+            fh.write(self.global_color_defs)
+            fh.write("\n")
 
-        return code
+        fh.write(tokens.DOC_BEGIN + "\n")
+        self.write_frame(fh)
+        fh.write(tokens.DOC_END + "\n")
 
     def frame_str(self) -> str:
         """
         :return: A string representation of frame code that can be inserted anywhere in the document.
         """
-        code = ""
+        buffer = io.StringIO()
+        self.write_frame(buffer)
+        return buffer.getvalue()
 
+    def write_frame(self, fh: TextIO):
+        """
+        Writes the frame code (see frame_str) directly into the output stream.
+        """
         if self.bg_img_path:
-            code += "{\n"
-            code += _make_bg_stmt(self.bg_img_path) + "\n"
+            fh.write("{\n")
+            fh.write(_make_bg_stmt(self.bg_img_path))
+            fh.write("\n")
 
-        code += self.base_code + "\n"
+        if self.overlay is not None:
+            frame_code = self.base_code.lstrip()
+            fh.write(tokens.FRAME_BEGIN + f"<{self.overlay}>")
+            fh.write(frame_code[len(tokens.FRAME_BEGIN):])
+        else:
+            fh.write(self.base_code)
+        fh.write("\n")
 
         if self.bg_img_path:
-            code += "}\n"
+            fh.write("}\n")
+
+    def has_overlay_spec(self) -> bool:
+        """
+        :return: True if the frame code restricts its overlays itself (e.g. \\begin{frame}<2->), so that a single
+        overlay cannot be selected.
+        """
+        frame_code = self.base_code.lstrip()
+        return not frame_code.startswith(tokens.FRAME_BEGIN) or frame_code[len(tokens.FRAME_BEGIN):].lstrip()[:1] == "<"
 
-        return code
+    def allows_frame_breaks(self) -> bool:
+        """
+        :return: True if the frame is split into several pages by its content (allowframebreaks option), so that
+        its pages are not overlays and a single one cannot be selected.
+        """
+        match = _FRAME_OPTIONS_REGEX.match(self.base_code)
+        return match is not None and "allowframebreaks" in match.group(1)
 
 
 def _make_bg_stmt(bg_path: str):
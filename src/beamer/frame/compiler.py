@@ -1,17 +1,65 @@
+import hashlib
+import os
+import time
+import weakref
+from threading import Lock
+from typing import Set, Optional
+
 import fitz
 
-from src.beamer.compilation.compilation import compile_tex, CompilationError
+from src.beamer.compilation.compilation import compile_tex, get_dest_pdf_path, CompilationError
+from src.beamer.compilation.engines import engine_for
+from src.beamer.compilation.tikz import externalize_pictures, ExternalizedCode
+from src.beamer.compilation.failure_cache import FailureCache
+from src.beamer.compilation.tex_log import LayoutQuality, parse_box_warnings
+from src.beamer.compilation.workers import WarmWorkerPool
+from src.beamer.graphics import document_fingerprint, pixmap_from_document, scaled_pixmap_from_document
 from .code import FrameCode
 
 
 class FrameCompiler:
     """Utility class for lazy compiling frame code as a standalone Beamer presentation."""
-    def __init__(self, code: FrameCode, tmp_doc_path: str):
+    _LIVE_INSTANCES = weakref.WeakSet()
+    _LIVE_INSTANCES_LOCK = Lock()
+
+    @classmethod
+    def live_artifacts(cls) -> Set[str]:
+        """
+        :return: paths of the documents (without extensions) of all existing compilers, along with
+        absolute paths to the resources used by them.
+        """
+        with cls._LIVE_INSTANCES_LOCK:
+            compilers = list(cls._LIVE_INSTANCES)
+
+        artifacts = set()
+        for compiler in compilers:
+            doc_dir_path = os.path.dirname(compiler._tmp_doc_path)
+            artifacts.add(os.path.join(doc_dir_path, os.path.basename(compiler._tmp_doc_path).split('.')[0]))
+            if compiler._code.bg_img_path:
+                artifacts.add(os.path.join(doc_dir_path, compiler._code.bg_img_path))
+        return artifacts
+
+    def __init__(self, code: FrameCode, tmp_doc_path: str, is_original=False):
+        """
+        :param code: code of the frame to be compiled.
+        :param tmp_doc_path: path of the temporary TeX document which will be compiled.
+        :param is_original: whether this is the original version of the frame; compilation of other versions is
+        aborted on the first error, as any error makes them useless.
+        """
         self._code = code
         self._tmp_doc_path = tmp_doc_path
+        self._is_original = is_original
+        self._errors = []
+        with self._LIVE_INSTANCES_LOCK:
+            self._LIVE_INSTANCES.add(self)
         self._is_compiled = False
         self._compiled_doc = None
         self._page_count = None
+        self._fingerprint = None
+        self._overlay_versions = {}
+        self._layout_quality = None
+        self._compile_lock = Lock()
+        self._render_lock = Lock()  # fitz documents must not be used by several threads at once
 
     def doc(self):
         """
@@ -20,11 +68,16 @@ class FrameCompiler:
         self.compile()
         return self._compiled_doc
 
-    def compile(self):
-        if not self._is_compiled:
-            self._do_compile()
+    def compile(self, low_priority=False):
+        """
+        Compiles the document, unless it has been already compiled.
+        :param low_priority: whether the compilation should run with lowered priority (e.g. speculative compilations).
+        """
+        with self._compile_lock:
+            if not self._is_compiled:
+                self._do_compile(low_priority)
 
-        self._is_compiled = True
+            self._is_compiled = True
 
     def page_count(self):
         if self._page_count is None:
@@ -32,17 +85,162 @@ class FrameCompiler:
 
         return self._page_count
 
+    def fingerprint(self):
+        """
+        :return: Perceptual fingerprint of the compiled document (see graphics.document_fingerprint),
+        or None if the compilation failed.
+        """
+        if self._fingerprint is None and self.doc():
+            with self._render_lock:
+                self._fingerprint = document_fingerprint(self.doc())
+
+        return self._fingerprint
+
+    def render_page(self, page_idx: int, width: Optional[int] = None):
+        """
+        Renders a page of the compiled document. Renders of the same document are serialized, so it's safe to call
+        from any thread.
+        :param width: width of the render, in pixels (None - see graphics.pixmap_from_document).
+        :return: RGBA render of the page.
+        """
+        doc = self.doc()
+        with self._render_lock:
+            if width is None:
+                return pixmap_from_document(doc, page_idx)
+            return scaled_pixmap_from_document(doc, page_idx, width)
+
+    def overlay_version(self, page_idx: int) -> "FrameCompiler":
+        """
+        :return: compiler of a single-page version of the frame, containing only the given page (overlay). It compiles
+        much faster than the whole frame if the frame has many overlays, so it's used for previews (see
+        FrameCode.has_overlay_spec for the frames which cannot be handled this way).
+        """
+        if page_idx not in self._overlay_versions:
+            code = FrameCode(self._code.header, self._code.base_code, self._code.global_color_defs,
+                             self._code.bg_img_path, page_idx + 1)
+            stem = os.path.basename(self._tmp_doc_path).split('.')[0]
+            overlay_doc_path = os.path.join(os.path.dirname(self._tmp_doc_path), f"{stem}_o{page_idx + 1}.tex")
+            self._overlay_versions[page_idx] = FrameCompiler(code, overlay_doc_path)
+
+        return self._overlay_versions[page_idx]
+
+    def layout_quality(self) -> Optional[LayoutQuality]:
+        """
+        :return: box warnings reported by the TeX engine for the compiled document, or None if they are unknown
+        (e.g. the compilation failed or its log wasn't available).
+        """
+        self.compile()
+        return self._layout_quality
+
     def code(self):
         return self._code
 
+    def compilation_errors(self):
+        """
+        :return: structured reasons of the compilation failure (empty if the compilation succeeded or hasn't been
+        performed yet).
+        """
+        return self._errors
+
     def is_compiled(self):
         return self._is_compiled
 
-    def _do_compile(self):
+    def _do_compile(self, low_priority: bool):
+        temp_dir_path = os.path.dirname(self._tmp_doc_path)
+        engine = engine_for(temp_dir_path)
+        externalized = externalize_pictures(self._code, engine, temp_dir_path)
         try:
-            with open(self._tmp_doc_path, "w") as tmp_file:
-                tmp_file.write(self._code.full_str())
-            pdf_path = compile_tex(self._tmp_doc_path)
+            digest = self._write_document(externalized.code if externalized else self._code)
+
+            failure_key = None
+            if not self._is_original:
+                failure_cache = FailureCache.for_workspace(temp_dir_path)
+                bg_img_path = os.path.join(temp_dir_path, self._code.bg_img_path) if self._code.bg_img_path else ""
+                failure_key = failure_cache.key(digest, engine.name, bg_img_path)
+                known_errors = failure_cache.lookup(failure_key)
+                if known_errors is not None:
+                    self._errors = known_errors
+                    print(f'Skipping improvement proposal known to fail: "{self._tmp_doc_path}".')
+                    return
+
+            start_time = time.time()
+            try:
+                pdf_path = self._compile_document(externalized, low_priority)
+            except CompilationError as error:
+                if failure_key:
+                    failure_cache.add(failure_key, error.errors)
+                if not externalized or not self._is_original:
+                    raise
+
+                # Original version must be compiled, even if the externalization of its pictures doesn't work
+                print(f'Failed to compile "{self._tmp_doc_path}" with externalized TikZ pictures, retrying without.')
+                self._write_document(self._code)
+                externalized = None
+                pdf_path = self._compile_document(None, low_priority)
+
+            if externalized:
+                externalized.report_compiled()
             self._compiled_doc = fitz.open(pdf_path)
-        except CompilationError:
-            print(f'Failed to compile improvement proposal: "{self._tmp_doc_path}"; will be ignored.')
+            self._layout_quality = _read_layout_quality(pdf_path, start_time)
+        except CompilationError as error:
+            self._errors = error.errors
+            reasons = "; ".join(repr(reason) for reason in error.errors)
+            print(f'Failed to compile improvement proposal: "{self._tmp_doc_path}" ({reasons}); will be ignored.')
+
+    def _write_document(self, code: FrameCode) -> str:
+        """
+        Writes the full document to be compiled.
+        :return: digest of the document
+        """
+        with open(self._tmp_doc_path, "w") as tmp_file:
+            writer = _HashingWriter(tmp_file)
+            code.write_full(writer)
+        return writer.hexdigest()
+
+    def _compile_document(self, externalized: Optional[ExternalizedCode], low_priority: bool) -> str:
+        """
+        Compiles the written document, using a warm worker (with the header already loaded) if they are enabled.
+        Documents with externalized pictures are always compiled directly, as the pictures are compiled by
+        the engine rerunning the document under its own name.
+        :return: path to the compiled PDF file
+        """
+        temp_dir_path = os.path.dirname(self._tmp_doc_path)
+        worker_pool = WarmWorkerPool.for_header(temp_dir_path, self._code.header) if not externalized else None
+        if not worker_pool:
+            return compile_tex(self._tmp_doc_path, stop_on_error=not self._is_original,
+                               shell_escape=externalized is not None, low_priority=low_priority)
+
+        body_path = os.path.join(temp_dir_path, os.path.basename(self._tmp_doc_path).split('.')[0] + ".body.tex")
+        with open(body_path, "w") as body_file:
+            self._code.write_body(body_file)
+        return worker_pool.compile(body_path, get_dest_pdf_path(self._tmp_doc_path, temp_dir_path),
+                                   stop_on_error=not self._is_original)
+
+
+def _read_layout_quality(pdf_path: str, start_time: float) -> Optional[LayoutQuality]:
+    """
+    :return: layout quality read from the engine log written next to the PDF file, or None if the log hasn't been
+    written by the compilation started at the given time (e.g. the document was compiled remotely).
+    """
+    log_path = os.path.splitext(pdf_path)[0] + ".log"
+    try:
+        if os.path.getmtime(log_path) < start_time - 1:
+            return None
+        with open(log_path, "r", errors="replace") as log_file:
+            return LayoutQuality(parse_box_warnings(log_file.read()))
+    except OSError:
+        return None
+
+
+class _HashingWriter:
+    """Passes the written text to the underlying stream, computing its digest on the way."""
+    def __init__(self, stream):
+        self._stream = stream
+        self._digest = hashlib.sha256()
+
+    def write(self, text: str):
+        self._digest.update(text.encode())
+        return self._stream.write(text)
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
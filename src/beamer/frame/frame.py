@@ -1,15 +1,17 @@
+import hashlib
 import os
 import shutil
+from collections import OrderedDict
+from threading import Lock, RLock
 from typing import Optional, Any
 from copy import copy
 
 from src.beamer import tokens
-from src.beamer.compilation.compilation import create_temp_dir
+from src.beamer.compilation.workspace import create_temp_dir
 from src.beamer.compilation.loading_handler_iface import IPageLoadingHandler, PriorityLoadTask, \
-    BackgroundRegenerationTask
+    BackgroundRegenerationTask, CombinedPreviewTask
 
 from src.beamer.page_getter import PageGetter
-from src.beamer.graphics import pixmap_from_document
 from .code import FrameCode
 from .compiler import FrameCompiler
 from .improvements import (LocalImprovementsManager,
@@ -35,6 +37,7 @@ class BaseFrameCompilationError(RuntimeError):
 
 class Frame:
     """Single Beamer frame"""
+    COMBINED_VERSIONS_CACHE_SIZE = 8  # number of compiled combinations of improvements kept per frame
 
     def __init__(self, name: str, src_dir_path: str, code: str,
                  include_code: str, loading_handler: IPageLoadingHandler, progress_info: FrameProgressInfo):
@@ -53,26 +56,26 @@ class Frame:
         self._src_dir = src_dir_path
         self._loading_handler = loading_handler
         self._idx = progress_info.frame_idx
+        self._progress_info = progress_info
 
         self._tmp_dir_path = create_temp_dir(self._src_dir)
         self._current_page = -1
+        self._combined_versions = OrderedDict()  # selection -> FrameCompiler, least recently used first
+        self._combined_versions_lock = Lock()
+        self._improvements_lock = RLock()
 
         original_code = FrameCode(include_code, code)
         self._init_improvements(original_code, progress_info)
 
-        is_first = progress_info.frame_idx == 0
-        is_last = progress_info.frame_idx == progress_info.frame_cnt - 1
-        self._min_page_val = 0 if is_first else -1
-        self._max_page_val = self._original_version.page_count() - 1 if is_last else self._original_version.page_count()
-
     def improved_code(self) -> FrameCode:
         """
         :return: LaTeX code of the frame (in currently selected version).
         """
         code = copy(self._original_version.code())
-        self._ensure_improvements_generated()
-        for improvement in (self._local_versions, self._background_versions, self._global_versions):
-            improvement.decorate(code)
+        with self._improvements_lock:
+            self._ensure_improvements_generated()
+            for improvement in (self._local_versions, self._background_versions, self._global_versions):
+                improvement.decorate(code)
 
         return code
 
@@ -82,6 +85,49 @@ class Frame:
         """
         return self._original_version.code()
 
+    def combined_version(self) -> FrameCompiler:
+        """
+        :return: compiler of the frame in the currently selected combination of improvements (the code that will be
+        saved, see improved_code). Compilers are cached by the selection, so returning to a recently selected
+        combination doesn't require another compilation.
+        """
+        with self._improvements_lock:
+            self._ensure_improvements_generated()
+            selection = tuple(improvements.current_version() if improvements.selected_index() else None
+                              for improvements in (self._local_versions, self._background_versions,
+                                                   self._global_versions))
+            if not any(selection):
+                return self._original_version
+
+            with self._combined_versions_lock:
+                if selection in self._combined_versions:
+                    self._combined_versions.move_to_end(selection)
+                    return self._combined_versions[selection]
+
+                code = self.improved_code()
+                digest = hashlib.sha1(code.full_str().encode()).hexdigest()[:12]
+                filepath = os.path.join(self._tmp_dir_path, f"{self._name}_c{digest}.tex")
+                compiler = FrameCompiler(code, filepath)
+
+                self._combined_versions[selection] = compiler
+                if len(self._combined_versions) > self.COMBINED_VERSIONS_CACHE_SIZE:
+                    self._combined_versions.popitem(last=False)
+                return compiler
+
+    def improvements_lock(self) -> RLock:
+        """
+        :return: lock held while the improvements of the frame are generated or removed. The improvements are
+        generated by several threads (the loading handler, speculative compilations, combined previews) and any of them
+        clears and refills the lists of versions.
+        """
+        return self._improvements_lock
+
+    def original_version(self) -> FrameCompiler:
+        """
+        :return: compiler of the original (input) version of the frame.
+        """
+        return self._original_version
+
     def next_page(self, page_getter: Optional[PageGetter]) -> Optional[Any]:
         """
         Immediately returns the pixmap of the original next page and - if page_getter has been provided - notifies
@@ -89,7 +135,7 @@ class Frame:
         :return: next page from the original PDF file, or None if there is no next page.
         """
         if self._current_page >= self._original_version.page_count() - 1:
-            self._current_page = self._max_page_val
+            self._current_page = self._max_page_val()
             return None
 
         self._current_page += 1
@@ -102,12 +148,28 @@ class Frame:
         :return: previous page from the original PDF file, or None if there is no previous page.
         """
         if self._current_page <= 0:
-            self._current_page = self._min_page_val
+            self._current_page = self._min_page_val()
             return None
 
         self._current_page -= 1
         return self._load_current_page(page_getter)
 
+    def goto_page(self, page_idx: int, page_getter: Optional[PageGetter]) -> Any:
+        """
+        Makes the page with the given index current and - as next_page - returns its original pixmap and notifies
+        the compiling thread (if page_getter has been provided).
+        :return: page from the original PDF file.
+        """
+        self._current_page = page_idx
+        return self._load_current_page(page_getter)
+
+    def leave(self, forward: bool):
+        """
+        Moves past the last page of the frame (if forward), or before its first page, as if all its pages were passed
+        with next_page or prev_page.
+        """
+        self._current_page = self._max_page_val() if forward else self._min_page_val()
+
     def page_count(self):
         """
         :return: count of all pages in the frame.
@@ -121,6 +183,15 @@ class Frame:
         task = BackgroundRegenerationTask(self._idx, self._current_page, page_getter)
         self._loading_handler.set_priority_task(task)
 
+    def preview_combined(self, page_getter: PageGetter) -> None:
+        """
+        Notifies the loading handler to render the current page in the currently selected combination of improvements
+        (as it will be saved) into the provided page_getter. Compiled combinations are cached (see combined_version).
+        """
+        page_idx = max(0, min(self._current_page, self.page_count() - 1))
+        task = CombinedPreviewTask(self._idx, page_idx, page_getter)
+        self._loading_handler.set_combined_preview_task(task)
+
     def local_improvements(self) -> LocalImprovementsManager:
         """
         :return: local improvements manager for this frame.
@@ -158,7 +229,7 @@ class Frame:
 
     def _init_improvements(self, original_code: FrameCode, progress_info: FrameProgressInfo):
         org_filepath = os.path.join(self._tmp_dir_path, f"{self._name}_org.tex")
-        self._original_version = FrameCompiler(original_code, org_filepath)
+        self._original_version = FrameCompiler(original_code, org_filepath, is_original=True)
         if not self._original_version.doc():
             raise BaseFrameCompilationError("Compilation failed for an original frame - this is a critical error")
 
@@ -171,12 +242,21 @@ class Frame:
         if page_getter:
             task = PriorityLoadTask(self._idx, self._current_page, page_getter)
             self._loading_handler.set_priority_task(task)
-        return pixmap_from_document(self._original_version.doc(), self._current_page)
+        return self._original_version.render_page(self._current_page)
+
+    def _min_page_val(self) -> int:
+        is_first = self._progress_info.frame_idx == 0
+        return 0 if is_first else -1
+
+    def _max_page_val(self) -> int:
+        is_last = self._progress_info.frame_idx == self._progress_info.frame_cnt - 1
+        return self._original_version.page_count() - 1 if is_last else self._original_version.page_count()
 
     def _ensure_improvements_generated(self):
-        for improvements in (self._local_versions, self._background_versions, self._global_versions):
-            if not improvements.all_improvements():
-                improvements.generate_improvements()
+        with self._improvements_lock:
+            for improvements in (self._local_versions, self._background_versions, self._global_versions):
+                if not improvements.all_improvements():
+                    improvements.generate_improvements()
 
 
 def _check_init_conditions(frame_code: str, frame_name: str):
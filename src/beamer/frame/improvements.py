@@ -15,6 +15,7 @@ class InvalidAlternativeIndex(ValueError):
 
 class ImprovementsManager:
     """Handles improvements generation and selection"""
+    _PRUNE_SIMILAR = True  # drop improvements that look the same as the original or as another improvement
 
     def __init__(self):
         self._current_opt = None
@@ -57,8 +58,19 @@ class ImprovementsManager:
 
     def remove_improvement(self, improvement: FrameCompiler):
         """Removes a generated improvement from the list. Useful if the FrameCompiler failed
-        to compile the improved document, which makes it essentially useless."""
-        self._versions.remove(improvement)
+        to compile the improved document, which makes it essentially useless. The current selection is kept
+        (or reset to the original version, if the selected improvement itself is removed)."""
+        removed_opt = self._versions.index(improvement)
+        del self._versions[removed_opt]
+        if self._current_opt is None or removed_opt > self._current_opt:
+            return
+        self._current_opt = self._current_opt - 1 if removed_opt < self._current_opt else None
+
+    def prunes_similar(self) -> bool:
+        """
+        :return: True if improvements rendering similarly to the original (or to each other) should be removed.
+        """
+        return self._PRUNE_SIMILAR
 
     def improvements_generator(self):
         """Returns a generator that internally adds the improvements while yielding them to the caller."""
@@ -73,6 +85,21 @@ class GlobalImprovementsManager(ImprovementsManager):
     """A category for which all instances of the improvements manager share the selected version.
         Note that due to how static variables work in Python, any subclass must manually define
         a static _GLOBAL_OPT field."""
+    # Selected index is shared among all frames, so the versions cannot be removed on a per-frame basis
+    # (the same index would point to a different alternative in each frame).
+    _PRUNE_SIMILAR = False
+    _SELECTION_LISTENERS = []  # shared by all subclasses
+
+    @classmethod
+    def add_selection_listener(cls, listener):
+        """
+        :param listener: function called with the improvements manager after any global selection changes.
+        """
+        GlobalImprovementsManager._SELECTION_LISTENERS.append(listener)
+
+    @classmethod
+    def remove_selection_listener(cls, listener):
+        GlobalImprovementsManager._SELECTION_LISTENERS.remove(listener)
 
     def current_version(self) -> FrameCompiler:
         self._current_opt = type(self)._GLOBAL_OPT
@@ -83,9 +110,14 @@ class GlobalImprovementsManager(ImprovementsManager):
         return super().selected_index()
 
     def select_alternative(self, idx: int):
+        previous_opt = type(self)._GLOBAL_OPT
         super().select_alternative(idx)
         type(self)._GLOBAL_OPT = self._current_opt
 
+        if self._current_opt != previous_opt:
+            for listener in list(GlobalImprovementsManager._SELECTION_LISTENERS):
+                listener(self)
+
 
 #############  FINAL IMPROVEMENT MANAGERS  #############
 
@@ -162,6 +194,12 @@ class BackgroundImprovementsManager(GlobalImprovementsManager):
             yield self._versions[-1]
             bg_idx += 1
 
+    def background_image_path(self, version: FrameCompiler) -> str:
+        """
+        :return: absolute path to the background image used by the version.
+        """
+        return os.path.join(self._tmp_dir_path, version.code().bg_img_path)
+
     def decorate(self, destination_code: FrameCode):
         if self.selected_index() == 0:
             return
@@ -1,7 +1,81 @@
-from fitz import fitz
+from typing import Tuple
+
+import fitz
+
+
+FINGERPRINT_GRID = (17, 16)  # one more column than compared pairs - see page_fingerprint()
+FINGERPRINT_RENDER_WIDTH = 4 * FINGERPRINT_GRID[0]
+SIMILARITY_THRESHOLD = 6  # maximal number of differing fingerprint bits for two pages to be considered identical
 
 
 def pixmap_from_document(document, page_idx: int):
     zoom_factor = 4.0
     mat = fitz.Matrix(zoom_factor, zoom_factor)
     return document.load_page(page_idx).get_pixmap(matrix=mat, alpha=True)
+
+
+def scaled_pixmap_from_document(document, page_idx: int, width: int):
+    """
+    :return: RGBA render of the page, scaled to the given width (in pixels).
+    """
+    page = document.load_page(page_idx)
+    zoom_factor = width / page.rect.width
+    return page.get_pixmap(matrix=fitz.Matrix(zoom_factor, zoom_factor), alpha=True)
+
+
+def page_fingerprint(document, page_idx: int) -> int:
+    """
+    Computes a cheap perceptual hash (difference hash) of a single page, rendered in low resolution and grayscale.
+    Visually similar pages result in fingerprints that differ only on a few bits.
+    :return: fingerprint of the page, encoded as an integer bit mask.
+    """
+    page = document.load_page(page_idx)
+    zoom_factor = FINGERPRINT_RENDER_WIDTH / page.rect.width
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom_factor, zoom_factor), colorspace=fitz.csGRAY, alpha=False)
+
+    cells = _grid_averages(pixmap.samples, pixmap.width, pixmap.height, pixmap.stride)
+    grid_width, grid_height = FINGERPRINT_GRID
+
+    fingerprint = 0
+    for row in range(grid_height):
+        for col in range(grid_width - 1):
+            left = cells[row * grid_width + col]
+            right = cells[row * grid_width + col + 1]
+            fingerprint = (fingerprint << 1) | (left > right)
+
+    return fingerprint
+
+
+def document_fingerprint(document) -> Tuple[int, ...]:
+    """
+    :return: fingerprints of all pages of the document.
+    """
+    return tuple(page_fingerprint(document, page_idx) for page_idx in range(document.page_count))
+
+
+def are_fingerprints_similar(fingerprint1: Tuple[int, ...], fingerprint2: Tuple[int, ...]) -> bool:
+    """
+    :return: True if both documents have the same number of pages and each pair of corresponding pages
+    is within the similarity threshold.
+    """
+    if len(fingerprint1) != len(fingerprint2):
+        return False
+
+    return all(bin(page1 ^ page2).count("1") <= SIMILARITY_THRESHOLD
+               for page1, page2 in zip(fingerprint1, fingerprint2))
+
+
+def _grid_averages(samples: bytes, width: int, height: int, stride: int) -> list[float]:
+    grid_width, grid_height = FINGERPRINT_GRID
+    sums = [0] * (grid_width * grid_height)
+    counts = [0] * (grid_width * grid_height)
+
+    for y in range(height):
+        row_offset = y * stride
+        cell_row = (y * grid_height // height) * grid_width
+        for x in range(width):
+            cell = cell_row + x * grid_width // width
+            sums[cell] += samples[row_offset + x]
+            counts[cell] += 1
+
+    return [total / count if count else 0.0 for total, count in zip(sums, counts)]
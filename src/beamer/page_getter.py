@@ -1,24 +1,72 @@
-from typing import Callable
+from typing import Callable, Optional
 from threading import Lock
 
-from PyQt5 import QtCore
+from PyQt5 import QtCore, QtGui
+
+
+THUMBNAIL_SIZE = 200  # pixels - maximal width and height of the thumbnails
+
+
+class DisplayImage:
+    """Render of a page converted for display. It's created in the loading threads (QImage, unlike QPixmap, can be
+        used outside of the GUI thread), so the GUI thread only needs to attach the images to the widgets."""
+    def __init__(self, pixmap):
+        """
+        :param pixmap: RGBA render of the page (see graphics.pixmap_from_document).
+        """
+        # Copied, so that the image doesn't refer to the memory of the pixmap
+        self.image = QtGui.QImage(pixmap.samples, pixmap.width, pixmap.height, pixmap.stride,
+                                  QtGui.QImage.Format_RGBA8888).copy()
+        self.thumbnail = self.image.scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE,
+                                           QtCore.Qt.AspectRatioMode.KeepAspectRatio,
+                                           QtCore.Qt.TransformationMode.SmoothTransformation)
 
 
 class PageGetter(QtCore.QObject):
+    """Passes the versions of a page from the loading threads to the GUI slots, as DisplayImage objects."""
     local_version_available = QtCore.pyqtSignal(object)
     background_version_available = QtCore.pyqtSignal(object)
     global_version_available = QtCore.pyqtSignal(object)
+    combined_version_available = QtCore.pyqtSignal(object)
+    background_version_replaced = QtCore.pyqtSignal(int, object)
+    background_version_removed = QtCore.pyqtSignal(int)
+    global_version_replaced = QtCore.pyqtSignal(int, object)
+    global_version_removed = QtCore.pyqtSignal(int)
 
-    def __init__(self, local_version_slot: Callable, background_version_slot: Callable, global_version_slot: Callable):
+    def __init__(self, local_version_slot: Callable, background_version_slot: Callable, global_version_slot: Callable,
+                 combined_version_slot: Optional[Callable] = None,
+                 background_replace_slot: Optional[Callable] = None,
+                 background_remove_slot: Optional[Callable] = None,
+                 global_replace_slot: Optional[Callable] = None,
+                 global_remove_slot: Optional[Callable] = None):
         """
         :param local_version_slot: The function that gets called when a new local version becomes available.
         :param background_version_slot: The function that gets called when a new background version becomes available.
         :param global_version_slot: The function that gets called when a new global version becomes available.
+        :param combined_version_slot: The function that gets called when the page in the selected combination
+        of improvements becomes available (with None if that combination failed to compile).
+        :param background_replace_slot: The function that gets called with an index and a pixmap when an instant
+        preview of a background version is replaced by the compiled version. Instant previews are only sent
+        if this slot and background_remove_slot are provided.
+        :param background_remove_slot: The function that gets called with an index when the background version
+        previewed under that index has failed to compile.
+        :param global_replace_slot: Same as background_replace_slot, for the global versions.
+        :param global_remove_slot: Same as background_remove_slot, for the global versions.
         """
         super().__init__()
         self.local_version_available.connect(lambda pixmap: local_version_slot(pixmap, self))
         self.background_version_available.connect(lambda pixmap: background_version_slot(pixmap, self))
         self.global_version_available.connect(lambda pixmap: global_version_slot(pixmap, self))
+        if combined_version_slot:
+            self.combined_version_available.connect(lambda pixmap: combined_version_slot(pixmap, self))
+        self._accepts_background_previews = bool(background_replace_slot and background_remove_slot)
+        if self._accepts_background_previews:
+            self.background_version_replaced.connect(lambda idx, pixmap: background_replace_slot(idx, pixmap, self))
+            self.background_version_removed.connect(lambda idx: background_remove_slot(idx, self))
+        self._accepts_global_previews = bool(global_replace_slot and global_remove_slot)
+        if self._accepts_global_previews:
+            self.global_version_replaced.connect(lambda idx, pixmap: global_replace_slot(idx, pixmap, self))
+            self.global_version_removed.connect(lambda idx: global_remove_slot(idx, self))
 
         self._is_canceled = False
         self._checker_lock = Lock()
@@ -35,18 +83,65 @@ class PageGetter(QtCore.QObject):
             if self._is_canceled:
                 return
 
-        self.local_version_available.emit(version)
+        self.local_version_available.emit(DisplayImage(version))
 
     def add_background_version(self, version):
         with self._checker_lock:
             if self._is_canceled:
                 return
 
-        self.background_version_available.emit(version)
+        self.background_version_available.emit(DisplayImage(version))
 
     def add_global_version(self, version):
         with self._checker_lock:
             if self._is_canceled:
                 return
 
-        self.global_version_available.emit(version)
+        self.global_version_available.emit(DisplayImage(version))
+
+    def add_combined_version(self, version):
+        with self._checker_lock:
+            if self._is_canceled:
+                return
+
+        self.combined_version_available.emit(DisplayImage(version) if version is not None else None)
+
+    def accepts_background_previews(self) -> bool:
+        """
+        :return: True if instant previews of background versions can be sent (see replace_background_version).
+        """
+        return self._accepts_background_previews
+
+    def replace_background_version(self, idx: int, version):
+        with self._checker_lock:
+            if self._is_canceled:
+                return
+
+        self.background_version_replaced.emit(idx, DisplayImage(version))
+
+    def remove_background_version(self, idx: int):
+        with self._checker_lock:
+            if self._is_canceled:
+                return
+
+        self.background_version_removed.emit(idx)
+
+    def accepts_global_previews(self) -> bool:
+        """
+        :return: True if instant previews of global versions can be sent (see replace_global_version).
+        """
+        return self._accepts_global_previews
+
+    def replace_global_version(self, idx: int, version):
+        with self._checker_lock:
+            if self._is_canceled:
+                return
+
+        self.global_version_replaced.emit(idx, DisplayImage(version))
+
+    def remove_global_version(self, idx: int):
+        with self._checker_lock:
+            if self._is_canceled:
+                return
+
+        self.global_version_removed.emit(idx)
@@ -0,0 +1,114 @@
+import re
+from typing import List, Tuple
+
+import fitz
+import numpy as np
+from PIL import Image, ImageChops
+
+
+PALETTE_SIZE = 4  # number of colors defined by a color set (see color_generator.get_random_color_set)
+PALETTE_MIN_SATURATION = 48  # minimal difference between the channels of a pixel for it to be a palette color
+PALETTE_MIN_COVERAGE = 0.0005  # minimal fraction of the page covered by a color for it to be a palette color
+PALETTE_SAMPLING_STEP = 4  # only every n-th pixel (in both directions) is examined
+PALETTE_QUANTIZATION = 8  # width of the bins (per channel) used to group similar colors
+RECOLOR_TOLERANCE = 80.0  # maximal distance (in RGB space) of a remapped pixel from the palette color
+
+_COLOR_DEFINITION_REGEX = re.compile(r"\\definecolor\{[^}]*\}\{RGB\}\{\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\}")
+
+
+def composite_background(page_pixmap, background_path: str):
+    """
+    Approximates the page with a background image without compiling it, by blending the render of the original page
+    with the image. Beamer draws the background under the content of the page, but the background canvas of the
+    original page is usually filled (white) - the images are therefore multiplied, so that the light areas of the page
+    show the background and the dark content stays on top of it.
+    :param page_pixmap: RGBA render of the original page (see graphics.pixmap_from_document).
+    :param background_path: path to the background image.
+    :return: RGBA pixmap of the same size as the page render, or None if the image can't be read.
+    """
+    size = (page_pixmap.width, page_pixmap.height)
+    page = Image.frombuffer("RGBA", size, page_pixmap.samples, "raw", "RGBA", page_pixmap.stride, 1)
+    try:
+        with Image.open(background_path) as background_image:
+            background = background_image.convert("RGB").resize(size)
+    except OSError:
+        return None
+
+    # Transparent areas of the page (if the canvas is not filled) show the background as well
+    page_on_white = Image.new("RGBA", size, (255, 255, 255, 255))
+    page_on_white.alpha_composite(page)
+
+    composite = ImageChops.multiply(page_on_white.convert("RGB"), background).convert("RGBA")
+    return fitz.Pixmap(fitz.csRGB, size[0], size[1], composite.tobytes(), 1)
+
+
+def palette_colors(page_pixmap, count=PALETTE_SIZE) -> List[Tuple[int, int, int]]:
+    """
+    Detects the palette of the page - its dominant saturated colors (shades of gray, e.g. text and the canvas,
+    are not a part of the palette).
+    :return: up to count colors, the most common first.
+    """
+    pixels = _pixel_array(page_pixmap)[::PALETTE_SAMPLING_STEP, ::PALETTE_SAMPLING_STEP]
+    rgb = pixels[..., :3].reshape(-1, 3).astype(np.int32)
+    opaque = pixels[..., 3].reshape(-1) > 0
+    saturated = (rgb.max(axis=1) - rgb.min(axis=1) >= PALETTE_MIN_SATURATION) & opaque
+    if not saturated.any():
+        return []
+
+    candidates = rgb[saturated]
+    bins = candidates // PALETTE_QUANTIZATION
+    keys = (bins[:, 0] << 16) | (bins[:, 1] << 8) | bins[:, 2]
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+
+    palette = []
+    for key_idx in np.argsort(counts)[::-1]:
+        if counts[key_idx] < PALETTE_MIN_COVERAGE * len(rgb) or len(palette) == count:
+            break
+        color = candidates[inverse.reshape(-1) == key_idx].mean(axis=0)
+        palette.append(tuple(int(round(channel)) for channel in color))
+    return palette
+
+
+def color_set_palette(color_defs: str) -> List[Tuple[int, int, int]]:
+    """
+    :param color_defs: global color definitions of a color set (see color_generator.get_random_color_set).
+    :return: RGB values of the colors defined by the set, in the order of definition.
+    """
+    return [tuple(int(channel) for channel in match.groups()) for match in _COLOR_DEFINITION_REGEX.finditer(color_defs)]
+
+
+def recolor_page(page_pixmap, source_colors: List[Tuple[int, int, int]],
+                 target_colors: List[Tuple[int, int, int]]):
+    """
+    Approximates the page in another color set without compiling it, by shifting the pixels close to each source color
+    towards the corresponding target color. The shift fades out with the distance from the source color, so that
+    antialiased edges blend smoothly with their surroundings.
+    :return: RGBA pixmap of the same size as the page render.
+    """
+    pixels = _pixel_array(page_pixmap)
+    rgb = pixels[..., :3].astype(np.float32)
+    pairs = list(zip(source_colors, target_colors))
+    if not pairs:
+        return fitz.Pixmap(page_pixmap)
+
+    # Palettes are small - a loop over the colors avoids materializing the distances of all pixels to all colors
+    nearest_distance = np.full(rgb.shape[:2], np.inf, dtype=np.float32)
+    shift = np.zeros_like(rgb)
+    for source, target in pairs:
+        distance = np.linalg.norm(rgb - np.array(source, dtype=np.float32), axis=2)
+        closer = distance < nearest_distance
+        nearest_distance[closer] = distance[closer]
+        shift[closer] = np.array(target, dtype=np.float32) - np.array(source, dtype=np.float32)
+
+    weight = np.clip(1.0 - nearest_distance / RECOLOR_TOLERANCE, 0.0, 1.0)[..., None]
+    recolored = np.clip(rgb + shift * weight, 0, 255).astype(np.uint8)
+    result = np.concatenate((recolored, pixels[..., 3:]), axis=2)
+    return fitz.Pixmap(fitz.csRGB, page_pixmap.width, page_pixmap.height, np.ascontiguousarray(result).tobytes(), 1)
+
+
+def _pixel_array(page_pixmap) -> np.ndarray:
+    """
+    :return: array of shape (height, width, 4) with the RGBA pixels of the pixmap.
+    """
+    rows = np.frombuffer(page_pixmap.samples, dtype=np.uint8).reshape(page_pixmap.height, page_pixmap.stride)
+    return rows[:, :page_pixmap.width * page_pixmap.n].reshape(page_pixmap.height, page_pixmap.width, page_pixmap.n)
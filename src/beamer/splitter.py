@@ -0,0 +1,161 @@
+from typing import Iterator, TextIO
+
+from src.beamer import tokens
+
+
+class NotBeamerPresentation(ValueError):
+    pass
+
+
+class FrameCountError(RuntimeError):
+    pass
+
+
+class FrameRecord:
+    """A single frame found in the document."""
+    def __init__(self, idx: int, begin: int, end: int, code: str):
+        """
+        :param idx: index of the frame in the document (starting at 0).
+        :param begin: position of the frame begin token in the document.
+        :param end: position right after the frame end token in the document.
+        :param code: code of the frame, encapsuled by \\begin{frame} and \\end{frame} commands.
+        """
+        self.idx = idx
+        self.begin = begin
+        self.end = end
+        self.code = code
+
+
+class FrameSplitter:
+    """Splits a Beamer document into frames in a single pass, reading the source incrementally. Frames are yielded
+        as soon as they are read, so they can be processed while the rest of the document is still being parsed."""
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, source: TextIO):
+        """
+        :param source: text stream with the document code.
+        """
+        self._source = source
+        self._chunks = []
+        self._buffer = ""
+        self._buffer_offset = 0  # position of the buffer beginning in the document
+        self._eof = False
+
+        self._header = None
+        self._tail = ""
+
+    def frames(self) -> Iterator[FrameRecord]:
+        """
+        Reads the document and yields all frames found in it. Can be called only once.
+        :raises NotBeamerPresentation: if the document header doesn't declare a Beamer presentation.
+        :raises FrameCountError: if frame begins and ends don't match.
+        """
+        self._read_header()
+
+        frame_idx = 0
+        frame_begin = None
+        search_pos = self._buffer_offset
+        while True:
+            token, pos = self._find_next_token(search_pos, tokens.FRAME_BEGIN, tokens.FRAME_END)
+            if token is None:
+                break
+
+            search_pos = pos + len(token)
+            if token == tokens.FRAME_BEGIN:
+                if frame_begin is not None:
+                    raise FrameCountError("Detected a frame beginning inside another frame, this won't compile")
+                frame_begin = pos
+                continue
+
+            if frame_begin is None:
+                raise FrameCountError("Detected multiple consecutive frame ends, this won't compile")
+
+            frame_end = pos + len(token)
+            yield FrameRecord(frame_idx, frame_begin, frame_end, _normalize_frame_code(self._text(frame_begin, pos)))
+            self._consume_until(frame_end)
+            frame_idx += 1
+            frame_begin = None
+
+        if frame_begin is not None:
+            raise FrameCountError("Detected different numbers of frame begins and ends, this won't compile")
+
+        self._tail = self._buffer[: self._buffer.rfind(tokens.DOC_END)] if tokens.DOC_END in self._buffer else ""
+
+    def header(self) -> str:
+        """
+        :return: code that goes before the "\\begin{document}" statement (available once frames() started yielding).
+        """
+        return self._header
+
+    def header_end(self) -> int:
+        """
+        :return: position right after the last non-whitespace character of the header.
+        """
+        return len(self._header.rstrip())
+
+    def post_frames_code(self) -> str:
+        """
+        :return: code between the last frame and the "\\end{document}" statement (available once all frames
+        have been read).
+        """
+        return self._tail
+
+    def source(self) -> str:
+        """
+        :return: entire document code (available once all frames have been read).
+        """
+        return "".join(self._chunks)
+
+    def _read_header(self):
+        _, pos = self._find_next_token(0, tokens.DOC_BEGIN)
+        header = self._text(0, pos) if pos is not None else self._buffer
+        if tokens.BEAMER_DECL not in header:
+            raise NotBeamerPresentation("Provided document is not a Beamer presentation.")
+
+        self._header = header
+        self._consume_until(len(header))
+
+    def _find_next_token(self, start_pos: int, *searched_tokens: str):
+        """
+        Finds the nearest occurrence of any of the tokens after the given position, reading more of the document
+        if needed.
+        :return: tuple (token, position in the document), or (None, None) if no token occurs until the end.
+        """
+        search_from = start_pos - self._buffer_offset
+        while True:
+            found = [(self._buffer.find(token, search_from), token) for token in searched_tokens]
+            found = [(pos, token) for pos, token in found if pos >= 0]
+            if found:
+                pos, token = min(found)
+                return token, self._buffer_offset + pos
+
+            if self._eof:
+                return None, None
+
+            # A token might be split between two chunks - search again starting from the last few characters
+            search_from = max(search_from, len(self._buffer) - max(len(token) for token in searched_tokens) + 1)
+            self._read_chunk()
+
+    def _read_chunk(self):
+        chunk = self._source.read(self.CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return
+
+        self._chunks.append(chunk)
+        self._buffer += chunk
+
+    def _text(self, begin: int, end: int) -> str:
+        return self._buffer[begin - self._buffer_offset: end - self._buffer_offset]
+
+    def _consume_until(self, pos: int):
+        """Drops the already processed part of the buffer."""
+        self._buffer = self._buffer[pos - self._buffer_offset:]
+        self._buffer_offset = pos
+
+
+def _normalize_frame_code(frame_code: str) -> str:
+    frame_code = frame_code[len(tokens.FRAME_BEGIN):]
+    if not frame_code.endswith("\n"):
+        frame_code += "\n"
+    return f"{tokens.FRAME_BEGIN}{frame_code}{tokens.FRAME_END}\n"
@@ -9,10 +9,11 @@ from .color_generator import RGBRandomizer, RGBRandomizers, RandomColor
 
 class FrameProgressInfo:
     """Contains information about the frame in the context of an entire presentation"""
-    def __init__(self, frame_idx: int, frame_cnt: int):
+    def __init__(self, frame_idx: int, frame_cnt: Optional[int]):
         """
         :param frame_idx: index of the frame which will use this background (starting at 1).
-        :param frame_cnt: number of all frame in a presentation.
+        :param frame_cnt: number of all frame in a presentation (None if not known yet - must be set
+        before generating any backgrounds).
         """
         self.frame_idx = frame_idx
         self.frame_cnt = frame_cnt
@@ -1,12 +1,12 @@
 import sys
 
 from threading import Lock
-from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5 import QtGui, QtWidgets
 from PyQt5.QtWidgets import QApplication
 
 from .widgets import MainSplitter, ThumbnailsListView, GoToDialog, WaitingDialogRunner
 from src.beamer.document import BeamerDocument
-from src.beamer.page_getter import PageGetter
+from src.beamer.page_getter import PageGetter, DisplayImage
 
 
 class EmptyDocumentError(ValueError):
@@ -32,6 +32,7 @@ class MainWindow(QtWidgets.QFrame):
         layout.addWidget(self._splitter)
 
         self._image_display = self._splitter.left_pane.image_display
+        self._overview = self._splitter.left_pane.overview
         self._info_layout = self._splitter.left_pane.save_info_layout.info_layout
         self._save_button = self._splitter.left_pane.save_info_layout.save_button
         self._frame_thumbs_view = self._splitter.right_pane.frame_tab.thumbs_view
@@ -43,10 +44,11 @@ class MainWindow(QtWidgets.QFrame):
         self._splitter.left_pane.navigation_buttons.prev_button.clicked.connect(self._prev_page)
         self._splitter.left_pane.navigation_buttons.next_button.clicked.connect(self._next_page)
         self._splitter.left_pane.save_info_layout.info_layout.goto_button.clicked.connect(self._goto_button_click)
-        self._frame_thumbs_view.itemClicked.connect(lambda _: self._local_thumbnail_selection_changed())
-        self._background_thumbs_view.itemClicked.connect(lambda _: self._background_thumbnail_selection_changed())
-        self._global_thumbs_view.itemClicked.connect(lambda _: self._global_thumbnail_selection_changed())
+        self._frame_thumbs_view.clicked.connect(lambda _: self._local_thumbnail_selection_changed())
+        self._background_thumbs_view.clicked.connect(lambda _: self._background_thumbnail_selection_changed())
+        self._global_thumbs_view.clicked.connect(lambda _: self._global_thumbnail_selection_changed())
         self._save_button.clicked.connect(self._save_changes)
+        self._overview.page_clicked.connect(self._overview_page_clicked)
 
     def _init_document_logic(self, document: BeamerDocument):
         self._document = document
@@ -66,6 +68,8 @@ class MainWindow(QtWidgets.QFrame):
         self._page_getter_lock = Lock()
         self._current_page_getter = None
         self._original_page = None
+        self._original_thumbnail = None
+        self._displayed_image = None
 
         self._local_fillers_count = 0
         self._background_fillers_count = 0
@@ -97,6 +101,22 @@ class MainWindow(QtWidgets.QFrame):
             pixmap, self._curr_background_improvements, self._background_thumbs_view, self._background_fillers_count)
         self._highlight_background_thumbnail()
 
+    def _replace_background_version(self, idx, pixmap, caller: PageGetter):
+        if not self._check_caller(caller):
+            return
+
+        self._replace_version(idx, pixmap, self._curr_background_improvements, self._background_thumbs_view)
+        self._highlight_background_thumbnail()
+
+    def _remove_background_version(self, idx, caller: PageGetter):
+        if not self._check_caller(caller):
+            return
+
+        self._background_fillers_count = self._remove_version(
+            idx, self._curr_background_improvements, self._background_thumbs_view, self._background_fillers_count,
+            self._selected_background_opt)
+        self._highlight_background_thumbnail()
+
     def _add_global_version(self, pixmap, caller: PageGetter):
         if not self._check_caller(caller):
             return
@@ -105,34 +125,64 @@ class MainWindow(QtWidgets.QFrame):
             pixmap, self._curr_global_improvements, self._global_thumbs_view, self._global_fillers_count)
         self._highlight_global_thumbnail()
 
-    def _add_version(self, pixmap, improvements_list, thumbs_view, fillers_counter) -> int:
+    def _replace_global_version(self, idx, pixmap, caller: PageGetter):
+        if not self._check_caller(caller):
+            return
+
+        self._replace_version(idx, pixmap, self._curr_global_improvements, self._global_thumbs_view)
+        self._highlight_global_thumbnail()
+
+    def _remove_global_version(self, idx, caller: PageGetter):
+        if not self._check_caller(caller):
+            return
+
+        self._global_fillers_count = self._remove_version(
+            idx, self._curr_global_improvements, self._global_thumbs_view, self._global_fillers_count,
+            self._selected_global_opt)
+        self._highlight_global_thumbnail()
+
+    def _add_version(self, display_image: DisplayImage, improvements_list, thumbs_view, fillers_counter) -> int:
         """Adds version and returns the updated fillers counter."""
-        qt_pixmap = to_qt_pixmap(pixmap)
-        item = to_thumbnail_item(qt_pixmap)
         if fillers_counter > 0:
-            improvements_list[-fillers_counter] = qt_pixmap
-            thumbs_view.replaceItem(-fillers_counter, item)
+            self._replace_version(len(improvements_list) - fillers_counter, display_image, improvements_list,
+                                  thumbs_view)
             fillers_counter -= 1
         else:
-            improvements_list.append(qt_pixmap)
-            thumbs_view.addItem(item)
+            improvements_list.append(display_image.image)
+            thumbs_view.addItem(display_image.thumbnail)
 
-        self._display_page()
+        return fillers_counter
+
+    def _replace_version(self, idx, display_image: DisplayImage, improvements_list, thumbs_view):
+        """Replaces the image of a version in place (e.g. an instant preview of a version with the compiled version),
+        redisplaying it only if it's currently on display."""
+        was_displayed = improvements_list[idx] is self._displayed_image
+        improvements_list[idx] = display_image.image
+        thumbs_view.replaceItem(idx, display_image.thumbnail)
+        if was_displayed:
+            self._display_page(display_image.image)
+
+    def _remove_version(self, idx, improvements_list, thumbs_view, fillers_counter, selected_opt) -> int:
+        """Removes an instant preview of a version which failed to compile and returns the updated fillers counter."""
+        if improvements_list[idx] is self._displayed_image:
+            self._display_page()
+        del improvements_list[idx]
+        thumbs_view.removeItem(idx)
+        if len(improvements_list) <= selected_opt:
+            # The preview took the place of a filler, which is still needed to keep the selected version's position
+            fillers_counter += self._create_fillers(1, improvements_list, thumbs_view)
         return fillers_counter
 
     def _highlight_local_thumbnail(self):
-        item_to_highlight = self._frame_thumbs_view.items()[self._selected_local_opt]
-        self._frame_thumbs_view.setCurrentItem(item_to_highlight)
+        self._frame_thumbs_view.setCurrentRow(self._selected_local_opt)
         self._local_highlighted_opt = self._selected_local_opt
 
     def _highlight_background_thumbnail(self):
-        item_to_highlight = self._background_thumbs_view.items()[self._selected_background_opt]
-        self._background_thumbs_view.setCurrentItem(item_to_highlight)
+        self._background_thumbs_view.setCurrentRow(self._selected_background_opt)
         self._background_highlighted_opt = self._selected_background_opt
 
     def _highlight_global_thumbnail(self):
-        item_to_highlight = self._global_thumbs_view.items()[self._selected_global_opt]
-        self._global_thumbs_view.setCurrentItem(item_to_highlight)
+        self._global_thumbs_view.setCurrentRow(self._selected_global_opt)
         self._global_highlighted_opt = self._selected_global_opt
 
     def _prev_page(self):
@@ -165,6 +215,10 @@ class MainWindow(QtWidgets.QFrame):
         self._load_original_page(original_page)
         self._info_layout.update()
 
+    def _overview_page_clicked(self, page_idx):
+        if page_idx != self._document.current_page_idx():
+            self._goto_page(page_idx)
+
     def _goto_frame(self, frame_idx):
         self._prepare_page_getter()
         original_page = self._document.goto_frame(frame_idx, self._current_page_getter)
@@ -181,7 +235,7 @@ class MainWindow(QtWidgets.QFrame):
 
         self._curr_background_improvements = [self._original_page]
         self._background_thumbs_view.clear()
-        self._background_thumbs_view.addItem(to_thumbnail_item(self._original_page))
+        self._background_thumbs_view.addItem(self._original_thumbnail)
         self._background_fillers_count = self._create_fillers(
             self._document.current_background_improvements().selected_index(),
             self._curr_background_improvements,
@@ -195,7 +249,11 @@ class MainWindow(QtWidgets.QFrame):
                 self._current_page_getter.cancel()
 
             self._current_page_getter = PageGetter(self._add_local_version, self._add_background_version,
-                                                   self._add_global_version)
+                                                   self._add_global_version,
+                                                   background_replace_slot=self._replace_background_version,
+                                                   background_remove_slot=self._remove_background_version,
+                                                   global_replace_slot=self._replace_global_version,
+                                                   global_remove_slot=self._remove_global_version)
 
     def _prepare_page_load(self):
         self._curr_local_improvements.clear()
@@ -211,15 +269,17 @@ class MainWindow(QtWidgets.QFrame):
         self._global_fillers_count = 0
 
     def _load_original_page(self, pixmap):
-        self._original_page = to_qt_pixmap(pixmap)
+        display_image = DisplayImage(pixmap)
+        self._original_page = display_image.image
+        self._original_thumbnail = display_image.thumbnail
 
         self._curr_local_improvements = [self._original_page]
         self._curr_background_improvements = [self._original_page]
         self._curr_global_improvements = [self._original_page]
 
-        self._frame_thumbs_view.addItem(to_thumbnail_item(self._original_page))
-        self._background_thumbs_view.addItem(to_thumbnail_item(self._original_page))
-        self._global_thumbs_view.addItem(to_thumbnail_item(self._original_page))
+        self._frame_thumbs_view.addItem(self._original_thumbnail)
+        self._background_thumbs_view.addItem(self._original_thumbnail)
+        self._global_thumbs_view.addItem(self._original_thumbnail)
 
         self._selected_local_opt = self._document.current_local_improvements().selected_index()
         self._selected_background_opt = self._document.current_background_improvements().selected_index()
@@ -235,6 +295,7 @@ class MainWindow(QtWidgets.QFrame):
             self._selected_global_opt, self._curr_global_improvements, self._global_thumbs_view)
 
         self._display_page()
+        self._overview.set_current_page(self._document.current_page_idx())
         self._highlight_local_thumbnail()
         self._highlight_background_thumbnail()
         self._highlight_global_thumbnail()
@@ -242,22 +303,19 @@ class MainWindow(QtWidgets.QFrame):
     def _create_fillers(self, count: int, improvements_list, thumbs_view):
         """Creates filler improvements. Returns a number of how many were created."""
         for _ in range(count):
-            filler_pixmap = self._original_page.copy()
-            filler_pixmap.fill(QtGui.QColor(200, 200, 200))
-            improvements_list.append(filler_pixmap)
-            thumbs_view.addItem(to_thumbnail_item(filler_pixmap))
+            filler_image = self._original_page.copy()
+            filler_image.fill(QtGui.QColor(200, 200, 200))
+            filler_thumbnail = self._original_thumbnail.copy()
+            filler_thumbnail.fill(QtGui.QColor(200, 200, 200))
+            improvements_list.append(filler_image)
+            thumbs_view.addItem(filler_thumbnail)
         return count
 
     def _display_page(self, image_to_display=None):
         if image_to_display is None:
             image_to_display = self._original_page
-        current_width = self._image_display.width()
-        current_height = self._image_display.height()
-        pixmap = image_to_display.scaled(
-            current_width, current_height,
-            QtCore.Qt.AspectRatioMode.KeepAspectRatio, QtCore.Qt.TransformationMode.SmoothTransformation
-        )
-        self._image_display.setPixmap(pixmap)
+        self._displayed_image = image_to_display
+        self._image_display.show_image(image_to_display)
 
     def _local_thumbnail_selection_changed(self):
         self._local_highlighted_opt = self._thumbnail_selection_changed(
@@ -283,10 +341,9 @@ class MainWindow(QtWidgets.QFrame):
         :return: Index of the highlighted thumbnail.
         """
         highlighted_idx = thumbs_view.selectedIndex()
-        thumb_items = thumbs_view.items()
 
-        if highlighted_idx in (None, curr_selected_opt) and len(thumb_items) > curr_selected_opt:
-            thumbs_view.setCurrentItem(thumb_items[curr_selected_opt])
+        if highlighted_idx in (None, curr_selected_opt) and thumbs_view.count() > curr_selected_opt:
+            thumbs_view.setCurrentRow(curr_selected_opt)
             highlighted_idx = curr_selected_opt
 
         self._handle_thumb_highlight(improvements_list, highlighted_idx)
@@ -339,17 +396,10 @@ class MainWindow(QtWidgets.QFrame):
         self._goto_dialog.destroy()
         self._goto_dialog = None
 
-    def resizeEvent(self, event):
-        self._display_page()
-        super(MainWindow, self).resizeEvent(event)
-
-    def showEvent(self, event):
-        self._display_page()
-        super(MainWindow, self).showEvent(event)
-
     def closeEvent(self, a0: QtGui.QCloseEvent):
         if not self._splitter.any_change_done():
             a0.accept()
+            self._document.close()
             return
 
         message_title = "Discard changes?"
@@ -360,25 +410,11 @@ class MainWindow(QtWidgets.QFrame):
                                                    QtWidgets.QMessageBox.Cancel)
         if selection == QtWidgets.QMessageBox.Ok:
             a0.accept()
+            self._document.close()
         else:
             a0.ignore()
 
 
-def to_qt_pixmap(fitz_pixmap):
-    img = QtGui.QImage(fitz_pixmap.samples, fitz_pixmap.width, fitz_pixmap.height,
-                       fitz_pixmap.width * fitz_pixmap.n, QtGui.QImage.Format_RGBA8888)
-    return QtGui.QPixmap.fromImage(img)
-
-
-def to_thumbnail_item(qt_pixmap):
-    pixmap = qt_pixmap.scaled(200, 200,
-                              QtCore.Qt.AspectRatioMode.KeepAspectRatio,
-                              QtCore.Qt.TransformationMode.SmoothTransformation)
-    item = QtWidgets.QListWidgetItem()
-    item.setIcon(QtGui.QIcon(pixmap))
-    return item
-
-
 def run_app(app: QApplication, doc_path: str, doc_folder: str):
     def document_compiled(document: BeamerDocument):
         viewer = MainWindow(document, doc_folder)
@@ -0,0 +1,173 @@
+from collections import OrderedDict
+from threading import Thread, Condition
+from typing import Callable
+
+from PyQt5 import QtWidgets, QtCore, QtGui
+
+from src.beamer.document import BeamerDocument
+from src.beamer.page_getter import DisplayImage
+
+
+THUMBNAIL_WIDTH = 160  # pixels
+VISIBLE_MARGIN = 4  # pages beyond each edge of the view that are rendered in advance
+
+
+class ThumbnailRenderer(QtCore.QObject):
+    """Renders page thumbnails on a single background thread. The most recently requested page is rendered first,
+        and requests for pages that are no longer needed can be cancelled before they're started."""
+    thumbnail_ready = QtCore.pyqtSignal(int, object)
+
+    def __init__(self, render_function: Callable):
+        """
+        :param render_function: function rendering the page with the given index into an RGBA pixmap.
+        """
+        super().__init__()
+        self._render_function = render_function
+        self._pending = OrderedDict()  # page index -> None, most recent request last
+        self._condition = Condition()
+
+        thread = Thread(target=self._run, daemon=True)
+        thread.start()
+
+    def request(self, page_idx: int):
+        with self._condition:
+            self._pending[page_idx] = None
+            self._pending.move_to_end(page_idx)
+            self._condition.notify()
+
+    def retain(self, first_page_idx: int, last_page_idx: int):
+        """
+        Cancels the pending requests for the pages outside the given range.
+        """
+        with self._condition:
+            for page_idx in [idx for idx in self._pending if not first_page_idx <= idx <= last_page_idx]:
+                del self._pending[page_idx]
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                page_idx, _ = self._pending.popitem(last=True)
+
+            thumbnail = DisplayImage(self._render_function(page_idx)).image
+            self.thumbnail_ready.emit(page_idx, thumbnail)
+
+
+class OverviewModel(QtCore.QAbstractListModel):
+    """All pages of the document, with thumbnails rendered lazily - only when the view asks for them and they're
+        in the visible range (the view may also ask for items it doesn't display, e.g. while laying them out).
+        Rendered thumbnails are cached, up to CACHE_SIZE most recently shown ones."""
+    CACHE_SIZE = 400
+
+    def __init__(self, parent: QtCore.QObject, document: BeamerDocument):
+        super().__init__(parent)
+        self._page_count = document.page_count()
+        self._cache = OrderedDict()  # page index -> QImage, least recently shown first
+        self._visible_range = (0, -1)  # unknown until the view is laid out
+
+        first_page = DisplayImage(document.page_thumbnail(0, THUMBNAIL_WIDTH)).image
+        self._cache[0] = first_page
+        self._placeholder = QtGui.QImage(first_page.size(), QtGui.QImage.Format_RGBA8888)
+        self._placeholder.fill(QtGui.QColor(200, 200, 200))
+
+        self._renderer = ThumbnailRenderer(lambda page_idx: document.page_thumbnail(page_idx, THUMBNAIL_WIDTH))
+        self._renderer.thumbnail_ready.connect(self._thumbnail_ready)
+
+    def thumbnail_size(self) -> QtCore.QSize:
+        return self._placeholder.size()
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._page_count
+
+    def data(self, index: QtCore.QModelIndex, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        page_idx = index.row()
+        if role == QtCore.Qt.DisplayRole:
+            return str(page_idx + 1)
+        if role != QtCore.Qt.DecorationRole:
+            return None
+
+        thumbnail = self._cache.get(page_idx)
+        if thumbnail is None:
+            if self._visible_range[0] <= page_idx <= self._visible_range[1]:
+                self._renderer.request(page_idx)
+            return self._placeholder
+        self._cache.move_to_end(page_idx)
+        return thumbnail
+
+    def set_visible_range(self, first_page_idx: int, last_page_idx: int) -> bool:
+        """
+        Sets the range of pages whose thumbnails may be rendered, and cancels rendering of the thumbnails outside it
+        (e.g. scrolled out of view).
+        :return: True if the range has changed.
+        """
+        if (first_page_idx, last_page_idx) == self._visible_range:
+            return False
+        self._visible_range = (first_page_idx, last_page_idx)
+        self._renderer.retain(first_page_idx, last_page_idx)
+        return True
+
+    def _thumbnail_ready(self, page_idx: int, thumbnail: QtGui.QImage):
+        self._cache[page_idx] = thumbnail
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+        index = self.index(page_idx)
+        self.dataChanged.emit(index, index, [QtCore.Qt.DecorationRole])
+
+
+class OverviewStrip(QtWidgets.QListView):
+    """Filmstrip of all pages of the document. Only the visible thumbnails are rendered, so it stays light even for
+        very long documents."""
+    page_clicked = QtCore.pyqtSignal(int)
+
+    def __init__(self, parent: QtWidgets.QWidget, document: BeamerDocument):
+        super().__init__(parent)
+        self._model = OverviewModel(self, document)
+        self.setModel(self._model)
+
+        self.setViewMode(QtWidgets.QListView.IconMode)
+        self.setFlow(QtWidgets.QListView.LeftToRight)
+        self.setWrapping(False)
+        self.setMovement(QtWidgets.QListView.Static)
+        self.setUniformItemSizes(True)  # the view doesn't need to query every item to lay them out
+        self.setHorizontalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+
+        thumbnail_size = self._model.thumbnail_size()
+        self.setIconSize(thumbnail_size)
+        self.setSpacing(4)
+        label_height = self.fontMetrics().height()
+        scrollbar_height = self.horizontalScrollBar().sizeHint().height()
+        self.setFixedHeight(thumbnail_size.height() + label_height + scrollbar_height + 24)
+
+        self.clicked.connect(lambda index: self.page_clicked.emit(index.row()))
+        self.horizontalScrollBar().valueChanged.connect(lambda _: self._update_visible_range())
+
+    def set_current_page(self, page_idx: int):
+        index = self._model.index(page_idx)
+        self.setCurrentIndex(index)
+        self.scrollTo(index, QtWidgets.QAbstractItemView.EnsureVisible)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_visible_range()
+
+    def _update_visible_range(self):
+        page_count = self._model.rowCount()
+        if page_count < 2:
+            return
+
+        # Items have uniform sizes, so the visible range follows from the distance between consecutive items
+        first_left = self.rectForIndex(self._model.index(0)).left()
+        step = self.rectForIndex(self._model.index(1)).left() - first_left
+        if step <= 0:
+            return
+        offset = self.horizontalOffset() - first_left
+        first_page_idx = offset // step
+        last_page_idx = (offset + self.viewport().width()) // step
+        if self._model.set_visible_range(first_page_idx - VISIBLE_MARGIN, last_page_idx + VISIBLE_MARGIN):
+            self.viewport().update()  # request the thumbnails which were skipped outside the previous range
@@ -1,9 +1,10 @@
+from collections import OrderedDict
 from typing import Optional, Callable
 
-from PyQt5 import QtWidgets, QtCore
-from PyQt5.QtWidgets import QListWidgetItem
+from PyQt5 import QtWidgets, QtCore, QtGui
 
 from src.beamer.document import BeamerDocument
+from .overview import OverviewStrip
 
 
 class MainSplitter(QtWidgets.QSplitter):
@@ -40,10 +41,12 @@ class MainSplitterLeftPane(QtWidgets.QWidget):
         self.setLayout(layout)
 
         self.image_display = ImageDisplay(self)
+        self.overview = OverviewStrip(self, document)
         self.save_info_layout = SaveAndInfoLayout(document)
         self.navigation_buttons = NavigationButtonsLayout()
 
         layout.addWidget(self.image_display)
+        layout.addWidget(self.overview)
         layout.addLayout(self.save_info_layout)
         layout.addLayout(self.navigation_buttons)
 
@@ -169,52 +172,167 @@ class FunctionButtonsLayout(QtWidgets.QHBoxLayout):
 
 
 class ImageDisplay(QtWidgets.QLabel):
+    """Displays an image scaled to the size of the widget. While the widget is being resized, the image is scaled
+        with a fast transformation - the smooth one is applied once the resizing settles. Smoothly scaled images are
+        cached, so switching between recently displayed images doesn't scale them again."""
+    RESIZE_SETTLE_TIME = 150  # milliseconds without resizing after which the image is scaled smoothly
+    SCALED_CACHE_SIZE = 8
+
     def __init__(self, parent: QtWidgets.QWidget):
         super().__init__(parent)
         self.setSizePolicy(QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Expanding)
         self.setAlignment(QtCore.Qt.AlignCenter)
+        self.setMinimumSize(1, 1)  # the displayed pixmap mustn't prevent the widget from shrinking
+
+        self._image = None
+        self._scaled_cache = OrderedDict()  # (image key, width, height) -> QPixmap, least recently used first
+
+        self._settle_timer = QtCore.QTimer(self)
+        self._settle_timer.setSingleShot(True)
+        self._settle_timer.setInterval(self.RESIZE_SETTLE_TIME)
+        self._settle_timer.timeout.connect(self._render_smooth)
 
     def sizeHint(self) -> QtCore.QSize:
         return QtCore.QSize(950, 500)
 
+    def show_image(self, image: QtGui.QImage):
+        """
+        :param image: full-resolution image to be displayed.
+        """
+        self._image = image
+        self._render_smooth()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self._image is None:
+            return
+
+        cached = self._scaled_cache.get(self._cache_key())
+        if cached is not None:
+            self.setPixmap(cached)
+            return
+
+        self.setPixmap(QtGui.QPixmap.fromImage(self._scaled(QtCore.Qt.TransformationMode.FastTransformation)))
+        self._settle_timer.start()
+
+    def _render_smooth(self):
+        self._settle_timer.stop()
+        if self._image is None:
+            return
+
+        key = self._cache_key()
+        pixmap = self._scaled_cache.get(key)
+        if pixmap is None:
+            pixmap = QtGui.QPixmap.fromImage(self._scaled(QtCore.Qt.TransformationMode.SmoothTransformation))
+            self._scaled_cache[key] = pixmap
+            if len(self._scaled_cache) > self.SCALED_CACHE_SIZE:
+                self._scaled_cache.popitem(last=False)
+        else:
+            self._scaled_cache.move_to_end(key)
+
+        self.setPixmap(pixmap)
+
+    def _scaled(self, transformation) -> QtGui.QImage:
+        return self._image.scaled(self.width(), self.height(), QtCore.Qt.AspectRatioMode.KeepAspectRatio,
+                                  transformation)
+
+    def _cache_key(self):
+        return self._image.cacheKey(), self.width(), self.height()
+
+
+class ThumbnailsModel(QtCore.QAbstractListModel):
+    """List of thumbnail images, updated in place. Changes of the existing rows are collected and announced with a single
+        dataChanged signal once control returns to the event loop, so a burst of updates causes a single repaint."""
 
-class ThumbnailsListView(QtWidgets.QListWidget):
+    def __init__(self, parent: QtCore.QObject):
+        super().__init__(parent)
+        self._thumbnails = []
+        self._changed_rows = set()
+
+        self._flush_timer = QtCore.QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(0)
+        self._flush_timer.timeout.connect(self._flush_changes)
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._thumbnails)
+
+    def data(self, index: QtCore.QModelIndex, role=QtCore.Qt.DisplayRole):
+        if index.isValid() and role == QtCore.Qt.DecorationRole:
+            return self._thumbnails[index.row()]
+        return None
+
+    def append(self, thumbnail: QtGui.QImage):
+        row = len(self._thumbnails)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self._thumbnails.append(thumbnail)
+        self.endInsertRows()
+
+    def replace(self, row: int, thumbnail: QtGui.QImage):
+        if row < 0:
+            row += len(self._thumbnails)
+        self._thumbnails[row] = thumbnail
+        self._changed_rows.add(row)
+        self._flush_timer.start()
+
+    def remove(self, row: int):
+        if row < 0:
+            row += len(self._thumbnails)
+        self._flush_changes()  # pending rows refer to the indexes before the removal
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self._thumbnails[row]
+        self.endRemoveRows()
+
+    def clear(self):
+        self._flush_timer.stop()
+        self._changed_rows.clear()
+        self.beginResetModel()
+        self._thumbnails.clear()
+        self.endResetModel()
+
+    def _flush_changes(self):
+        self._flush_timer.stop()
+        if not self._changed_rows:
+            return
+
+        first, last = min(self._changed_rows), max(self._changed_rows)
+        self._changed_rows.clear()
+        self.dataChanged.emit(self.index(first), self.index(last), [QtCore.Qt.DecorationRole])
+
+
+class ThumbnailsListView(QtWidgets.QListView):
     def __init__(self, parent: QtWidgets.QWidget):
         super().__init__(parent)
-        self._items = []
+        self._model = ThumbnailsModel(self)
+        self.setModel(self._model)
 
-        self.setViewMode(QtWidgets.QListWidget.IconMode)
+        self.setViewMode(QtWidgets.QListView.IconMode)
         self.setIconSize(QtCore.QSize(460, 300))
-        self.setResizeMode(QtWidgets.QListWidget.Adjust)
-        self.setMovement(QtWidgets.QListWidget.Static)
+        self.setResizeMode(QtWidgets.QListView.Adjust)
+        self.setMovement(QtWidgets.QListView.Static)
+        self.setUniformItemSizes(True)
 
-    def items(self):
-        return self._items
+    def count(self) -> int:
+        return self._model.rowCount()
 
-    def addItem(self, aitem: QListWidgetItem) -> None:
-        super().addItem(aitem)
-        self._items.append(aitem)
+    def addItem(self, thumbnail: QtGui.QImage) -> None:
+        self._model.append(thumbnail)
 
-    def replaceItem(self, idx: int, new_item: QListWidgetItem):
-        if idx < 0:
-            idx += len(self._items)
-        self._items = [item.clone() for item in self._items]
-        self._items[idx] = new_item
+    def replaceItem(self, idx: int, thumbnail: QtGui.QImage):
+        self._model.replace(idx, thumbnail)
 
-        super().clear()
-        for item in self._items:
-            super().addItem(item)
+    def removeItem(self, idx: int):
+        self._model.remove(idx)
 
     def clear(self) -> None:
-        super().clear()
-        self._items.clear()
+        self._model.clear()
+
+    def setCurrentRow(self, idx: int):
+        self.setCurrentIndex(self._model.index(idx))
 
     def selectedIndex(self) -> Optional[int]:
-        curr_item = self.currentItem()
-        try:
-            return self._items.index(curr_item) if curr_item else None
-        except ValueError:
-            return None
+        curr_index = self.currentIndex()
+        return curr_index.row() if curr_index.isValid() else None
 
 
 class NavigationButton(QtWidgets.QPushButton):
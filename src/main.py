@@ -1,18 +1,108 @@
 import os.path
+import secrets
 import sys
+import tempfile
+from typing import Optional
 
 from PyQt5 import QtWidgets
 
 from gui.app import run_app
 from gui.selector import get_user_document_path
 from src.beamer.document import BeamerDocument
+from src.beamer.compilation.workspace import set_workspace_mode, configure_workspace, WorkspaceMode, \
+    InvalidWorkspaceMode
+from src.beamer.compilation.retention import LogRetentionPolicy, set_log_retention_policy
+from src.beamer.compilation.workers import configure_warm_workers
+from src.beamer.compilation.remote import configure_remote_compilation, LoadBalancing, TOKEN_ENVIRONMENT_VARIABLE
+from src.beamer.compilation.compile_server import create_compile_server
+from src.beamer.compilation.engines import configure_engine
+from src.beamer.compilation.proxies import configure_proxy_images
+from src.beamer.compilation.loading_handler import PageLoadingHandler
+from src.beamer.compilation.tikz import configure_tikz_cache
 from examples.selector import select_example
 
 
 def main():
     example_switches = ('-e', '--example')
+    workspace_mode_switches = ('-w', '--workspace-mode')  # copy (default), link or texinputs
+    workspace_root_switches = ('--workspace-root',)
+    workspace_quota_switches = ('--workspace-quota',)  # in megabytes
+    keep_workspace_switches = ('--keep-workspace',)
+    keep_logs_switches = ('--keep-logs',)
+    failed_logs_only_switches = ('--failed-logs-only',)
+    compress_logs_switches = ('--compress-logs',)
+    warm_workers_switches = ('--warm-workers',)
+    serve_switches = ('--serve',)  # runs a compile server on the given address, without the GUI
+    serve_store_switches = ('--serve-store',)
+    serve_remote_clients_switches = ('--serve-remote-clients',)  # the server may listen on non-loopback addresses
+    compile_token_switches = ('--compile-token',)  # secret shared by the compile servers and their clients
+    compile_servers_switches = ('--compile-servers',)  # comma-separated addresses
+    load_balancing_switches = ('--load-balancing',)
+    engine_switches = ('--engine',)  # xelatex, pdflatex, lualatex or auto
+    full_quality_previews_switches = ('--full-quality-previews',)  # previews use original images, not proxies
+    full_overlay_previews_switches = ('--full-overlay-previews',)  # previews of overlays compile whole frames
+    tikz_cache_switches = ('--tikz-cache',)  # TikZ pictures are externalized (runs TeX with shell escape)
+
+    compile_token = get_switch_value(compile_token_switches) or os.environ.get(TOKEN_ENVIRONMENT_VARIABLE)
+
+    serve_address = get_switch_value(serve_switches)
+    if serve_address:
+        store_dir_path = get_switch_value(serve_store_switches) \
+            or os.path.join(tempfile.gettempdir(), "bb-compile-store")
+        if not compile_token:
+            compile_token = secrets.token_urlsafe(24)
+            print(f"Generated compile token: {compile_token}")
+        server = create_compile_server(serve_address, store_dir_path, compile_token,
+                                       allow_remote_clients=any([switch in sys.argv
+                                                                 for switch in serve_remote_clients_switches]))
+        print(f"Serving compilations on {serve_address} (store: {store_dir_path}).")
+        server.serve_forever()
+        return
+
     app = QtWidgets.QApplication(sys.argv)
 
+    workspace_mode = get_switch_value(workspace_mode_switches)
+    if workspace_mode:
+        try:
+            set_workspace_mode(workspace_mode)
+        except InvalidWorkspaceMode as error:
+            print(f"{error}; valid modes: {', '.join(WorkspaceMode.ALL)}.")
+            return
+
+    workspace_quota = get_switch_value(workspace_quota_switches)
+    keep_workspace = any([switch in sys.argv for switch in keep_workspace_switches])
+    configure_workspace(get_switch_value(workspace_root_switches),
+                        int(workspace_quota) * 1024 * 1024 if workspace_quota else None,
+                        True if keep_workspace else None)
+
+    keep_logs = get_switch_value(keep_logs_switches)
+    set_log_retention_policy(LogRetentionPolicy(
+        int(keep_logs) if keep_logs else LogRetentionPolicy().keep_last,
+        any([switch in sys.argv for switch in failed_logs_only_switches]),
+        any([switch in sys.argv for switch in compress_logs_switches])))
+
+    if any([switch in sys.argv for switch in full_quality_previews_switches]):
+        configure_proxy_images(False)
+
+    if any([switch in sys.argv for switch in full_overlay_previews_switches]):
+        PageLoadingHandler.set_single_overlay_previews(False)
+
+    if any([switch in sys.argv for switch in tikz_cache_switches]):
+        configure_tikz_cache(True)
+
+    engine = get_switch_value(engine_switches)
+    if engine:
+        configure_engine(engine)
+
+    warm_workers = get_switch_value(warm_workers_switches)
+    if warm_workers:
+        configure_warm_workers(int(warm_workers))
+
+    compile_servers = get_switch_value(compile_servers_switches)
+    if compile_servers:
+        configure_remote_compilation(compile_servers.split(","), compile_token,
+                                     get_switch_value(load_balancing_switches) or LoadBalancing.LEAST_LOADED)
+
     if len(sys.argv) > 0 and any([switch in sys.argv for switch in example_switches]):
         doc_path = select_example()
 
@@ -25,5 +115,15 @@ def main():
     run_app(app, doc_path, os.path.dirname(doc_path))
 
 
+def get_switch_value(switches) -> Optional[str]:
+    """
+    :return: value following any of the given command line switches, or None if none of them was used.
+    """
+    for idx, arg in enumerate(sys.argv[:-1]):
+        if arg in switches:
+            return sys.argv[idx + 1]
+    return None
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,22 @@
+from src.beamer.frame.code import FrameCode
+
+
+_FRAME = "\\begin{frame}{Title}\n\\item a \\pause \\item b\n\\end{frame}"
+
+
+def test_single_overlay_selected():
+    code = FrameCode("\\documentclass{beamer}", _FRAME, overlay=2)
+    assert "\\begin{frame}<2>{Title}\n" in code.full_str()
+    assert FrameCode("", _FRAME).frame_str() == _FRAME + "\n"
+
+
+def test_overlay_spec_detected():
+    assert not FrameCode("", _FRAME).has_overlay_spec()
+    assert FrameCode("", "\\begin{frame}<2->{Title}\n\\end{frame}").has_overlay_spec()
+
+
+def test_frame_breaks_detected():
+    assert not FrameCode("", _FRAME).allows_frame_breaks()
+    assert FrameCode("", "\\begin{frame}[fragile, allowframebreaks]{Title}\n\\end{frame}").allows_frame_breaks()
+    assert FrameCode("", "\\begin{frame}<1>[allowframebreaks=0.9]\n\\end{frame}").allows_frame_breaks()
+    assert not FrameCode("", "\\begin{frame}{Title}\n[allowframebreaks]\n\\end{frame}").allows_frame_breaks()
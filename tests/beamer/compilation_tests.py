@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from src.beamer.compilation.compilation import ENGINE_OUTPUT_OPTIONS, CompilationError, finish_compilation
+from src.beamer.compilation.tex_log import TexMessage
+from src.beamer.compilation.workspace import create_temp_dir
+
+
+# Stands in for an engine hanging in a program started by shell escape, which inherits the output of the engine
+_HANGING_ENGINE_SCRIPT = "import subprocess, time; subprocess.Popen(['sleep', '60']); time.sleep(60)"
+
+
+def test_timeout_kills_programs_started_by_engine(tmp_path):
+    temp_dir_path = create_temp_dir(str(tmp_path))
+    process = subprocess.Popen([sys.executable, "-c", _HANGING_ENGINE_SCRIPT], cwd=temp_dir_path,
+                               **ENGINE_OUTPUT_OPTIONS)
+
+    start = time.monotonic()
+    with pytest.raises(CompilationError) as error:
+        finish_compilation(process, os.path.join(temp_dir_path, "doc.tex"), os.path.join(temp_dir_path, "doc.pdf"),
+                           timeout=1)
+    assert time.monotonic() - start < 30
+    assert error.value.errors[-1].kind == TexMessage.TIMEOUT
@@ -0,0 +1,23 @@
+import os
+import time
+
+from src.beamer.frame.compiler import _read_layout_quality
+
+
+_LOG = "Overfull \\hbox (4.5pt too wide) in paragraph at lines 12--14\n"
+
+
+def test_layout_quality_read_from_fresh_log(tmp_path):
+    (tmp_path / "doc.log").write_text(_LOG)
+    quality = _read_layout_quality(str(tmp_path / "doc.pdf"), time.time())
+    assert quality.overflow == 4.5
+
+
+def test_layout_quality_unknown_without_fresh_log(tmp_path):
+    # The log left by an earlier compilation (e.g. before the document was compiled remotely) isn't used
+    log_path = tmp_path / "doc.log"
+    log_path.write_text(_LOG)
+    os.utime(log_path, (time.time() - 60, time.time() - 60))
+    assert _read_layout_quality(str(tmp_path / "doc.pdf"), time.time()) is None
+
+    assert _read_layout_quality(str(tmp_path / "missing.pdf"), time.time()) is None
@@ -0,0 +1,35 @@
+import hashlib
+import os
+import threading
+
+import fitz
+import pytest
+
+from src.beamer.compilation.compilation import get_dest_pdf_path
+
+
+def _fake_compile_tex(src_doc_path: str, **_):
+    """Stands in for compilation.compile_tex: each page shows the digest of the source and the index of the page,
+    pages are separated by \\pause."""
+    with open(src_doc_path) as src_file:
+        source = src_file.read()
+    digest = hashlib.sha1(source.encode()).hexdigest()[:8]
+
+    doc = fitz.open()
+    for page_idx in range(source.count("\\pause") + 1):
+        doc.new_page(width=160, height=120).insert_text((10, 60), f"{digest}.{page_idx}")
+    pdf_path = get_dest_pdf_path(src_doc_path, os.path.dirname(src_doc_path))
+    doc.save(pdf_path)
+    return pdf_path
+
+
+@pytest.fixture
+def fake_tex(monkeypatch):
+    """Documents are "compiled" without a TeX engine (see _fake_compile_tex). The threads started by the test
+    (e.g. the loading of the improvements) are finished before the engine is restored."""
+    threads = set(threading.enumerate())
+    monkeypatch.setattr("src.beamer.frame.compiler.compile_tex", _fake_compile_tex)
+    yield
+    for thread in set(threading.enumerate()) - threads:
+        if not thread.daemon:
+            thread.join(30)
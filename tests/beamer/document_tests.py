@@ -0,0 +1,28 @@
+from src.beamer.document import BeamerDocument
+
+
+def _document(tmp_path, page_counts) -> BeamerDocument:
+    frames = ["\\begin{frame}{Frame %d}\n%s\n\\end{frame}\n" % (frame_idx, " \\pause ".join(["Text"] * page_count))
+              for frame_idx, page_count in enumerate(page_counts)]
+    doc_path = tmp_path / "talk.tex"
+    doc_path.write_text("\\documentclass{beamer}\n\\begin{document}\n" + "".join(frames) + "\\end{document}\n")
+    return BeamerDocument(str(doc_path))
+
+
+def test_goto_page_continues_sequential_navigation(tmp_path, fake_tex):
+    page_counts = (2, 1, 3, 1, 2)
+    document = _document(tmp_path, page_counts)
+    pages = [document.next_page(None).samples for _ in range(sum(page_counts))]
+    assert len(set(pages)) == len(pages)
+    while document.prev_page(None) is not None:
+        pass
+
+    document.next_page(None)
+    assert document.goto_page(5, None).samples == pages[5]
+    assert (document.current_frame_idx(), document.current_page_idx()) == (2, 5)
+    assert document.next_page(None).samples == pages[6]
+    assert document.goto_page(1, None).samples == pages[1]
+    assert [document.next_page(None).samples for _ in range(3)] == pages[2:5]
+    assert document.goto_page(8, None).samples == pages[8]
+    assert [document.prev_page(None).samples for _ in range(8)] == pages[7::-1]
+    assert document.prev_page(None) is None
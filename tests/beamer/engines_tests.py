@@ -0,0 +1,17 @@
+from src.beamer.compilation.engines import XELATEX, PDFLATEX, LUALATEX
+
+
+def test_engines_support_plain_header():
+    header = "\\documentclass{beamer}\n\\usepackage[utf8]{inputenc}\n\\usetheme{Madrid}\n"
+    assert all(engine.supports(header) for engine in (XELATEX, PDFLATEX, LUALATEX))
+
+
+def test_system_fonts_require_unicode_engine():
+    header = "\\documentclass{beamer}\n\\usepackage{amsmath,fontspec}\n\\setmainfont{Open Sans}\n"
+    assert XELATEX.supports(header) and LUALATEX.supports(header)
+    assert not PDFLATEX.supports(header)
+
+
+def test_engine_specific_packages():
+    assert not XELATEX.supports("\\usepackage{luacode}")
+    assert not LUALATEX.supports("\\usepackage{xltxtra}")
@@ -0,0 +1,78 @@
+import json
+import os
+import time
+
+from src.beamer.compilation.failure_cache import FailureCache, CACHE_SUBDIR_NAME, FAILURES_FILE_NAME, MAX_ENTRY_AGE
+from src.beamer.compilation.tex_log import TexMessage
+from src.beamer.compilation.workspace import create_temp_dir
+
+
+_DECK = "\\documentclass{beamer}\n\\begin{document}\n\\end{document}\n"
+_ERRORS = [TexMessage(TexMessage.ERROR, "Undefined control sequence.", 3)]
+
+
+def _workspace(tmp_path) -> str:
+    (tmp_path / "talk.tex").write_text(_DECK)
+    (tmp_path / "macros.tex").write_text("\\newcommand{\\x}{x}")
+    return create_temp_dir(str(tmp_path))
+
+
+def _touch(path, content: str):
+    path.write_text(content)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1000))
+
+
+def test_key_depends_on_compilation(tmp_path):
+    cache = FailureCache(_workspace(tmp_path))
+    key = cache.key("source", "xelatex")
+    assert cache.key("source", "xelatex") == key
+    assert len({key, cache.key("other", "xelatex"), cache.key("source", "pdflatex"),
+                cache.key("source", "xelatex", str(tmp_path / "macros.tex"))}) == 4
+
+
+def test_key_ignores_standalone_documents(tmp_path):
+    temp_dir_path = _workspace(tmp_path)
+    key = FailureCache(temp_dir_path).key("source", "xelatex")
+
+    _touch(tmp_path / "talk.tex", _DECK.replace("\\end{document}", "Edited\n\\end{document}"))
+    (tmp_path / "talk-improved.tex").write_text(_DECK)
+    assert FailureCache(temp_dir_path).key("source", "xelatex") == key
+
+    _touch(tmp_path / "macros.tex", "\\newcommand{\\x}{y}")
+    assert FailureCache(temp_dir_path).key("source", "xelatex") != key
+
+
+def test_failures_persisted(tmp_path):
+    temp_dir_path = _workspace(tmp_path)
+    cache = FailureCache(temp_dir_path)
+    key = cache.key("source", "xelatex")
+    assert cache.lookup(key) is None
+
+    cache.add(key, _ERRORS)
+    assert [(error.kind, error.text, error.line) for error in FailureCache(temp_dir_path).lookup(key)] == \
+           [(TexMessage.ERROR, "Undefined control sequence.", 3)]
+
+
+def test_timeouts_not_recorded(tmp_path):
+    cache = FailureCache(_workspace(tmp_path))
+    key = cache.key("source", "xelatex")
+    cache.add(key, _ERRORS + [TexMessage(TexMessage.TIMEOUT, "exceeded 120 s")])
+    assert cache.lookup(key) is None
+
+
+def test_old_failures_expire(tmp_path):
+    temp_dir_path = _workspace(tmp_path)
+    cache = FailureCache(temp_dir_path)
+    cache.add("old", _ERRORS)
+    cache.add("recent", _ERRORS)
+
+    file_path = os.path.join(temp_dir_path, CACHE_SUBDIR_NAME, FAILURES_FILE_NAME)
+    with open(file_path) as cache_file:
+        entries = json.load(cache_file)
+    entries["old"]["time"] = time.time() - MAX_ENTRY_AGE - 1
+    with open(file_path, "w") as cache_file:
+        json.dump(entries, cache_file)
+
+    reloaded = FailureCache(temp_dir_path)
+    assert reloaded.lookup("old") is None
+    assert reloaded.lookup("recent") is not None
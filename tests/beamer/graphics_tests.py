@@ -0,0 +1,26 @@
+import fitz
+
+from src.beamer.graphics import document_fingerprint, are_fingerprints_similar
+
+
+def _make_document(text_x: int, page_count=1):
+    doc = fitz.open()
+    for _ in range(page_count):
+        page = doc.new_page(width=364, height=273)
+        page.insert_text((text_x, 60), "- First item of the list")
+        page.insert_text((text_x, 90), "- Second item of the list")
+    return doc
+
+
+def test_fingerprints_identical_documents():
+    assert are_fingerprints_similar(document_fingerprint(_make_document(40)), document_fingerprint(_make_document(40)))
+
+
+def test_fingerprints_shifted_content():
+    assert not are_fingerprints_similar(document_fingerprint(_make_document(40)),
+                                        document_fingerprint(_make_document(100)))
+
+
+def test_fingerprints_different_page_count():
+    assert not are_fingerprints_similar(document_fingerprint(_make_document(40)),
+                                        document_fingerprint(_make_document(40, 2)))
@@ -0,0 +1,236 @@
+from threading import Event
+
+import fitz
+
+from src.beamer.compilation.loading_handler import PageLoadingHandler, _InstantPreviews, \
+    _compile_improvements_category_with_output, _adds_overflow, _adds_underfull_boxes
+from src.beamer.compilation.tex_log import LayoutQuality, parse_box_warnings
+from src.beamer.compilation.loading_handler_iface import CombinedPreviewTask
+from src.beamer.frame.frame import Frame
+from src.beamer.frame.improvements import ImprovementsManager, ColorSetsImprovementsManager
+from src.beamer.graphics import pixmap_from_document
+from src.beautifier.background_generator import FrameProgressInfo
+from src.beautifier.color_generator import get_random_color_set
+
+
+class _BlockingVersion:
+    def __init__(self, started: Event, release: Event):
+        self._started = started
+        self._release = release
+
+    def doc(self):
+        self._started.set()
+        self._release.wait(5)
+        return None
+
+
+class _FakeFrame:
+    def __init__(self, started: Event, release: Event):
+        self._started = started
+        self._release = release
+
+    def combined_version(self):
+        return _BlockingVersion(self._started, self._release)
+
+
+class _RecordingGetter:
+    def __init__(self, name, results, done: Event = None):
+        self._name = name
+        self._results = results
+        self._done = done
+
+    def add_combined_version(self, version):
+        self._results.append((self._name, version))
+        if self._done:
+            self._done.set()
+
+
+def test_combined_previews_serve_only_latest_request():
+    started = Event()
+    release = Event()
+    done = Event()
+    results = []
+
+    handler = PageLoadingHandler()
+    handler.init_frames([_FakeFrame(started, release)])
+
+    handler.set_combined_preview_task(CombinedPreviewTask(0, 0, _RecordingGetter("first", results)))
+    assert started.wait(5)  # the first request is being served, the following ones wait
+    handler.set_combined_preview_task(CombinedPreviewTask(0, 0, _RecordingGetter("dropped", results)))
+    handler.set_combined_preview_task(CombinedPreviewTask(0, 0, _RecordingGetter("latest", results, done)))
+    release.set()
+
+    assert done.wait(5)
+    assert [name for name, _ in results] == ["first", "latest"]
+    assert all(version is None for _, version in results)  # failed compilations are reported as None
+
+
+def test_combined_previews_wait_for_improvements_generation(tmp_path, fake_tex):
+    ColorSetsImprovementsManager.define_color_sets([get_random_color_set() for _ in range(4)])
+    done = Event()
+    results = []
+
+    handler = PageLoadingHandler()
+    frame = Frame("talk_frame0001", str(tmp_path), "\\begin{frame}{Title}\nText\n\\end{frame}",
+                  "\\documentclass{beamer}\n", handler, FrameProgressInfo(0, 1))
+    handler.init_frames([frame])
+
+    with frame.improvements_lock():  # the loading thread is generating the improvements of the frame
+        handler.set_combined_preview_task(CombinedPreviewTask(0, 0, _RecordingGetter("preview", results, done)))
+        assert not done.wait(0.2)
+    assert done.wait(10)
+    # Nothing is selected, so the preview shows the original version
+    assert [(name, pixmap.samples) for name, pixmap in results] == \
+        [("preview", frame.original_version().render_page(0).samples)]
+
+
+class _PageVersion:
+    def __init__(self, events: list, name: str, compiles=True):
+        self._events = events
+        self._name = name
+        self._compiles = compiles
+
+    def is_compiled(self):
+        return False
+
+    def page_count(self):
+        return 1
+
+    def doc(self):
+        self._events.append(("compile", self._name))
+        if not self._compiles:
+            return None
+        doc = fitz.open()
+        doc.new_page(width=40, height=30)
+        return doc
+
+    def render_page(self, page_idx: int):
+        return pixmap_from_document(self.doc(), page_idx)
+
+
+class _RecordingPreviews(_InstantPreviews):
+    def __init__(self, events: list):
+        super().__init__(_FrameWithOriginal(_PageVersion([], "original")), 0, None)
+        self._events = events
+
+    def replace(self, position: int, pixmap):
+        self._events.append(("replace", position))
+
+    def remove(self, position: int):
+        self._events.append(("remove", position))
+
+    def _is_accepted(self) -> bool:
+        return True
+
+    def _approximate(self, version, original_page):
+        return version
+
+    def _add(self, pixmap):
+        self._events.append(("add", pixmap._name))
+
+
+class _FrameWithOriginal:
+    def __init__(self, original_version):
+        self._original_version = original_version
+
+    def original_version(self):
+        return self._original_version
+
+
+class _GlobalImprovements:
+    def __init__(self, versions):
+        self._versions = versions
+
+    def all_improvements(self):
+        return self._versions
+
+    def prunes_similar(self):
+        return False
+
+    def remove_improvement(self, version):
+        self._versions.remove(version)
+
+
+def test_instant_previews_shown_before_compilation():
+    events = []
+    versions = [_PageVersion(events, "a"), _PageVersion(events, "b", compiles=False), _PageVersion(events, "c")]
+
+    _compile_improvements_category_with_output(_GlobalImprovements(list(versions)), None, 0, False, None,
+                                               instant_previews=_RecordingPreviews(events))
+    assert events[:3] == [("add", "a"), ("add", "b"), ("add", "c")]  # all approximations before the compilations
+    assert [event for event in events[3:] if event[0] != "compile"] == [("replace", 1), ("remove", 2), ("replace", 2)]
+
+
+class _OverlaidVersion(_PageVersion):
+    """Version whose single-page (overlay) preview compiles, while the whole version may fail."""
+    def __init__(self, name: str, compiles=True):
+        super().__init__([], name, compiles)
+        self._overlay = _PageVersion([], name)
+
+    def overlay_version(self, page_idx: int):
+        return self._overlay
+
+
+class _FixedImprovements(ImprovementsManager):
+    _PRUNE_SIMILAR = False
+
+    def __init__(self, versions: list):
+        super().__init__()
+        self._generated = versions
+
+    def improvements_generator(self):
+        self._versions.clear()
+        for version in self._generated:
+            self._versions.append(version)
+            yield version
+
+
+def _select_during_preview(selected_idx: int) -> ImprovementsManager:
+    versions = [_OverlaidVersion("a"), _OverlaidVersion("b", compiles=False), _OverlaidVersion("c")]
+    improvements = _FixedImprovements(versions)
+    shown = []
+    _compile_improvements_category_with_output(improvements, shown.append, 0, True, None, preview=True)
+    assert len(shown) == 3  # all the overlays compile
+
+    improvements.select_alternative(selected_idx)
+    _compile_improvements_category_with_output(improvements, shown.append, 0, False, None)
+    return improvements
+
+
+def test_selection_kept_when_previewed_version_pruned():
+    improvements = _select_during_preview(3)
+    assert [version._name for version in improvements.all_improvements()] == ["a", "c"]
+    assert improvements.selected_index() == 2
+    assert improvements.current_version()._name == "c"
+
+
+def test_selection_reset_when_selected_version_pruned():
+    improvements = _select_during_preview(2)
+    assert improvements.selected_index() == 0
+
+
+class _LoggedVersion:
+    def __init__(self, log: str = None):
+        self._quality = LayoutQuality(parse_box_warnings(log)) if log is not None else None
+
+    def layout_quality(self):
+        return self._quality
+
+
+def _overfull(amount: float) -> str:
+    return f"Overfull \\hbox ({amount}pt too wide) in paragraph at lines 12--14\n"
+
+
+def test_improvements_overflowing_page_dropped():
+    original = _LoggedVersion(_overfull(2.0))
+    assert _adds_overflow(_LoggedVersion(_overfull(7.5)), original)
+    assert not _adds_overflow(_LoggedVersion(_overfull(6.0)), original)
+    assert not _adds_overflow(_LoggedVersion(_overfull(7.5)), _LoggedVersion())  # unknown quality of the original
+
+
+def test_improvements_with_underfull_boxes_dropped():
+    underfull = "Underfull \\hbox (badness 10000) in paragraph at lines 20--21\n"
+    original = _LoggedVersion(underfull)
+    assert _adds_underfull_boxes(_LoggedVersion(underfull * 3), original)
+    assert not _adds_underfull_boxes(_LoggedVersion(underfull * 2), original)
+    assert not _adds_underfull_boxes(_LoggedVersion(underfull.replace("10000", "1500") * 3), original)
@@ -0,0 +1,48 @@
+from src.beamer.compilation.prefetch import PrefetchPolicy
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_window_follows_direction():
+    policy = PrefetchPolicy(10, _Clock())
+    policy.on_navigation(5, True)
+    policy.on_navigation(4, False)
+    assert policy.window() == [4, 3]
+    assert (policy.hits, policy.misses) == (0, 1)
+
+
+def test_window_grows_with_speed_and_latency():
+    clock = _Clock()
+    policy = PrefetchPolicy(20, clock)
+    policy.on_frame_compiled(2.0)
+    for idx in range(4):
+        policy.on_navigation(idx, True)
+        clock.now += 1.0
+    assert policy.frames_ahead() == 2  # 0.75 frames per second, 2 seconds per frame
+    assert policy.window() == [3, 4, 5]
+    assert policy.hit_rate() == 1.0
+
+    clock.now += 60.0  # user stopped
+    assert policy.frames_ahead() == PrefetchPolicy.MIN_FRAMES_AHEAD
+
+
+def test_frames_not_prefetched_not_counted():
+    policy = PrefetchPolicy(10, _Clock())
+    policy.on_navigation(1, True)
+    policy.on_navigation(2, None)
+    policy.on_navigation(3, False)
+    assert (policy.hits, policy.misses) == (0, 1)
+    assert policy.window() == [3, 4]
+
+
+def test_window_limited_to_document():
+    policy = PrefetchPolicy(3, _Clock())
+    policy.on_frame_compiled(100.0)
+    policy.on_navigation(2, True)
+    assert policy.window() == [2]
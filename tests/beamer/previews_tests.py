@@ -0,0 +1,49 @@
+import fitz
+from PIL import Image
+
+from src.beamer.previews import composite_background, palette_colors, color_set_palette, recolor_page
+
+
+def _render_page():
+    doc = fitz.open()
+    page = doc.new_page(width=364, height=273)
+    page.draw_rect(page.rect, color=None, fill=(1, 1, 1))
+    page.draw_rect(fitz.Rect(0, 0, 364, 30), color=None, fill=(0.2, 0.2, 0.7))
+    page.insert_text((40, 60), "- First item of the list", fontsize=20)
+    return page.get_pixmap(alpha=True)
+
+
+def test_composite_background(tmp_path):
+    background_path = str(tmp_path / "bg.png")
+    Image.new("RGB", (64, 48), (40, 80, 160)).save(background_path)
+    page = _render_page()
+
+    composite = composite_background(page, background_path)
+
+    assert (composite.width, composite.height, composite.n) == (page.width, page.height, 4)
+    assert composite.pixel(2, 100) == (40, 80, 160, 255)  # white canvas shows the background
+    dark_pixel = min(((x, 50) for x in range(40, 200)), key=lambda xy: sum(page.pixel(*xy)[:3]))
+    assert sum(composite.pixel(*dark_pixel)[:3]) < 60  # text stays on top
+
+
+def test_composite_background_missing_image(tmp_path):
+    assert composite_background(_render_page(), str(tmp_path / "missing.png")) is None
+
+
+def test_palette_colors():
+    palette = palette_colors(_render_page())
+    assert len(palette) == 1
+    assert all(abs(channel - expected) <= 2 for channel, expected in zip(palette[0], (51, 51, 178)))
+
+
+def test_color_set_palette():
+    color_defs = "\\definecolor{RandomColor1}{RGB}{10,20,30}\n\\definecolor{RandomColor2}{RGB}{40, 50, 60}"
+    assert color_set_palette(color_defs) == [(10, 20, 30), (40, 50, 60)]
+
+
+def test_recolor_page():
+    page = _render_page()
+    recolored = recolor_page(page, palette_colors(page), [(200, 40, 40)])
+
+    assert recolored.pixel(2, 2) == (200, 40, 40, 255)
+    assert recolored.pixel(2, 100) == page.pixel(2, 100)  # colors far from the palette stay unchanged
@@ -0,0 +1,29 @@
+import os
+
+from PIL import Image
+
+from src.beamer.compilation.failure_cache import CACHE_SUBDIR_NAME
+from src.beamer.compilation.proxies import prepare_proxy_images, PROXIES_SUBDIR_NAME, PROXY_MAX_SIZE
+from src.beamer.compilation.workspace import create_temp_dir, input_dirs_of
+
+
+def test_proxies_of_referenced_images_only(tmp_path):
+    os.makedirs(tmp_path / "img")
+    os.makedirs(tmp_path / "unrelated")
+    for path in (tmp_path / "img" / "photo.png", tmp_path / "unrelated" / "photo.png"):
+        Image.new("RGB", (2 * PROXY_MAX_SIZE, PROXY_MAX_SIZE)).save(path)
+    Image.new("RGB", (16, 16)).save(tmp_path / "img" / "icon.png")
+    source = "\\documentclass{beamer}\n\\begin{document}\\includegraphics{img/photo}\\includegraphics{img/icon.png}" \
+             "\\end{document}\n"
+
+    temp_dir_path = create_temp_dir(str(tmp_path))
+    assert prepare_proxy_images(temp_dir_path, source) == 1
+
+    proxies_dir_path = os.path.join(temp_dir_path, CACHE_SUBDIR_NAME, PROXIES_SUBDIR_NAME)
+    with Image.open(os.path.join(proxies_dir_path, "img", "photo.png")) as proxy:
+        assert max(proxy.size) <= PROXY_MAX_SIZE
+    assert not os.path.exists(os.path.join(proxies_dir_path, "unrelated"))
+    assert not os.path.exists(os.path.join(proxies_dir_path, "img", "icon.png"))
+    assert proxies_dir_path in input_dirs_of(temp_dir_path)
+
+    assert prepare_proxy_images(temp_dir_path, source) == 0  # up to date
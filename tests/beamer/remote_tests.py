@@ -0,0 +1,135 @@
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+from src.beamer.compilation.compilation import CompilationError
+from src.beamer.compilation.compile_server import create_compile_server
+from src.beamer.compilation.remote import RemoteCompilerPool, RemoteUnavailable, LoadBalancing, referenced_assets, \
+    file_digest, content_digest
+from src.beamer.compilation.tex_log import TexMessage
+from src.beamer.compilation.workspace import create_temp_dir, source_dir_of
+
+
+_SOURCE = "\\documentclass{beamer}\n\\begin{document}\\includegraphics{img/logo}\\end{document}\n"
+_TOKEN = "secret"
+_temp_dirs = []  # temporary directories of the served jobs
+
+
+def _fake_compile(doc_path, stop_on_error=False, timeout=0, engine=None, restricted=False):
+    """Stands in for compile_tex: the "PDF" contains the source and the received asset."""
+    assert restricted
+    _temp_dirs.append(create_temp_dir(os.path.dirname(doc_path)))
+    with open(doc_path) as doc_file:
+        source = doc_file.read()
+    if "\\broken" in source:
+        raise CompilationError("failed", errors=[TexMessage(TexMessage.ERROR, "Undefined control sequence.", 3)])
+
+    with open(os.path.join(os.path.dirname(doc_path), "img", "logo.png")) as asset_file:
+        pdf_path = doc_path[:-len(".tex")] + ".pdf"
+        with open(pdf_path, "w") as pdf_file:
+            pdf_file.write(source + asset_file.read())
+    return pdf_path
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = create_compile_server("127.0.0.1:0", str(tmp_path / "store"), _TOKEN, _fake_compile)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _write_document(dir_path, source=_SOURCE):
+    os.makedirs(dir_path / "img", exist_ok=True)
+    (dir_path / "img" / "logo.png").write_text("LOGO")
+    (dir_path / "main.tex").write_text(source)
+    return str(dir_path / "main.tex")
+
+
+def test_referenced_assets(tmp_path):
+    _write_document(tmp_path)
+    assert referenced_assets(_SOURCE, [str(tmp_path)]) == {"img/logo.png": str(tmp_path / "img" / "logo.png")}
+
+
+def test_remote_compilation(server, tmp_path):
+    doc_path = _write_document(tmp_path / "doc")
+    pool = RemoteCompilerPool([f"127.0.0.1:{server.server_address[1]}"], _TOKEN)
+
+    result = pool.compile(doc_path, [os.path.dirname(doc_path)])
+    assert result.pdf == (_SOURCE + "LOGO").encode()
+    assert result.errors == []
+    # Temporary directory of the job is forgotten once the job is finished (after the result is sent)
+    deadline = time.monotonic() + 5
+    while source_dir_of(_temp_dirs[-1]) is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert source_dir_of(_temp_dirs[-1]) is None
+
+    # Asset is already known to the server, so it doesn't have to be sent again
+    result = pool.compile(doc_path, [os.path.dirname(doc_path)])
+    assert result.pdf == (_SOURCE + "LOGO").encode()
+
+
+def test_remote_compilation_error(server, tmp_path):
+    doc_path = _write_document(tmp_path / "doc", _SOURCE.replace("\\end{document}", "\\broken\\end{document}"))
+    pool = RemoteCompilerPool([f"127.0.0.1:{server.server_address[1]}"], _TOKEN)
+
+    result = pool.compile(doc_path, [os.path.dirname(doc_path)])
+    assert result.pdf is None
+    assert [(error.text, error.line) for error in result.errors] == [("Undefined control sequence.", 3)]
+
+
+def test_unreachable_endpoint_skipped(server, tmp_path):
+    doc_path = _write_document(tmp_path / "doc")
+    unreachable = f"unix:{tmp_path / 'missing.sock'}"
+    pool = RemoteCompilerPool([unreachable, f"127.0.0.1:{server.server_address[1]}"], _TOKEN,
+                              LoadBalancing.ROUND_ROBIN)
+    for _ in range(2):
+        assert pool.compile(doc_path, [os.path.dirname(doc_path)]).pdf
+
+    with pytest.raises(RemoteUnavailable):
+        RemoteCompilerPool([unreachable], _TOKEN).compile(doc_path, [os.path.dirname(doc_path)])
+
+
+def test_invalid_token_rejected(server, tmp_path):
+    doc_path = _write_document(tmp_path / "doc")
+    pool = RemoteCompilerPool([f"127.0.0.1:{server.server_address[1]}"], "guess")
+    with pytest.raises(RemoteUnavailable):
+        pool.compile(doc_path, [os.path.dirname(doc_path)])
+
+
+def test_server_listens_only_locally_by_default(tmp_path):
+    with pytest.raises(ValueError):
+        create_compile_server("0.0.0.0:0", str(tmp_path / "store"), _TOKEN, _fake_compile)
+
+
+def test_file_digests_cached_until_modified(tmp_path):
+    path = tmp_path / "asset.png"
+    path.write_bytes(b"first")
+    digest = file_digest(str(path))
+    assert file_digest(str(path)) == digest == content_digest(b"first")
+
+    path.write_bytes(b"second")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert file_digest(str(path)) == content_digest(b"second")
+
+
+@pytest.mark.skipif(shutil.which("xelatex") is None, reason="requires xelatex")
+def test_served_engine_reads_only_job_files(tmp_path):
+    server = create_compile_server("127.0.0.1:0", str(tmp_path / "store"), _TOKEN)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        pool = RemoteCompilerPool([f"127.0.0.1:{server.server_address[1]}"], _TOKEN)
+        source = "\\documentclass{article}\n\\begin{document}\n%s\n\\end{document}\n"
+
+        doc_path = _write_document(tmp_path / "doc", source % "Hello")
+        assert pool.compile(doc_path, [os.path.dirname(doc_path)], engine="xelatex").pdf.startswith(b"%PDF")
+
+        doc_path = _write_document(tmp_path / "leak", source % "\\input{/etc/hostname}")
+        assert pool.compile(doc_path, [os.path.dirname(doc_path)], engine="xelatex").pdf is None
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,72 @@
+import gzip
+import os
+
+import pytest
+
+from src.beamer.compilation.retention import LogRetentionPolicy, set_log_retention_policy, retain_log, prune_logs, \
+    sweep_stale_artifacts, RESOURCES_SUBDIR_NAME
+from src.beamer.compilation.workspace import create_temp_dir
+
+
+@pytest.fixture
+def policy():
+    yield set_log_retention_policy
+    set_log_retention_policy(LogRetentionPolicy())
+
+
+def _write_logs(dir_path, count: int):
+    os.makedirs(dir_path, exist_ok=True)
+    for idx in range(count):
+        path = dir_path / f"log{idx}.txt"
+        path.write_text("x" * 10)
+        os.utime(path, (1000 + idx, 1000 + idx))
+
+
+def test_prune_logs_keeps_newest(tmp_path):
+    _write_logs(tmp_path, 5)
+    assert prune_logs(str(tmp_path), 2) == 30
+    assert sorted(os.listdir(tmp_path)) == ["log3.txt", "log4.txt"]
+    assert prune_logs(str(tmp_path), 2) == 0
+
+
+def test_retain_log_of_success_with_failures_only(tmp_path, policy):
+    policy(LogRetentionPolicy(failures_only=True))
+    _write_logs(tmp_path, 2)
+    retain_log(str(tmp_path / "log0.txt"), succeeded=True)
+    retain_log(str(tmp_path / "log1.txt"), succeeded=False)
+    assert os.listdir(tmp_path) == ["log1.txt"]
+
+
+def test_retain_log_compressed_and_pruned(tmp_path, policy):
+    policy(LogRetentionPolicy(keep_last=2, compress=True))
+    _write_logs(tmp_path, 3)
+    retain_log(str(tmp_path / "log2.txt"), succeeded=True)
+    assert sorted(os.listdir(tmp_path)) == ["log1.txt", "log2.txt.gz"]
+    with gzip.open(tmp_path / "log2.txt.gz", "rt") as log_file:
+        assert log_file.read() == "x" * 10
+
+
+def test_sweep_only_stale_artifacts_of_document(tmp_path):
+    (tmp_path / "talk.tex").write_text("")
+    (tmp_path / "talk_frame0009_l0.tex").write_text("")  # source file, even though it looks like an artifact
+    temp_dir_path = create_temp_dir(str(tmp_path))
+    os.makedirs(os.path.join(temp_dir_path, RESOURCES_SUBDIR_NAME))
+
+    names = ["talk_frame0001_org.tex", "talk_frame0001_org.pdf", "talk_frame0001_l0.tex", "talk_frame0002_g1.pdf",
+             "talk_engine_xelatex.pdf", "talk_v2_frame0001_l0.pdf", "talk_v2_engine_xelatex.pdf", "talk_frame0009_l0.tex",
+             os.path.join(RESOURCES_SUBDIR_NAME, "talk_frame0001_bg0.png"),
+             os.path.join(RESOURCES_SUBDIR_NAME, "talk_frame0001_bg1.png"),
+             os.path.join(RESOURCES_SUBDIR_NAME, "talk_v2_frame0001_bg0.png")]
+    for name in names:
+        with open(os.path.join(temp_dir_path, name), "w") as artifact_file:
+            artifact_file.write("x")
+
+    live = {os.path.join(temp_dir_path, "talk_frame0001_org"),
+            os.path.join(temp_dir_path, RESOURCES_SUBDIR_NAME, "talk_frame0001_bg0.png")}
+    assert sweep_stale_artifacts(temp_dir_path, live, "talk") == 4
+
+    remaining = {name for name in names if os.path.exists(os.path.join(temp_dir_path, name))}
+    assert remaining == {"talk_frame0001_org.tex", "talk_frame0001_org.pdf", "talk_v2_frame0001_l0.pdf",
+                         "talk_v2_engine_xelatex.pdf", "talk_frame0009_l0.tex",
+                         os.path.join(RESOURCES_SUBDIR_NAME, "talk_frame0001_bg0.png"),
+                         os.path.join(RESOURCES_SUBDIR_NAME, "talk_v2_frame0001_bg0.png")}
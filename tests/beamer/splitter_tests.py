@@ -0,0 +1,56 @@
+import io
+
+import pytest
+
+from src.beamer.splitter import FrameSplitter, FrameCountError, NotBeamerPresentation
+
+DOCUMENT = r"""\documentclass{beamer}
+\usepackage{graphicx}
+
+\begin{document}
+\begin{frame}
+    First frame
+\end{frame}
+
+\begin{frame}{Title}
+    Second frame\end{frame}
+\end{document}
+"""
+
+
+def _split(code: str, chunk_size=FrameSplitter.CHUNK_SIZE):
+    splitter = FrameSplitter(io.StringIO(code))
+    splitter.CHUNK_SIZE = chunk_size
+    return splitter, list(splitter.frames())
+
+
+def test_splitter_frames():
+    splitter, frames = _split(DOCUMENT)
+    assert [frame.idx for frame in frames] == [0, 1]
+    assert frames[0].code == "\\begin{frame}\n    First frame\n\\end{frame}\n"
+    assert frames[1].code == "\\begin{frame}{Title}\n    Second frame\n\\end{frame}\n"
+    assert splitter.header() == "\\documentclass{beamer}\n\\usepackage{graphicx}\n\n"
+    assert splitter.source() == DOCUMENT
+
+
+def test_splitter_offsets():
+    _, frames = _split(DOCUMENT)
+    for frame in frames:
+        assert DOCUMENT[frame.begin:].startswith("\\begin{frame}")
+        assert DOCUMENT[: frame.end].endswith("\\end{frame}")
+
+
+def test_splitter_small_chunks():
+    _, frames = _split(DOCUMENT)
+    _, frames_small_chunks = _split(DOCUMENT, 3)
+    assert [(f.begin, f.end, f.code) for f in frames] == [(f.begin, f.end, f.code) for f in frames_small_chunks]
+
+
+def test_splitter_not_beamer():
+    with pytest.raises(NotBeamerPresentation):
+        _split(DOCUMENT.replace("beamer", "article"))
+
+
+def test_splitter_unmatched_end():
+    with pytest.raises(FrameCountError):
+        _split(DOCUMENT.replace("Second frame", "Second frame\\end{frame}"))
@@ -0,0 +1,52 @@
+from src.beamer.compilation.tex_log import TexOutputParser, TexMessage, LayoutQuality, parse_box_warnings
+
+
+def _feed_all(parser: TexOutputParser, output: str):
+    completed = [parser.feed(line) for line in output.splitlines(keepends=True)]
+    completed.append(parser.finish())
+    return [message for message in completed if message]
+
+
+def test_parser_error_with_location():
+    parser = TexOutputParser()
+    output = "(./main.tex\n! Undefined control sequence.\nl.12 \\foo\n           bar\n"
+    errors = _feed_all(parser, output)
+    assert len(errors) == 1
+    assert errors[0].kind == TexMessage.ERROR
+    assert errors[0].text == "Undefined control sequence."
+    assert errors[0].line == 12
+
+
+def test_parser_error_completed_on_line_number():
+    parser = TexOutputParser()
+    assert parser.feed("! Missing $ inserted.\n") is None
+    error = parser.feed("l.7 x^\n")
+    assert error and error.line == 7
+
+
+def test_parser_consecutive_errors():
+    parser = TexOutputParser()
+    errors = _feed_all(parser, "! Emergency stop.\n! Fatal error occurred.\n")
+    assert [error.text for error in errors] == ["Emergency stop.", "Fatal error occurred."]
+    assert all(error.line is None for error in errors)
+
+
+def test_parser_no_errors():
+    parser = TexOutputParser()
+    assert _feed_all(parser, "This is XeTeX\nOutput written on main.pdf (1 page).\n") == []
+    assert parser.errors() == []
+
+
+def test_parse_box_warnings():
+    log = ("Overfull \\hbox (45.67pt too wide) in paragraph at lines 12--14\n"
+           "[]\\TU/lmr/m/n/10 foo\n"
+           "Underfull \\hbox (badness 10000) in paragraph at lines 20--21\n"
+           "Overfull \\vbox (3.0pt too high) detected at line 30\n")
+    warnings = parse_box_warnings(log)
+    assert [(warning.kind, warning.amount, warning.line) for warning in warnings] == \
+        [(TexMessage.OVERFULL, 45.67, 12), (TexMessage.UNDERFULL, 10000.0, 20), (TexMessage.OVERFULL, 3.0, 30)]
+
+    quality = LayoutQuality(warnings)
+    assert quality.overflow == 48.67
+    assert (quality.overfull_count, quality.underfull_count) == (2, 1)
+    assert (quality.underfull_count_from(10000), quality.underfull_count_from(10001)) == (1, 0)
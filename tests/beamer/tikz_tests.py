@@ -0,0 +1,50 @@
+import pytest
+
+from src.beamer.compilation.engines import XELATEX, PDFLATEX
+from src.beamer.compilation.tikz import externalize_pictures, configure_tikz_cache
+from src.beamer.frame.code import FrameCode
+
+
+_HEADER = "\\documentclass{beamer}\n\\usepackage{tikz}\n"
+_PICTURE = "\\begin{tikzpicture}\\draw[->] (0,0) -- (1,1);\\end{tikzpicture}"
+
+
+def _frame(content: str) -> str:
+    return "\\begin{frame}{Title}\n" + content + "\n\\end{frame}"
+
+
+@pytest.fixture
+def tikz_cache():
+    configure_tikz_cache(True)
+    yield
+    configure_tikz_cache(False)
+
+
+def test_externalization_disabled_by_default(tmp_path):
+    assert externalize_pictures(FrameCode(_HEADER, _frame(_PICTURE)), XELATEX, str(tmp_path)) is None
+
+
+def test_pictures_shared_by_versions(tmp_path, tikz_cache):
+    first = externalize_pictures(FrameCode(_HEADER, _frame("Text " + _PICTURE)), XELATEX, str(tmp_path))
+    second = externalize_pictures(FrameCode(_HEADER, _frame("\\begin{itemize}\\item Text\\end{itemize}" + _PICTURE)),
+                                  XELATEX, str(tmp_path))
+    assert len(first.figure_names) == 1
+    assert first.figure_names == second.figure_names
+    assert f"\\tikzsetnextfilename{{{first.figure_names[0]}}}{_PICTURE}" in first.code.base_code
+    assert "\\tikzexternalize" in first.code.header
+
+
+def test_pictures_depend_on_colors_and_engine(tmp_path, tikz_cache):
+    names = {tuple(externalize_pictures(FrameCode(_HEADER, _frame(_PICTURE), colors), engine,
+                                        str(tmp_path)).figure_names)
+             for colors, engine in (("", XELATEX), ("\\definecolor{a}{RGB}{1,2,3}", XELATEX), ("", PDFLATEX))}
+    assert len(names) == 3
+
+
+def test_overlay_pictures_not_externalized(tmp_path, tikz_cache):
+    nested = "\\begin{tikzpicture}\\node{\\begin{tikzpicture}\\end{tikzpicture}};\\end{tikzpicture}"
+    overlay = "\\begin{tikzpicture}\\only<2>{\\draw (0,0) -- (1,1);}\\end{tikzpicture}"
+    externalized = externalize_pictures(FrameCode(_HEADER, _frame(nested + overlay)), XELATEX, str(tmp_path))
+    assert len(externalized.figure_names) == 1
+    assert externalize_pictures(FrameCode(_HEADER, _frame(overlay)), XELATEX, str(tmp_path)) is None
+    assert externalize_pictures(FrameCode("\\documentclass{beamer}", _frame(_PICTURE)), XELATEX, str(tmp_path)) is None
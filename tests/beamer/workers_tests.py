@@ -0,0 +1,64 @@
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.beamer.compilation.engines import TexEngine
+from src.beamer.compilation.workers import WarmWorkerPool
+from src.beamer.compilation.workspace import create_temp_dir
+
+
+# Stands in for the TeX engine: writes a lot of output while "loading the header" (more than fits into a pipe), then
+# compiles the body named on the standard input by copying it into the PDF file
+_ENGINE_SCRIPT = """
+import sys
+job_name = sys.argv[-2].split("=", 1)[1]
+open(job_name + ".alive", "w").close()
+for line_idx in range(20000):
+    print("Loading the header", line_idx)
+sys.stdout.flush()
+open(job_name + ".loaded", "w").close()
+with open(sys.stdin.readline().strip()) as body_file, open(job_name + ".pdf", "w") as pdf_file:
+    pdf_file.write(body_file.read())
+"""
+
+
+class _ScriptEngine(TexEngine):
+    def __init__(self, script_path: str):
+        super().__init__("fakelatex", unicode_fonts=True)
+        self._script_path = script_path
+
+    def command(self, output_dir_path: str, interaction: str = "nonstopmode", shell_escape=False):
+        return [sys.executable, self._script_path]
+
+
+def _wait_for_count(pattern: str, count: int) -> bool:
+    deadline = time.monotonic() + 10
+    while len(glob.glob(pattern)) != count and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return len(glob.glob(pattern)) == count
+
+
+def test_warm_workers(tmp_path):
+    script_path = tmp_path / "engine.py"
+    script_path.write_text(_ENGINE_SCRIPT)
+    temp_dir_path = create_temp_dir(str(tmp_path))
+    pool = WarmWorkerPool(temp_dir_path, "header", "digest", _ScriptEngine(str(script_path)), 2)
+    # Idle workers get through the header, even though nobody waits for their output yet
+    assert _wait_for_count(os.path.join(temp_dir_path, "*.loaded"), 2)
+
+    def compile_body(idx: int) -> str:
+        body_path = os.path.join(temp_dir_path, f"body{idx}.tex")
+        with open(body_path, "w") as body_file:
+            body_file.write(f"Body {idx}")
+        with open(pool.compile(body_path, os.path.join(temp_dir_path, f"doc{idx}.pdf"))) as pdf_file:
+            return pdf_file.read()
+
+    with ThreadPoolExecutor(4) as executor:
+        assert list(executor.map(compile_body, range(8))) == [f"Body {idx}" for idx in range(8)]
+    assert _wait_for_count(os.path.join(temp_dir_path, "*.loaded"), 2)  # refilled, but not beyond the size
+    assert len(glob.glob(os.path.join(temp_dir_path, "*.alive"))) == 2
+
+    pool.shutdown()
+    assert not glob.glob(os.path.join(temp_dir_path, "*.alive"))
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from src.beamer.compilation import workspace
+from src.beamer.compilation.workspace import configure_workspace, create_temp_dir, enforce_quota, \
+    set_workspace_mode, WorkspaceMode, LOGS_SUBDIR_NAME, EVICTION_MIN_AGE
+
+
+@pytest.fixture
+def configure():
+    set_workspace_mode(WorkspaceMode.TEXINPUTS)  # source files are not copied into the workspace
+    yield configure_workspace
+    configure_workspace()
+    set_workspace_mode(WorkspaceMode.COPY)
+
+
+def _write(path, size: int, age: float = 0):
+    path.write_bytes(b"x" * size)
+    mtime = path.stat().st_mtime - EVICTION_MIN_AGE - 100 + age
+    os.utime(path, (mtime, mtime))
+
+
+def test_quota_evicts_oldest_artifacts(tmp_path, configure):
+    source_dir = tmp_path / "src"
+    os.makedirs(source_dir / "res")
+    _write(source_dir / "image.png", 10)
+    configure(str(tmp_path / "root"), 350)
+    temp_dir = tmp_path / "root" / os.path.basename(create_temp_dir(str(source_dir)))
+
+    _write(temp_dir / "image.png", 100, age=-50)  # linked source file - oldest, but never evicted
+    _write(temp_dir / LOGS_SUBDIR_NAME / "log.txt", 100, age=-40)
+    _write(temp_dir / "talk_frame0001_l0.pdf", 100, age=-30)
+    _write(temp_dir / "talk_frame0001_l1.pdf", 100, age=-20)
+    _write(temp_dir / "talk_frame0002_l0.pdf", 100, age=-10)
+    _write(temp_dir / "talk_frame0003_l0.pdf", 100, age=-5)
+
+    assert enforce_quota(str(temp_dir)) == 300
+    assert sorted(os.listdir(temp_dir)) == [LOGS_SUBDIR_NAME, "image.png", "talk_frame0002_l0.pdf",
+                                            "talk_frame0003_l0.pdf"]
+    assert os.listdir(temp_dir / LOGS_SUBDIR_NAME) == []
+
+
+def test_quota_keeps_recent_artifacts(tmp_path, configure):
+    configure(str(tmp_path / "root"), 50)
+    temp_dir = tmp_path / "root" / os.path.basename(create_temp_dir(str(tmp_path)))
+    _write(temp_dir / "talk_frame0001_l0.pdf", 100, age=EVICTION_MIN_AGE + 100)
+
+    assert enforce_quota(str(temp_dir)) == 0
+    assert os.path.exists(temp_dir / "talk_frame0001_l0.pdf")
+
+
+def test_temporary_directories_removed_at_exit(tmp_path, configure, monkeypatch):
+    monkeypatch.setattr(workspace, "_source_dirs", {})
+    configure(str(tmp_path / "root"))
+    temp_dir_path = create_temp_dir(str(tmp_path / "src"))
+    workspace._cleanup_temp_dirs()
+    assert not os.path.exists(temp_dir_path)
+
+    configure(str(tmp_path / "root"), persistent=True)
+    temp_dir_path = create_temp_dir(str(tmp_path / "src"))
+    workspace._cleanup_temp_dirs()
+    assert os.path.isdir(temp_dir_path)
+
+
+def test_workspace_root_not_copied_into_itself(tmp_path, configure):
+    set_workspace_mode(WorkspaceMode.COPY)
+    os.makedirs(tmp_path / "img")
+    (tmp_path / "img" / "logo.png").write_text("LOGO")
+    configure(str(tmp_path / "root"))
+
+    temp_dir_path = create_temp_dir(str(tmp_path))
+    assert sorted(os.listdir(temp_dir_path)) == [LOGS_SUBDIR_NAME, "img"]